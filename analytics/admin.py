@@ -0,0 +1,25 @@
+from django.contrib import admin
+
+from .models import TopSearch, ZeroResultSearch
+
+
+class TopSearchAdmin(admin.ModelAdmin):
+    """Daily search rollups are read only, they are replaced by the
+    rollup_search_events command"""
+    list_display = ('date', 'keywords', 'searches', 'average_results')
+    list_filter = ('date',)
+    search_fields = ('keywords',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class ZeroResultSearchAdmin(TopSearchAdmin):
+    list_display = ('date', 'keywords', 'searches')
+
+
+admin.site.register(TopSearch, TopSearchAdmin)
+admin.site.register(ZeroResultSearch, ZeroResultSearchAdmin)
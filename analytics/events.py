@@ -0,0 +1,130 @@
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+
+from .models import SearchEvent
+
+logger = logging.getLogger(__name__)
+
+
+class EventBuffer:
+    """Holds unsaved model instances in memory, a background thread saves
+    them with one bulk insert every flush_interval seconds or as soon as
+    batch_size events are waiting, so recording an event never waits on
+    the database. Without a flush_interval events are only saved when
+    flush() is called."""
+
+    def __init__(self, model, batch_size, flush_interval=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # the oldest events are dropped if saving falls far behind
+        self.events = deque(maxlen=batch_size * 10)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def __len__(self):
+        return len(self.events)
+
+    def add(self, event):
+        """Queue an unsaved instance to be saved with the next batch"""
+        with self._lock:
+            self._start_worker()
+            self.events.append(event)
+            full = len(self.events) >= self.batch_size
+
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        """Save the waiting events, returns the number saved"""
+        with self._lock:
+            events = list(self.events)
+            self.events.clear()
+
+        if not events:
+            return 0
+
+        try:
+            self.model.objects.bulk_create(events, batch_size=self.batch_size)
+        except DatabaseError as error:
+            logger.warning('Could not save %d %s events: %s', len(events),
+                           self.model._meta.verbose_name, error)
+            return 0
+
+        return len(events)
+
+    def clear(self):
+        """Discard the waiting events"""
+        with self._lock:
+            self.events.clear()
+
+    def _start_worker(self):
+        if not self.flush_interval:
+            return
+
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+
+        if self._pid is not None:
+            # a forked process inherits the parent's events but not its
+            # thread, the parent saves those events itself
+            self.events.clear()
+        else:
+            atexit.register(self.flush)
+
+        self._pid = pid
+        self._thread = threading.Thread(
+            target=self._run, name=f'{self.model.__name__}Buffer',
+            daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # keep the thread alive for the next batch
+                logger.exception('Could not save %s events',
+                                 self.model._meta.verbose_name)
+            finally:
+                # the thread's connection is not closed by request handling
+                connection.close()
+
+
+_search_events = None
+_search_events_lock = threading.Lock()
+
+
+def search_event_buffer():
+    """Return the process wide buffer of search events"""
+    global _search_events
+
+    if _search_events is None:
+        with _search_events_lock:
+            if _search_events is None:
+                _search_events = EventBuffer(
+                    SearchEvent, settings.SEARCH_ANALYTICS_BATCH_SIZE,
+                    settings.SEARCH_ANALYTICS_FLUSH_INTERVAL)
+
+    return _search_events
+
+
+def record_search(keywords, results):
+    """Queue a search and its number of results to be saved"""
+    max_length = SearchEvent._meta.get_field('keywords').max_length
+    keywords = ' '.join(keywords.lower().split())[:max_length]
+
+    if keywords:
+        search_event_buffer().add(
+            SearchEvent(keywords=keywords, results=results))
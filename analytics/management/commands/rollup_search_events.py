@@ -0,0 +1,83 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Avg, Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from analytics.models import SearchEvent, TopSearch, ZeroResultSearch
+
+
+class Command(BaseCommand):
+    help = 'Summarise search events into the daily top search and zero ' \
+        'result search tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date', help='Only roll up this day (YYYY-MM-DD)')
+        parser.add_argument(
+            '--top', type=int, default=100,
+            help='Number of keywords to keep per day in each table')
+        parser.add_argument(
+            '--keep-days', type=int,
+            help='Delete search events older than this many days from '
+                 'the days rolled up by this run')
+
+    def handle(self, *args, **options):
+        events = SearchEvent.objects.all()
+
+        if options['date']:
+            try:
+                day = datetime.date.fromisoformat(options['date'])
+            except ValueError:
+                raise CommandError('--date must be in the form YYYY-MM-DD')
+            events = events.filter(created_at__date=day)
+
+        days = list(events.annotate(day=TruncDate('created_at')).values_list(
+            'day', flat=True).distinct().order_by('day'))
+
+        top_searches = zero_result_searches = 0
+        for day in days:
+            top, zero = self.rollup_day(day, options['top'])
+            top_searches += top
+            zero_result_searches += zero
+
+        deleted = 0
+        if options['keep_days'] is not None and days:
+            cutoff = timezone.now() - datetime.timedelta(
+                days=options['keep_days'])
+            # events of days that were not rolled up are kept
+            deleted, _ = SearchEvent.objects.filter(
+                created_at__lt=cutoff, created_at__date__in=days).delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {len(days)} days ({top_searches} top searches, '
+            f'{zero_result_searches} zero result searches), '
+            f'deleted {deleted} old events.'))
+
+    def rollup_day(self, day, top):
+        """Replace the rollups of a day, returns the number of rows in each
+        table"""
+        keywords = SearchEvent.objects.filter(
+            created_at__date=day).values('keywords').order_by()
+
+        top_searches = [
+            TopSearch(date=day, **row) for row in keywords.annotate(
+                searches=Count('id'),
+                average_results=Avg('results')).order_by(
+                '-searches', 'keywords')[:top]
+        ]
+        zero_result_searches = [
+            ZeroResultSearch(date=day, **row)
+            for row in keywords.filter(results=0).annotate(
+                searches=Count('id')).order_by('-searches', 'keywords')[:top]
+        ]
+
+        with transaction.atomic():
+            TopSearch.objects.filter(date=day).delete()
+            ZeroResultSearch.objects.filter(date=day).delete()
+            TopSearch.objects.bulk_create(top_searches)
+            ZeroResultSearch.objects.bulk_create(zero_result_searches)
+
+        return len(top_searches), len(zero_result_searches)
@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:17
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keywords', models.CharField(max_length=255)),
+                ('results', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ZeroResultSearch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('keywords', models.CharField(max_length=255)),
+                ('searches', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['-date', '-searches', 'keywords'],
+                'unique_together': {('date', 'keywords')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TopSearch',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('keywords', models.CharField(max_length=255)),
+                ('searches', models.PositiveIntegerField()),
+                ('average_results', models.FloatField()),
+            ],
+            options={
+                'ordering': ['-date', '-searches', 'keywords'],
+                'unique_together': {('date', 'keywords')},
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+from django.db import models
+from django.utils import timezone
+
+
+class SearchEvent(models.Model):
+    """A search run on the search page, saved in batches by record_search
+    and summarised by the rollup_search_events command"""
+    keywords = models.CharField(max_length=255)
+    results = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.keywords} ({self.results} results)'
+
+
+class TopSearch(models.Model):
+    """The most searched for keywords of a day"""
+    date = models.DateField()
+    keywords = models.CharField(max_length=255)
+    searches = models.PositiveIntegerField()
+    average_results = models.FloatField()
+
+    class Meta:
+        ordering = ['-date', '-searches', 'keywords']
+        unique_together = ('date', 'keywords')
+
+    def __str__(self):
+        return f'{self.date}: {self.keywords} ({self.searches} searches)'
+
+
+class ZeroResultSearch(models.Model):
+    """Keywords searched for on a day that found no products"""
+    date = models.DateField()
+    keywords = models.CharField(max_length=255)
+    searches = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ['-date', '-searches', 'keywords']
+        unique_together = ('date', 'keywords')
+
+    def __str__(self):
+        return f'{self.date}: {self.keywords} ({self.searches} searches)'
@@ -0,0 +1,135 @@
+import datetime
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..events import EventBuffer, search_event_buffer
+from ..models import SearchEvent, TopSearch, ZeroResultSearch
+
+
+class EventBufferTest(TestCase):
+    """Events should be held in memory and saved in batches"""
+
+    def test_events_are_saved_on_flush(self):
+        buffer = EventBuffer(SearchEvent, batch_size=2)
+        buffer.add(SearchEvent(keywords='dog bed', results=3))
+        buffer.add(SearchEvent(keywords='cat tree', results=0))
+
+        self.assertEqual(len(buffer), 2)
+        self.assertEqual(SearchEvent.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(buffer.flush(), 2)
+        self.assertEqual(len(buffer), 0)
+        self.assertEqual(SearchEvent.objects.count(), 2)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(buffer.flush(), 0)
+
+    def test_oldest_events_are_dropped_when_full(self):
+        buffer = EventBuffer(SearchEvent, batch_size=1)
+        for results in range(15):
+            buffer.add(SearchEvent(keywords='bone', results=results))
+
+        self.assertEqual(len(buffer), 10)
+        buffer.flush()
+        self.assertEqual(
+            SearchEvent.objects.order_by('results').first().results, 5)
+
+
+class SearchEventTest(TestCase):
+    """Searches entered on the search page should be recorded"""
+
+    def setUp(self):
+        cache.clear()
+        self.buffer = search_event_buffer()
+        self.buffer.clear()
+        self.addCleanup(self.buffer.clear)
+        self.url = reverse('product_search')
+
+    def test_search_is_recorded_without_writing(self):
+        self.client.get(self.url, {'keywords': '  Dog   BED '})
+        self.assertEqual(len(self.buffer), 1)
+        self.assertEqual(SearchEvent.objects.count(), 0)
+
+        self.buffer.flush()
+        event = SearchEvent.objects.get()
+        self.assertEqual(event.keywords, 'dog bed')
+        self.assertEqual(event.results, 0)
+
+    def test_later_pages_and_filters_are_not_recorded(self):
+        self.client.get(self.url, {'keywords': 'bone', 'price': '0-10'})
+        self.client.get(self.url, {'keywords': 'bone', 'page': '2'})
+        self.client.get(self.url)
+        self.assertEqual(len(self.buffer), 0)
+
+
+class RollupSearchEventsTest(TestCase):
+    """Search events should be summarised per day"""
+
+    def add_events(self, day, keywords, results, count=1):
+        created_at = timezone.make_aware(
+            datetime.datetime.combine(day, datetime.time(12)))
+        SearchEvent.objects.bulk_create(
+            SearchEvent(keywords=keywords, results=results,
+                        created_at=created_at)
+            for event in range(count))
+
+    def rollup(self, **options):
+        out = StringIO()
+        call_command('rollup_search_events', stdout=out, **options)
+        return out.getvalue()
+
+    def test_rollup(self):
+        today = timezone.now().date()
+        yesterday = today - datetime.timedelta(days=1)
+        self.add_events(yesterday, 'dog bed', 4, count=2)
+        self.add_events(yesterday, 'dog bed', 2)
+        self.add_events(yesterday, 'cat tre', 0, count=2)
+        self.add_events(yesterday, 'bone', 1)
+        self.add_events(today, 'rope toy', 0)
+
+        out = self.rollup(top=2)
+        self.assertIn('Rolled up 2 days (3 top searches, 2 zero result', out)
+
+        top = TopSearch.objects.filter(date=yesterday)
+        self.assertEqual(
+            [(row.keywords, row.searches) for row in top],
+            [('dog bed', 3), ('cat tre', 2)])
+        self.assertAlmostEqual(top[0].average_results, 10 / 3)
+        self.assertEqual(
+            list(ZeroResultSearch.objects.values_list('date', 'keywords')),
+            [(today, 'rope toy'), (yesterday, 'cat tre')])
+
+        # rolling up again replaces the day
+        self.add_events(today, 'rope toy', 0)
+        self.rollup(date=today.isoformat())
+        self.assertEqual(
+            TopSearch.objects.get(date=today, keywords='rope toy').searches,
+            2)
+        self.assertEqual(TopSearch.objects.count(), 3)
+
+    def test_old_events_are_deleted(self):
+        today = timezone.now().date()
+        self.add_events(today - datetime.timedelta(days=10), 'bone', 1)
+        self.add_events(today, 'bone', 1)
+
+        out = self.rollup(keep_days=7)
+        self.assertIn('deleted 1 old events', out)
+        self.assertEqual(SearchEvent.objects.count(), 1)
+        self.assertEqual(TopSearch.objects.count(), 2)
+
+    def test_only_rolled_up_events_are_deleted(self):
+        today = timezone.now().date()
+        old_day = today - datetime.timedelta(days=10)
+        self.add_events(old_day, 'bone', 1)
+        self.add_events(today - datetime.timedelta(days=9), 'bone', 1)
+
+        out = self.rollup(date=old_day.isoformat(), keep_days=7)
+        self.assertIn('Rolled up 1 days', out)
+        self.assertIn('deleted 1 old events', out)
+        self.assertEqual(SearchEvent.objects.count(), 1)
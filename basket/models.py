@@ -1,7 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.db.models.functions import Now
 
+from products.cache import bump_catalog_version
 from products.models import Product
 from checkout.models import Order, OrderItem
 
@@ -93,26 +95,34 @@ class Basket(models.Model):
             'stripe_id': stripe_id
         }
 
-        order = Order.objects.create(**order_data)
+        with transaction.atomic():
+            order = Order.objects.create(**order_data)
 
-        # since stripe_id is NOT None, payment has been received
-        order.status = Order.PAID
-        order.save()
+            # since stripe_id is NOT None, payment has been received
+            order.status = Order.PAID
+            order.save()
 
-        # loop through basket contents and add to orderitem object
-        for item in items:
-            for single_item in range(item.quantity):
+            order_items = []
+            for item in items.select_related('product'):
                 # input each item as a single item
                 # an item with a quantity of three will be inputted three times
-                OrderItem.objects.create(
-                    order=order,
-                    product=item.product,
-                    price=item.product.price
-                )
-
-        # update basket so it can no longer be modified
-        self.status = Basket.PROCESSED
-        self.save()
+                order_items.extend(
+                    OrderItem(order=order, product=item.product,
+                              price=item.product.price)
+                    for single_item in range(item.quantity))
+
+                # keep the best-selling ordering in step with the order items
+                Product.objects.filter(pk=item.product_id).update(
+                    sales_count=models.F('sales_count') + item.quantity,
+                    updated_at=Now())
+
+            OrderItem.objects.bulk_create(order_items)
+            # cached best-seller listings are rebuilt once the sale is saved
+            transaction.on_commit(bump_catalog_version)
+
+            # update basket so it can no longer be modified
+            self.status = Basket.PROCESSED
+            self.save()
 
         return order
 
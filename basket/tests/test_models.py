@@ -2,11 +2,13 @@ import random
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
 from basket.models import Basket, BasketItem, BasketException
-from products.models import Product
+from products.cache import bump_catalog_version
+from products.models import Category, Product
 from checkout.models import Order
 
 
@@ -19,7 +21,8 @@ class CreateOrderTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -104,6 +107,14 @@ class CreateOrderTest(TestCase):
             product=product1).count(), quantity1)
         self.assertEqual(order.orderitem_set.filter(
             product=product2).count(), quantity2)
+        # best-seller counts should follow the order items
+        product1.refresh_from_db()
+        product2.refresh_from_db()
+        self.assertEqual(product1.sales_count, quantity1)
+        self.assertEqual(product2.sales_count, quantity2)
+        # cached pages are invalidated when the test transaction commits
+        self.assertIn(bump_catalog_version, [
+            callback for savepoints, callback in connection.run_on_commit])
 
     def test_create_order_no_stripe_id(self):
         """No stripe id indicates payment was not made succesfully, raise an
@@ -10,7 +10,7 @@ from django.contrib.messages.storage.fallback import FallbackStorage
 
 from ..views import view_basket, add_to_basket
 from ..models import Basket, BasketItem
-from products.models import Product
+from products.models import Category, Product
 
 
 class ViewBasketTest(TestCase):
@@ -24,7 +24,8 @@ class ViewBasketTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -260,7 +261,8 @@ class AddToBasketTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -400,7 +402,8 @@ class GetBasketTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
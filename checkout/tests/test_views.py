@@ -8,7 +8,7 @@ from django.contrib.auth import get_user_model
 
 from ..views import process_order
 from basket.models import Basket, BasketItem
-from products.models import Product
+from products.models import Category, Product
 
 
 class ViewCheckoutTest(TestCase):
@@ -22,7 +22,8 @@ class ViewCheckoutTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             # stripe only accepts payment amounts > 0.50
             price = round(random.uniform(1, 50), 2)
             description = 'Doggie Treats'
@@ -7,7 +7,7 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 from checkout.models import Order, OrderItem
-from products.models import Product
+from products.models import Category, Product
 
 
 class ViewOrderHistoryTests(TestCase):
@@ -21,7 +21,8 @@ class ViewOrderHistoryTests(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             # stripe only accepts payment amounts > 0.50
             price = round(random.uniform(1, 50), 2)
             description = 'Doggie Treats'
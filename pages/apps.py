@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class PagesConfig(AppConfig):
     name = 'pages'
+
+    def ready(self):
+        # register the per-visitor fragments of cached pages
+        from . import fragments  # noqa: F401
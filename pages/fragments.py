@@ -0,0 +1,8 @@
+from .pagecache import register_fragment
+
+
+# parts of the site layout that depend on the visitor
+register_fragment('navbar_user', 'partials/_navbar_user.html')
+register_fragment('basket_badge', 'partials/_basket_badge.html')
+register_fragment('account_nav', 'partials/_account_nav.html')
+register_fragment('alerts', 'partials/_alerts.html')
@@ -0,0 +1,105 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from pages.staticsite import catalog_pages, link_pages, prune_releases, \
+    publish_release, read_manifest, render_page, reuse_page, \
+    write_manifest, write_page
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the home page, product list and product pages for ' \
+        'anonymous visitors to a static release, only pages whose ' \
+        'products changed since the last release are rendered again'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=settings.STATIC_EXPORT_ROOT,
+            help='Directory holding the releases and the current link')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of processes rendering pages, 0 renders them in '
+                 'this process')
+        parser.add_argument(
+            '--host',
+            help='Host name pages are rendered for, defaults to the domain '
+                 'of the current site')
+        parser.add_argument(
+            '--full', action='store_true',
+            help='Render every page, ignoring the current release')
+        parser.add_argument(
+            '--keep', type=int, default=3,
+            help='Number of releases to keep')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        root = os.path.abspath(options['output'])
+        host = options['host'] or Site.objects.get_current().domain
+
+        current = os.path.join(root, 'current')
+        previous = {} if options['full'] else read_manifest(current)
+
+        release = os.path.join(
+            root, 'releases', timezone.now().strftime('%Y%m%d%H%M%S%f'))
+        os.makedirs(release)
+
+        pages = {}
+        to_render = []
+        for url, fingerprint in catalog_pages():
+            entry = previous.get(url)
+            if entry and entry['fingerprint'] == fingerprint:
+                reuse_page(current, release, entry)
+                pages[url] = entry
+            else:
+                pages[url] = {'fingerprint': fingerprint}
+                to_render.append(url)
+
+        failed = []
+        for url, status_code, content in self.render(
+                host, to_render, options['workers']):
+            if status_code != 200:
+                failed.append(url)
+                self.stderr.write(f'{url}: status {status_code}')
+                continue
+            pages[url].update(write_page(
+                release, url, link_pages(content, url, pages)))
+
+        if failed:
+            raise CommandError(
+                f'{len(failed)} pages could not be rendered, the current '
+                f'release was not replaced')
+
+        write_manifest(release, {
+            'version': 1,
+            'created_at': timezone.now().isoformat(),
+            'host': host,
+            'pages': pages,
+        })
+        publish_release(root, release)
+        prune_releases(root, options['keep'])
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(pages)} pages ({len(to_render)} rendered, '
+            f'{len(pages) - len(to_render)} unchanged) to {release} in '
+            f'{elapsed:.1f}s.'))
+
+    def render(self, host, urls, workers):
+        """Yield (url, status code, content) for each url"""
+        if not workers:
+            for url in urls:
+                yield render_page(host, url)
+            return
+
+        # workers open their own database connections
+        connections.close_all()
+        with ProcessPoolExecutor(workers, initializer=django.setup) as pool:
+            yield from pool.map(render_page, [host] * len(urls), urls,
+                                chunksize=16)
@@ -0,0 +1,109 @@
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.crypto import salted_hmac
+from django.utils.decorators import method_decorator
+
+from products.cache import catalog_version
+
+
+# name -> (template name, function returning the template context)
+FRAGMENTS = {}
+
+FRAGMENT_RE = re.compile(r'<!--fragment:(\w+):([\w-]+)\?([^>]*)-->')
+
+
+def register_fragment(name, template_name, get_context=None):
+    """Register a per-visitor part of a page, get_context(request,
+    **kwargs) returns the context it is rendered with"""
+    FRAGMENTS[name] = (template_name, get_context)
+
+
+def render_fragment(request, name, **kwargs):
+    template_name, get_context = FRAGMENTS[name]
+    context = get_context(request, **kwargs) if get_context else kwargs
+    return render_to_string(template_name, context, request=request)
+
+
+def fragment_token():
+    # stops page content from being mistaken for a fragment
+    return salted_hmac('pages.pagecache', 'fragment').hexdigest()[:16]
+
+
+def fragment_placeholder(name, **kwargs):
+    return f'<!--fragment:{fragment_token()}:{name}?{urlencode(kwargs)}-->'
+
+
+def fill_fragments(request, content):
+    """Replace the fragment placeholders of a cached page with the parts
+    rendered for this visitor"""
+    token = fragment_token()
+
+    def render(match):
+        if match.group(1) != token or match.group(2) not in FRAGMENTS:
+            return match.group(0)
+        return render_fragment(request, match.group(2),
+                               **dict(parse_qsl(match.group(3))))
+
+    return FRAGMENT_RE.sub(render, content)
+
+
+def page_cache_key(request):
+    digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    # a catalog change moves every page to a new key
+    return f'pages:page:{catalog_version()}:{digest}'
+
+
+def is_caching_page(request):
+    """Pages being rendered for the cache output fragment placeholders"""
+    return getattr(request, '_caching_page', False)
+
+
+def cache_page(view):
+    """Cache the HTML shared by every visitor to a page, per-visitor
+    fragments are rendered into each response"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.PAGE_CACHE_ENABLED or \
+                request.method not in ('GET', 'HEAD'):
+            return view(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        page = cache.get(key)
+
+        if page is not None:
+            content, content_type = page
+            return HttpResponse(fill_fragments(request, content),
+                                content_type=content_type)
+
+        request._caching_page = True
+        try:
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and callable(response.render):
+                response.render()
+        finally:
+            request._caching_page = False
+
+        if response.streaming:
+            return response
+
+        content = response.content.decode(response.charset)
+        if response.status_code == 200:
+            cache.set(key, (content, response['Content-Type']),
+                      settings.PAGE_CACHE_TIMEOUT)
+
+        response.content = fill_fragments(request, content)
+        return response
+
+    return wrapper
+
+
+# for class based views
+page_cached = method_decorator(cache_page, name='get')
@@ -0,0 +1,213 @@
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import Count, Max
+from django.http import HttpRequest
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from products.categories import category_tree, walk
+from products.models import Product
+from products.pagination import CursorPaginator
+from products.views import ProductListView
+from recommendations.models import Recommendation
+
+
+MANIFEST_NAME = 'manifest.json'
+
+# links that only change the query string, such as pagination links
+QUERY_LINK_RE = re.compile(r'href="(\?[^"]*)"')
+
+
+def fingerprint(*parts):
+    """Summarise everything a page shows, the page is only rendered again
+    when its fingerprint changes"""
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def layout_state():
+    """The parts of the page layout that depend on the catalog, the
+    category menu lists the categories that contain products"""
+    return tuple((node['id'], node['name'], bool(node['product_count']))
+                 for node in walk(category_tree()))
+
+
+def product_list_urls():
+    """Return the urls of every page of the product list, pages can be
+    reached by both a next and a previous page link"""
+    base_url = reverse('product_list')
+    view = ProductListView()
+    view.setup(HttpRequest())
+    queryset = view.get_queryset()
+    per_page = view.get_paginate_by(queryset)
+
+    if settings.PRODUCT_PAGINATION == 'page':
+        paginator = Paginator(queryset, per_page)
+        return [base_url] + [f'{base_url}?page={number}'
+                             for number in paginator.page_range]
+
+    urls = [base_url]
+    paginator = CursorPaginator(queryset, per_page)
+    page = paginator.page()
+    while page.has_next():
+        urls.append(f'{base_url}?cursor={page.next_cursor}')
+        page = paginator.page(page.next_cursor)
+        if page.has_previous():
+            urls.append(f'{base_url}?cursor={page.previous_cursor}')
+
+    return urls
+
+
+def catalog_pages():
+    """Return (url, fingerprint) for the home page, the product list pages
+    and every live product page"""
+    layout = layout_state()
+
+    # listings show catalog wide facet counts and best sellers
+    catalog = Product.live.aggregate(
+        last_modified=Max('updated_at'), count=Count('pk'))
+    catalog_fingerprint = fingerprint(
+        layout, catalog['last_modified'], catalog['count'])
+
+    pages = [(reverse('home'), catalog_fingerprint)]
+    pages += [(url, catalog_fingerprint) for url in product_list_urls()]
+
+    products = {
+        pk: (updated_at, reviews_updated_at)
+        for pk, updated_at, reviews_updated_at in Product.live.annotate(
+            reviews_updated_at=Max('reviews__updated_at')).values_list(
+            'pk', 'updated_at', 'reviews_updated_at').iterator()
+    }
+
+    # product pages also show cards for their recommended products
+    recommended = {}
+    for product_id, recommended_id in Recommendation.objects.order_by(
+            'product', 'rank').values_list('product_id', 'recommended_id'):
+        recommended.setdefault(product_id, []).append(
+            (recommended_id, products.get(recommended_id)))
+
+    for pk, state in products.items():
+        pages.append((
+            reverse('product_detail', kwargs={'pk': pk}),
+            fingerprint(layout, state, recommended.get(pk, []))))
+
+    return pages
+
+
+def page_file(url):
+    """Return the path of the file a page is saved to, pages with a query
+    string are saved alongside the page without one"""
+    parts = urlsplit(url)
+    directory = parts.path.strip('/')
+    name = 'index.html'
+
+    if parts.query:
+        digest = hashlib.md5(parts.query.encode()).hexdigest()[:12]
+        name = f'index.{digest}.html'
+
+    return os.path.join(directory, name) if directory else name
+
+
+def link_pages(content, url, urls):
+    """Point the links of a page to other exported pages of the same path,
+    such as the next page of the product list, at the files they are saved
+    to. Static hosts ignore the query string so would serve the first page.
+    Links to pages that are not exported, such as sorted or filtered
+    listings, are left to the dynamic site."""
+    path = urlsplit(url).path
+
+    def replace(match):
+        target = path + html.unescape(match.group(1))
+        if target not in urls:
+            return match.group(0)
+        return f'href="/{page_file(target)}"'
+
+    return QUERY_LINK_RE.sub(replace, content.decode()).encode()
+
+
+def render_page(host, url):
+    """Render a page as an anonymous visitor sees it, run by the worker
+    processes of the export_static_site command. Product pages add the
+    product to the visitor's recently viewed list, the session is kept in
+    a cookie so rendering leaves no session rows behind."""
+    with override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies'):
+        response = Client(HTTP_HOST=host).get(url)
+    return url, response.status_code, response.content
+
+
+def read_manifest(path):
+    """Return the pages of the release a manifest describes, or nothing if
+    there is no readable manifest"""
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            return json.load(f)['pages']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def write_page(release, url, content):
+    """Save a rendered page in a release, returns its manifest entry"""
+    name = page_file(url)
+    path = os.path.join(release, name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(path, 'wb') as f:
+        f.write(content)
+
+    return {
+        'file': name,
+        'sha256': hashlib.sha256(content).hexdigest(),
+        'size': len(content),
+    }
+
+
+def reuse_page(previous_release, release, entry):
+    """Link an unchanged page from the previous release into a release"""
+    source = os.path.join(previous_release, entry['file'])
+    path = os.path.join(release, entry['file'])
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copy2(source, path)
+
+
+def write_manifest(release, manifest):
+    """Save the manifest, written last as it marks a complete release"""
+    with open(os.path.join(release, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def publish_release(root, release):
+    """Point the current link at a release, the link is replaced with a
+    rename so readers see either the old or the new release"""
+    current = os.path.join(root, 'current')
+    temp_link = f'{current}.{os.getpid()}.tmp'
+
+    os.symlink(os.path.relpath(release, root), temp_link)
+    os.replace(temp_link, current)
+
+
+def prune_releases(root, keep):
+    """Remove all but the newest releases, never the current one"""
+    releases_dir = os.path.join(root, 'releases')
+    current = os.path.realpath(os.path.join(root, 'current'))
+    releases = sorted(os.listdir(releases_dir), reverse=True)
+
+    removed = 0
+    for name in releases[keep:]:
+        path = os.path.join(releases_dir, name)
+        if os.path.realpath(path) != current:
+            shutil.rmtree(path)
+            removed += 1
+
+    return removed
@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..pagecache import fragment_placeholder, is_caching_page, \
+    render_fragment
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def fragment(context, name, **kwargs):
+    """Render a per-visitor part of a page, or a placeholder for it when
+    the page is being rendered for the page cache"""
+    request = context.get('request')
+
+    if request is not None and is_caching_page(request):
+        return mark_safe(fragment_placeholder(name, **kwargs))
+
+    return render_fragment(request, name, **kwargs)
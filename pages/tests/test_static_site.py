@@ -0,0 +1,112 @@
+import json
+import os
+import re
+import tempfile
+from io import StringIO
+
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from pages.staticsite import page_file
+from products.models import Category, Product
+
+
+@override_settings(PRODUCT_PAGINATION='cursor')
+class ExportStaticSiteTests(TestCase):
+    """Catalog pages should be exported to static releases, rendering only
+    the pages that changed"""
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = directory.name
+
+        category = Category.objects.create(name='Dog', slug='dog')
+        self.products = [
+            Product.objects.create(
+                title=f'Doggie Treats {number}', brand='Pawfect',
+                category=category, price=9.99, stock=11,
+                description='Doggie Treats', image='image.jpg',
+                is_live=True)
+            for number in range(10)]
+
+    def export(self, **options):
+        out = StringIO()
+        call_command('export_static_site', output=self.root, workers=0,
+                     host='testserver', stdout=out, **options)
+        return out.getvalue()
+
+    def read(self, url):
+        path = os.path.join(self.root, 'current', page_file(url))
+        with open(path) as f:
+            return f.read()
+
+    def manifest(self):
+        with open(os.path.join(self.root, 'current', 'manifest.json')) as f:
+            return json.load(f)['pages']
+
+    def test_export_renders_catalog_pages(self):
+        out = self.export()
+
+        # home, two list pages (the second also linked back to the first)
+        # and a page per product
+        self.assertIn('Exported 14 pages (14 rendered, 0 unchanged)', out)
+        self.assertIn('Doggie Treats', self.read(reverse('home')))
+        detail_url = reverse('product_detail',
+                             kwargs={'pk': self.products[3].pk})
+        self.assertIn('Doggie Treats 3', self.read(detail_url))
+
+        # list pages are saved under the urls their links point at
+        list_urls = [url for url in self.manifest()
+                     if url.split('?')[0] == reverse('product_list')]
+        self.assertEqual(len(list_urls), 3)
+
+        # pagination links lead to the exported files
+        first_page = self.read(reverse('product_list'))
+        next_link = re.search(r'href="(/products/index\.\w+\.html)"',
+                              first_page).group(1)
+        with open(os.path.join(self.root, 'current',
+                               next_link.lstrip('/'))) as f:
+            second_page = f.read()
+        # the catalog is ordered by id, so the last product is on page two
+        last = f'>{max(self.products, key=lambda p: str(p.pk)).title}<'
+        self.assertIn(last, second_page)
+        self.assertNotIn(last, first_page)
+        self.assertNotIn('?cursor=', first_page)
+        self.assertTrue(os.path.islink(os.path.join(self.root, 'current')))
+        # rendering does not store sessions for the product pages
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_only_changed_pages_are_rendered(self):
+        self.export()
+        first_release = os.path.realpath(os.path.join(self.root, 'current'))
+
+        out = self.export()
+        self.assertIn('(0 rendered, 14 unchanged)', out)
+
+        product = self.products[3]
+        product.title = 'Kitty Treats'
+        product.save()
+
+        out = self.export()
+        # the product page and the listings showing catalog wide counts
+        self.assertIn('(5 rendered, 9 unchanged)', out)
+        self.assertIn('Kitty Treats', self.read(
+            reverse('product_detail', kwargs={'pk': product.pk})))
+        self.assertNotEqual(
+            os.path.realpath(os.path.join(self.root, 'current')),
+            first_release)
+
+        out = self.export(full=True)
+        self.assertIn('(14 rendered, 0 unchanged)', out)
+
+    def test_old_releases_are_removed(self):
+        for run in range(3):
+            self.export(keep=2)
+
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.root, 'releases'))), 2)
@@ -1,6 +1,13 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
 from django.urls import reverse
 
+from basket.models import Basket, BasketItem
+from pages.pagecache import fill_fragments
+from pages.views import HomePageView
+from products.models import Category, Product
+
 
 class HomePageTests(TestCase):
     """Test that homepage view and url work"""
@@ -16,3 +23,87 @@ class HomePageTests(TestCase):
     def test_view_template(self):
         """Check that homepage is using the intended template"""
         self.assertTemplateUsed(self.response, template_name='pages/home.html')
+
+
+class HomePageBestSellerTests(TestCase):
+    """Most popular products should be read from the stored sales counts"""
+
+    def test_most_popular_ordering(self):
+        category = Category.objects.create(name='Dog', slug='dog')
+        for sales_count in (2, 9, 0, 5):
+            Product.objects.create(
+                title=f'Doggie Treats {sales_count}', brand='Pawfect',
+                category=category, price=9.99, stock=11,
+                description='Doggie Treats', image='image.jpg',
+                is_live=True, sales_count=sales_count)
+
+        with self.assertNumQueries(1):
+            most_popular = list(
+                HomePageView().get_context_data()['most_popular'])
+
+        self.assertEqual([product.sales_count for product in most_popular],
+                         [9, 5, 2, 0])
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class PageCacheTests(TestCase):
+    """Cached pages should be shared by visitors with their own fragments
+    rendered in"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            title='Doggie Treats', brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99, stock=11, description='Doggie Treats',
+            image='image.jpg', is_live=True)
+        self.detail_url = reverse('product_detail',
+                                  kwargs={'pk': self.product.pk})
+        self.user = get_user_model().objects.create_user(
+            username='test@test.com', email='test@test.com',
+            password='pass1234', first_name='doogan')
+
+    def test_pages_are_cached(self):
+        # catalog pages still read their last modified date for the ETag,
+        # product pages also load the session of recently viewed products
+        for url, queries in ((reverse('home'), 1), (reverse('about'), 0),
+                             (reverse('product_list'), 1),
+                             (self.detail_url, 2)):
+            first = self.client.get(url)
+            self.assertEqual(first.status_code, 200)
+
+            with self.assertNumQueries(queries):
+                second = self.client.get(url)
+            self.assertEqual(second.content, first.content)
+            self.assertNotContains(second, '<!--fragment:')
+
+    def test_fragments_are_rendered_per_visitor(self):
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Login</a>')
+        self.assertContains(response, 'to leave a review')
+
+        self.client.force_login(self.user)
+        basket = Basket.objects.create(user=self.user)
+        BasketItem.objects.create(basket=basket, product=self.product,
+                                  quantity=3)
+
+        response = self.client.get(self.detail_url)
+        self.assertContains(response, 'Doogan')
+        self.assertContains(response, 'cart-badge">3</span>')
+        self.assertContains(response, 'Add a product review')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertIn('csrftoken', response.cookies)
+
+    def test_catalog_changes_replace_pages(self):
+        self.client.get(self.detail_url)
+
+        self.product.title = 'Kitty Treats'
+        self.product.save()
+
+        self.assertContains(self.client.get(self.detail_url), 'Kitty Treats')
+
+    def test_unknown_placeholders_are_left(self):
+        content = '<p><!--fragment:0000:alerts?--></p>'
+        request = RequestFactory().get('/')
+
+        self.assertEqual(fill_fragments(request, content), content)
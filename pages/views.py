@@ -1,24 +1,29 @@
 from django.views.generic import TemplateView
-from django.db.models import Count, Avg
 
+from products.conditional import catalog_conditional
 from products.models import Product
 
+from .pagecache import page_cached
 
+
+@catalog_conditional
+@page_cached
 class HomePageView(TemplateView):
     """Show most popular and newest products to end-user"""
     template_name = 'pages/home.html'
 
     def get_context_data(self, **kwargs):
         context = super(HomePageView, self).get_context_data(**kwargs)
-        # get top 5 sellers
-        context['most_popular'] = Product.objects.annotate(
-            items_sold=Count('orderitem'),
-            rating=Avg('reviews__rating')).order_by('-items_sold')[:5]
+        # get top 5 sellers, sales_count is kept up to date as orders are
+        # placed so this reads the best-selling index
+        context['most_popular'] = Product.live.order_by(
+            '-sales_count', '-id')[:5]
         # get the last 5 products added
-        context['new_products'] = Product.objects.annotate(
-            rating=Avg('reviews__rating')).order_by('-id')[:5]
+        context['new_products'] = Product.live.order_by(
+            '-created_at', '-id')[:5]
         return context
 
 
+@page_cached
 class AboutView(TemplateView):
     template_name = 'pages/about.html'
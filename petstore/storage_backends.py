@@ -1,13 +1,89 @@
+import threading
+import time
+from collections import OrderedDict
+
 from storages.backends.s3boto3 import S3Boto3Storage
 from django.conf import settings
 
 
-class StaticStorage(S3Boto3Storage):
-    location = settings.STATIC_LOCATION
+class CachedURLMixin:
+    """Remember the URL of each file so pages that show the same images on
+    every request do not rebuild (or re-sign) them each time. Signed URLs
+    are only reused for half of their lifetime."""
+    url_cache_size = 4096
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._url_cache = OrderedDict()
+        self._url_cache_lock = threading.Lock()
+
+    def url(self, name, *args, **kwargs):
+        if args or kwargs:
+            # custom parameters or expiry, not worth caching
+            return super().url(name, *args, **kwargs)
+
+        now = time.monotonic()
+        with self._url_cache_lock:
+            cached = self._url_cache.get(name)
+            if cached and (cached[1] is None or cached[1] > now):
+                self._url_cache.move_to_end(name)
+                return cached[0]
+
+        url = super().url(name)
+
+        expires = None
+        if getattr(self, 'querystring_auth', False) and \
+                not getattr(self, 'custom_domain', None):
+            expires = now + self.querystring_expire / 2
+
+        with self._url_cache_lock:
+            self._url_cache[name] = (url, expires)
+            self._url_cache.move_to_end(name)
+            if len(self._url_cache) > self.url_cache_size:
+                self._url_cache.popitem(last=False)
+
+        return url
+
+    def _save(self, name, content):
+        name = super()._save(name, content)
+        self.forget_url(name)
+        return name
+
+    def delete(self, name):
+        super().delete(name)
+        self.forget_url(name)
+
+    def forget_url(self, name):
+        with self._url_cache_lock:
+            self._url_cache.pop(name, None)
+
+
+class DirectUploadMixin:
+    """Let browsers upload files straight to the bucket with a presigned
+    POST instead of streaming them through a Django worker"""
+
+    def presigned_post(self, name, content_type, max_size, expires):
+        fields = {'Content-Type': content_type}
+        conditions = [
+            {'Content-Type': content_type},
+            ['content-length-range', 1, max_size],
+        ]
+        if self.default_acl:
+            fields['acl'] = self.default_acl
+            conditions.append({'acl': self.default_acl})
+
+        return self.bucket.meta.client.generate_presigned_post(
+            self.bucket_name, self._normalize_name(self._clean_name(name)),
+            Fields=fields, Conditions=conditions, ExpiresIn=expires)
+
+
+class StaticStorage(CachedURLMixin, S3Boto3Storage):
+    location = getattr(settings, 'STATIC_LOCATION', 'static')
     default_acl = 'public-read'
 
 
-class PublicMediaStorage(S3Boto3Storage):
-    location = settings.PUBLIC_MEDIA_LOCATION
+class PublicMediaStorage(DirectUploadMixin, CachedURLMixin,
+                         S3Boto3Storage):
+    location = getattr(settings, 'PUBLIC_MEDIA_LOCATION', 'media')
     default_acl = 'public-read'
     file_overwrite = False
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Product, Review
+from .forms import ProductForm
+from .models import Category, Product, Review
 
 
 class ReviewInline(admin.TabularInline):
@@ -10,13 +11,24 @@ class ReviewInline(admin.TabularInline):
 
 class ProductAdmin(admin.ModelAdmin):
     """Update view for admin panel"""
+    form = ProductForm
     list_display = ('title', 'brand', 'category', 'price', 'is_live')
     list_editable = ('is_live',)
-    list_filter = ('is_live', 'brand', )
+    list_filter = ('is_live', 'brand', 'category')
 
     inlines = [
         ReviewInline,
     ]
 
+    class Media:
+        js = ('js/product_upload.js',)
+
+
+class CategoryAdmin(admin.ModelAdmin):
+    """Categories are listed in tree order"""
+    list_display = ('name', 'parent', 'slug', 'path')
+    prepopulated_fields = {'slug': ('name',)}
+
 
 admin.site.register(Product, ProductAdmin)
+admin.site.register(Category, CategoryAdmin)
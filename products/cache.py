@@ -0,0 +1,107 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .search import tokenize
+
+
+CATALOG_VERSION_KEY = 'products:catalog_version'
+SEARCH_VERSION_KEY = 'products:search_version'
+SEARCH_HITS_KEY = 'products:search_cache:hits'
+SEARCH_MISSES_KEY = 'products:search_cache:misses'
+
+
+def catalog_version():
+    """Return the current catalog version, cached data built from products
+    includes it in the key so a version bump invalidates all of it"""
+    return _version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version():
+    """Invalidate cached catalog data after products or reviews change"""
+    _bump_version(CATALOG_VERSION_KEY)
+
+
+def search_version():
+    """Return the version of the searchable product text, it only changes
+    with the text (not with reviews, stock or sales) so the search indexes
+    are not rebuilt needlessly"""
+    return _version(SEARCH_VERSION_KEY)
+
+
+def bump_search_version():
+    """Have every process rebuild its search indexes"""
+    _bump_version(SEARCH_VERSION_KEY)
+
+
+def _version(key):
+    version = cache.get(key)
+
+    if version is None:
+        # add keeps the version of a process that got there first
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+
+    return version
+
+
+def _bump_version(key):
+    # versions are random rather than incremented, incr is a read and a
+    # write on some backends so two bumps at once could share a version,
+    # and an evicted version is never reused
+    cache.set(key, uuid.uuid4().hex, None)
+
+
+def normalize_query(keywords):
+    """Reduce keywords to the sorted, de-duplicated search terms, queries
+    differing only in case, spacing or word order share results"""
+    return ' '.join(sorted(set(tokenize(keywords))))
+
+
+def search_cache_key(keywords):
+    digest = hashlib.md5(normalize_query(keywords).encode()).hexdigest()
+    return f'products:search:{catalog_version()}:{digest}'
+
+
+def cached_search(keywords, search):
+    """Return the ordered product ids for keywords from the cache, calling
+    search(keywords) on a miss"""
+    key = search_cache_key(keywords)
+    product_ids = cache.get(key)
+
+    if product_ids is None:
+        _increment(SEARCH_MISSES_KEY)
+        product_ids = search(keywords)
+        cache.set(key, product_ids, settings.PRODUCT_SEARCH_CACHE_TIMEOUT)
+    else:
+        _increment(SEARCH_HITS_KEY)
+
+    return product_ids
+
+
+def search_cache_stats():
+    """Return the number of search cache hits and misses"""
+    hits, misses = (cache.get(SEARCH_HITS_KEY, 0),
+                    cache.get(SEARCH_MISSES_KEY, 0))
+    lookups = hits + misses
+
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / lookups if lookups else 0,
+    }
+
+
+def reset_search_cache_stats():
+    cache.delete_many([SEARCH_HITS_KEY, SEARCH_MISSES_KEY])
+
+
+def _increment(key):
+    # add is a no-op when the counter already exists
+    cache.add(key, 0, None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
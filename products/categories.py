@@ -0,0 +1,103 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count
+
+from .models import Category, Product
+
+
+CATEGORY_TREE_KEY = 'products:category_tree'
+
+
+def build_category_tree():
+    """Return the root categories, each holding its children, with the
+    number of live products in the category and everything below it"""
+    counts = dict(Product.live.order_by().values_list('category').annotate(
+        total=Count('pk')))
+
+    nodes = {}
+    roots = []
+
+    # ordering by path visits every parent before its children
+    for category in Category.objects.order_by('path'):
+        node = {
+            'id': category.pk,
+            'name': category.name,
+            'slug': category.slug,
+            'path': category.path,
+            'depth': category.depth,
+            'parent_id': category.parent_id,
+            'full_name': category.name,
+            'product_count': counts.get(category.pk, 0),
+            'children': [],
+        }
+
+        parent = nodes.get(category.parent_id)
+        if parent:
+            node['full_name'] = f'{parent["full_name"]} > {category.name}'
+            parent['children'].append(node)
+        else:
+            roots.append(node)
+        nodes[category.pk] = node
+
+    # children are visited before their parents in reverse
+    for node in reversed(list(nodes.values())):
+        parent = nodes.get(node['parent_id'])
+        if parent:
+            parent['product_count'] += node['product_count']
+        node['children'].sort(key=lambda child: child['name'])
+
+    roots.sort(key=lambda node: node['name'])
+    return roots
+
+
+def category_tree():
+    """Return the cached category tree, it is rebuilt after categories or
+    products change"""
+    tree = cache.get(CATEGORY_TREE_KEY)
+
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(CATEGORY_TREE_KEY, tree, None)
+
+    return tree
+
+
+def invalidate_category_tree():
+    cache.delete(CATEGORY_TREE_KEY)
+
+
+def walk(nodes):
+    """Yield every category in a tree, parents before their children"""
+    for node in nodes:
+        yield node
+        yield from walk(node['children'])
+
+
+def category_nodes():
+    """Return every category in the tree keyed by id"""
+    return {node['id']: node for node in walk(category_tree())}
+
+
+def path_ids(path):
+    """Return the ids in a category path, root first"""
+    return [int(pk) for pk in path.strip('/').split('/')]
+
+
+def count_categories(queryset):
+    """Count the products of a queryset in each category, including the
+    products in categories below it"""
+    counts = queryset.order_by().values_list('category').annotate(
+        total=Count('pk'))
+    tree = category_tree()
+    nodes = {node['id']: node for node in walk(tree)}
+
+    totals = Counter()
+    for category_id, total in counts:
+        node = nodes.get(category_id)
+        if node:
+            for pk in path_ids(node['path']):
+                totals[pk] += total
+
+    return [(node['id'], node['full_name'], totals[node['id']])
+            for node in walk(tree) if totals[node['id']]]
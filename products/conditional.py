@@ -0,0 +1,112 @@
+import hashlib
+
+from django.contrib.messages import get_messages
+from django.db.models import Max
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .cache import catalog_version
+from .models import Product
+from .recent import viewed_product_ids
+
+
+def layout_state(request):
+    """Return the per-request parts of the page layout (the signed in user
+    and the basket badge), or None when the page shows one-off messages
+    and so must always be rendered"""
+    if len(get_messages(request)):
+        return None
+
+    user = request.user
+    basket = getattr(request, 'basket', None)
+
+    return (
+        user.pk if user.is_authenticated else None,
+        user.first_name if user.is_authenticated else '',
+        basket.pk if basket else None,
+        basket.count() if basket else 0,
+    )
+
+
+def validate_by_date(request):
+    """Pages without any per-user layout can also be validated by date"""
+    return not request.user.is_authenticated and \
+        not getattr(request, 'basket', None) and \
+        cached_validator(request, 'layout', layout_state, request) is not None
+
+
+def catalog_last_modified():
+    """Return when any product was last changed"""
+    return Product.objects.aggregate(last=Max('updated_at'))['last']
+
+
+def product_last_modified(pk):
+    """Return when a product, or any of its reviews, was last changed"""
+    row = Product.live.filter(pk=pk).annotate(
+        reviews_updated_at=Max('reviews__updated_at')).values_list(
+        'updated_at', 'reviews_updated_at').first()
+
+    if row is None:
+        return None
+    return max(value for value in row if value is not None)
+
+
+def cached_validator(request, key, func, *args):
+    """Compute a validator once per request, conditional GETs ask for the
+    ETag and the last modified date separately"""
+    validators = request.__dict__.setdefault('_page_validators', {})
+    if key not in validators:
+        validators[key] = func(*args)
+    return validators[key]
+
+
+def viewed_before(request, pk):
+    """Return the products shown in the recently viewed strip of a product
+    page"""
+    session = getattr(request, 'session', {})
+    return tuple(str(product_id) for product_id in viewed_product_ids(session)
+                 if product_id != pk)
+
+
+def page_etag(request, last_modified, extra=()):
+    state = cached_validator(request, 'layout', layout_state, request)
+    if state is None or last_modified is None:
+        return None
+
+    # the catalog version covers deletions and the navigation menu
+    data = repr((last_modified.isoformat(), catalog_version()) + state +
+                extra)
+    return hashlib.md5(data.encode()).hexdigest()
+
+
+def catalog_etag(request, *args, **kwargs):
+    return page_etag(request, cached_validator(
+        request, 'catalog', catalog_last_modified))
+
+
+def catalog_modified(request, *args, **kwargs):
+    if not validate_by_date(request):
+        return None
+    return cached_validator(request, 'catalog', catalog_last_modified)
+
+
+def product_etag(request, pk, *args, **kwargs):
+    return page_etag(request, cached_validator(
+        request, 'product', product_last_modified, pk),
+        viewed_before(request, pk))
+
+
+def product_modified(request, pk, *args, **kwargs):
+    if not validate_by_date(request) or viewed_before(request, pk):
+        return None
+    return cached_validator(request, 'product', product_last_modified, pk)
+
+
+# answer If-None-Match/If-Modified-Since with 304 before a view does any
+# work, for class based views
+catalog_conditional = method_decorator(
+    condition(etag_func=catalog_etag, last_modified_func=catalog_modified),
+    name='get')
+product_conditional = method_decorator(
+    condition(etag_func=product_etag, last_modified_func=product_modified),
+    name='get')
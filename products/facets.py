@@ -0,0 +1,148 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from .cache import catalog_version, search_cache_key
+from .categories import category_nodes, count_categories
+from .models import Product
+
+
+# key, label, minimum price (inclusive), maximum price (exclusive)
+PRICE_BANDS = (
+    ('0-10', '0 - 9.99', Decimal('0'), Decimal('10')),
+    ('10-20', '10 - 19.99', Decimal('10'), Decimal('20')),
+    ('20-50', '20 - 49.99', Decimal('20'), Decimal('50')),
+    ('50-250', '50 - 249.99', Decimal('50'), Decimal('250')),
+    ('250+', '250+', Decimal('250'), None),
+)
+
+# minimum average rating, also used for the star ratings of reviews
+RATINGS = (5, 4, 3, 2, 1)
+
+
+def price_band_filter(key):
+    for band_key, label, minimum, maximum in PRICE_BANDS:
+        if band_key == key:
+            condition = Q(price__gte=minimum)
+            if maximum is not None:
+                condition &= Q(price__lt=maximum)
+            return condition
+    return None
+
+
+def parse_filters(params):
+    """Return the valid facet filters in a query dict"""
+    filters = {}
+
+    if price_band_filter(params.get('price')) is not None:
+        filters['price'] = params['price']
+
+    try:
+        category = int(params.get('category', ''))
+        if category in category_nodes():
+            filters['category'] = category
+    except ValueError:
+        pass
+
+    try:
+        rating = int(params.get('rating', ''))
+        if rating in RATINGS:
+            filters['rating'] = rating
+    except ValueError:
+        pass
+
+    try:
+        stars = int(params.get('stars', ''))
+        if stars in RATINGS:
+            filters['stars'] = stars
+    except ValueError:
+        pass
+
+    return filters
+
+
+def apply_filters(queryset, filters):
+    """Restrict a product queryset to the given facet filters"""
+    if 'price' in filters:
+        queryset = queryset.filter(price_band_filter(filters['price']))
+    if 'category' in filters:
+        # the category and every category below it
+        path = category_nodes()[filters['category']]['path']
+        queryset = queryset.filter(category__path__startswith=path)
+    if 'rating' in filters:
+        queryset = queryset.filter(rating_avg__gte=filters['rating'])
+    if 'stars' in filters:
+        # at least one review with the given rating
+        queryset = queryset.filter(**{f'rating_{filters["stars"]}__gt': 0})
+    return queryset
+
+
+def count_facets(queryset):
+    """Count products per price band, category, minimum rating and review
+    stars with one grouped query and one conditional aggregate, category
+    counts include the products in categories below them"""
+    totals = queryset.aggregate(
+        **{f'price_{index}': Count('pk', filter=price_band_filter(key))
+           for index, (key, *band) in enumerate(PRICE_BANDS)},
+        **{f'min_rating_{rating}': Count(
+            'pk', filter=Q(rating_avg__gte=rating))
+           for rating in RATINGS},
+        **{f'stars_{stars}': Count(
+            'pk', filter=Q(**{f'rating_{stars}__gt': 0}))
+           for stars in RATINGS})
+
+    return {
+        'price': [(key, label, totals[f'price_{index}'])
+                  for index, (key, label, *limits) in enumerate(PRICE_BANDS)],
+        'category': count_categories(queryset),
+        'rating': [(rating, rating, totals[f'min_rating_{rating}'])
+                   for rating in RATINGS],
+        'stars': [(stars, stars, totals[f'stars_{stars}'])
+                  for stars in RATINGS],
+    }
+
+
+def facet_groups(counts, filters):
+    """Arrange facet counts for display, marking the selected options"""
+    titles = (('price', 'Price'), ('category', 'Category'),
+              ('rating', 'Rating'), ('stars', 'Reviews'))
+
+    # counts cached before a facet was added do not include it
+    return [{
+        'name': name,
+        'title': title,
+        'options': [{
+            'value': value,
+            'label': label,
+            'count': count,
+            'active': filters.get(name) == value,
+        } for value, label, count in counts.get(name, ())],
+    } for name, title in titles]
+
+
+def catalog_facets():
+    """Facet counts for the whole live catalog, recounted once per catalog
+    version"""
+    key = f'products:facets:{catalog_version()}'
+    counts = cache.get(key)
+
+    if counts is None:
+        counts = count_facets(Product.live.all())
+        cache.set(key, counts, None)
+
+    return counts
+
+
+def search_facets(keywords, product_ids):
+    """Facet counts for the products matching a search, cached alongside
+    the search results"""
+    key = search_cache_key(keywords) + ':facets'
+    counts = cache.get(key)
+
+    if counts is None:
+        counts = count_facets(Product.live.filter(pk__in=product_ids))
+        cache.set(key, counts, settings.PRODUCT_SEARCH_CACHE_TIMEOUT)
+
+    return counts
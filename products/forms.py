@@ -1,5 +1,7 @@
-from .models import Review
+from .models import Product, Review
+from .uploads import direct_uploads_enabled, is_upload_key
 from django import forms
+from django.urls import reverse
 
 from crispy_forms.bootstrap import Field
 from crispy_forms.helper import FormHelper
@@ -32,3 +34,46 @@ class ReviewForm(forms.ModelForm):
                          css_class='row')
                      )
         )
+
+
+class ProductForm(forms.ModelForm):
+    """Create and update products, when images are stored on S3 the browser
+    uploads the image itself and only its storage key is submitted"""
+    image_key = forms.CharField(required=False, widget=forms.HiddenInput)
+
+    class Meta:
+        model = Product
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.direct_upload = direct_uploads_enabled()
+
+        if self.direct_upload:
+            # the file input is used by product_upload.js, a key is
+            # submitted instead of the file
+            self.fields['image'].required = False
+            self.fields['image'].widget.attrs['data-upload-url'] = \
+                reverse('product_image_upload')
+
+    def clean_image_key(self):
+        key = self.cleaned_data['image_key']
+        if key and not (self.direct_upload and is_upload_key(key)):
+            raise forms.ValidationError(
+                'The uploaded image could not be found, please try again.')
+        return key
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.direct_upload and not cleaned_data.get('image') and \
+                not cleaned_data.get('image_key') and \
+                'image_key' not in self.errors:
+            self.add_error(
+                'image', self.fields['image'].error_messages['required'])
+        return cleaned_data
+
+    def save(self, commit=True):
+        if self.cleaned_data.get('image_key'):
+            # the file is already in storage
+            self.instance.image = self.cleaned_data['image_key']
+        return super().save(commit)
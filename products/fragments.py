@@ -0,0 +1,31 @@
+from pages.pagecache import register_fragment
+
+from .forms import ReviewForm
+from .models import Review
+from .recent import recently_viewed_products
+
+
+def review_form_context(request, product_id):
+    """The review form is only shown to users who have not yet reviewed
+    the product"""
+    context = {'form': ReviewForm()}
+
+    if request.user.is_authenticated and not Review.objects.filter(
+            product_id=product_id, user=request.user).exists():
+        context['display_form'] = True
+
+    return context
+
+
+def recently_viewed_context(request, product_id=None):
+    """Products the visitor viewed before, other than the one on the
+    page"""
+    return {'recently_viewed': recently_viewed_products(
+        getattr(request, 'session', {}), exclude=product_id, limit=4)}
+
+
+register_fragment('product_admin', 'partials/_product_admin.html')
+register_fragment('review_form', 'partials/_review_form.html',
+                  review_form_context)
+register_fragment('recently_viewed', 'partials/_recently_viewed.html',
+                  recently_viewed_context)
@@ -0,0 +1,171 @@
+import atexit
+import io
+import logging
+import os
+import queue
+import threading
+
+from PIL import Image, ImageOps
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.db.models.functions import Now
+
+from .cache import bump_catalog_version
+from .models import Product
+
+
+logger = logging.getLogger(__name__)
+
+
+# name, bounding box - images are scaled to fit, keeping their proportions
+VARIANTS = (
+    ('thumbnail', (160, 160)),
+    ('card', (480, 480)),
+    ('detail', (960, 960)),
+)
+
+# format, file extension, mime type, encoder options - the browser picks
+# the first format it supports so the smallest come first
+FORMATS = (
+    ('AVIF', 'avif', 'image/avif', {'quality': 50, 'speed': 8}),
+    ('WEBP', 'webp', 'image/webp', {'quality': 80, 'method': 4}),
+    ('JPEG', 'jpg', 'image/jpeg', {'quality': 82, 'optimize': True,
+                                   'progressive': True}),
+)
+
+
+def supported_formats():
+    """Return the formats the installed Pillow can encode, AVIF needs a
+    recent Pillow built with libavif"""
+    Image.init()
+    return [image_format for image_format in FORMATS
+            if image_format[0] in Image.SAVE]
+
+
+MIME_TYPES = {extension: mime_type
+              for image_format, extension, mime_type, options in FORMATS}
+
+
+def variant_name(name, variant, extension):
+    """Return the storage name of a variant of an image,
+    'products/bone.jpg' becomes 'derivatives/products/bone_card.webp'"""
+    root, ext = os.path.splitext(name)
+    return f'derivatives/{root}_{variant}.{extension}'
+
+
+def generate_derivatives(storage, name):
+    """Create every variant of a stored image in each supported format and
+    save them to the same storage, returns the extensions generated"""
+    with storage.open(name, 'rb') as f:
+        original = Image.open(f)
+        # let the JPEG decoder downscale while reading, much faster than
+        # decoding the full image for large uploads
+        original.draft('RGB', VARIANTS[-1][1])
+        original = ImageOps.exif_transpose(original).convert('RGB')
+
+    formats = supported_formats()
+
+    # largest first so each variant is resized from the one before it
+    image = original
+    for variant, size in reversed(VARIANTS):
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+
+        for image_format, extension, mime_type, options in formats:
+            data = io.BytesIO()
+            image.save(data, image_format, **options)
+
+            variant_path = variant_name(name, variant, extension)
+            # storages such as S3 rename rather than replace existing files
+            if storage.exists(variant_path):
+                storage.delete(variant_path)
+            storage.save(variant_path, ContentFile(data.getvalue()))
+
+    return [extension for image_format, extension, *rest in formats]
+
+
+def process_image(item):
+    """Generate the variants of one product image, run in a worker process
+    by the generate_product_images command so it only touches storage"""
+    product_id, name = item
+    storage = Product._meta.get_field('image').storage
+    try:
+        return product_id, name, generate_derivatives(storage, name), None
+    except Exception as e:
+        # one broken image must not stop the others, pages fall back to
+        # the original image
+        logger.exception('Could not generate variants of %s', name)
+        return product_id, name, None, str(e)
+
+
+def save_derivatives(product_id, name, extensions):
+    """Record the variants available for a product image, ignored if the
+    image has been replaced since they were generated"""
+    Product.objects.filter(pk=product_id, image=name).update(
+        image_derivatives=','.join(extensions), updated_at=Now())
+
+
+def update_product_images(product_id, name):
+    """Generate the variants of a newly saved product image"""
+    product_id, name, extensions, error = process_image((product_id, name))
+
+    if not error:
+        save_derivatives(product_id, name, extensions)
+        bump_catalog_version()
+
+
+class ImageQueue:
+    """Generates the variants of saved images in a background thread so
+    saving a product never waits on encoding. Images still waiting when
+    a process is killed are picked up by the generate_product_images
+    command."""
+
+    def __init__(self):
+        self.items = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def add(self, product_id, name):
+        """Queue an image to have its variants generated"""
+        with self._lock:
+            self._start_worker()
+            self.items.put((product_id, name))
+
+    def join(self):
+        """Wait for the queued images to be processed"""
+        self.items.join()
+
+    def _start_worker(self):
+        pid = os.getpid()
+        if self._thread is not None and self._pid == pid:
+            return
+
+        if self._pid is not None:
+            # a forked process inherits the parent's images but not its
+            # thread, the parent processes those images itself
+            self.items = queue.Queue()
+        else:
+            atexit.register(self.join)
+
+        self._pid = pid
+        self._thread = threading.Thread(
+            target=self._run, name='ProductImages', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            product_id, name = self.items.get()
+            try:
+                update_product_images(product_id, name)
+            except Exception:
+                # keep the thread alive for the next image
+                logger.exception('Could not save variants of %s', name)
+            finally:
+                # the thread's connection is not closed by request handling
+                connection.close()
+                self.items.task_done()
+
+
+image_queue = ImageQueue()
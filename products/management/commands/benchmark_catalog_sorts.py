@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils.text import slugify
+
+from products.models import Category, Product
+from products.pagination import CursorPaginator
+from products.signals import catalog_signals_disconnected
+from products.sorting import SORT_OPTIONS
+
+
+class Command(BaseCommand):
+    help = 'Report the query plan and latency of every catalog sort mode ' \
+        'against a synthetic catalog, nothing is left in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--products', type=int, default=100000,
+            help='Number of synthetic products to create')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of times each page is fetched')
+        parser.add_argument(
+            '--page-size', type=int, default=8,
+            help='Number of products per page')
+
+    def handle(self, *args, **options):
+        # the synthetic catalog must not invalidate the real one's caches
+        with transaction.atomic(), catalog_signals_disconnected():
+            self.create_catalog(options['products'])
+
+            for key, label, ordering in SORT_OPTIONS:
+                self.benchmark(key, ordering, options['page_size'],
+                               options['repeat'])
+
+            # discard the synthetic catalog
+            transaction.set_rollback(True)
+
+    def create_catalog(self, total):
+        started = time.perf_counter()
+        categories = [
+            Category.objects.create(name=name, slug=slugify(name))
+            for name in ('Dog', 'Cat', 'Fish', 'Bird', 'Small Animal')]
+        batch_size = 5000
+
+        for start in range(0, total, batch_size):
+            Product.objects.bulk_create([
+                Product(
+                    title=f'Benchmark product {number}',
+                    brand=f'Brand {number % 250}',
+                    category=random.choice(categories),
+                    price=Decimal(random.randint(99, 99999)) / 100,
+                    stock=random.randint(0, 100),
+                    description='Synthetic product used for benchmarking',
+                    image=None,
+                    # roughly one in ten products is not on sale
+                    is_live=random.random() > 0.1,
+                    rating_avg=round(random.uniform(0, 5), 1),
+                    sales_count=int(random.paretovariate(1.5)) - 1,
+                )
+                for number in range(start, min(start + batch_size, total))
+            ])
+
+        # make sure the planner has statistics for the new rows
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Product._meta.db_table}')
+
+        self.stdout.write(
+            f'Created {total} products in '
+            f'{time.perf_counter() - started:.1f}s\n')
+
+    def benchmark(self, key, ordering, page_size, repeat):
+        queryset = Product.live.order_by(*ordering)
+        paginator = CursorPaginator(queryset, page_size)
+
+        # a cursor half way through the catalog, keyset pagination should
+        # make this as cheap as the first page
+        middle = queryset[queryset.count() // 2]
+        cursor = paginator.encode_cursor(paginator.NEXT, middle)
+
+        first_page = self.time(lambda: paginator.page(), repeat)
+        deep_page = self.time(lambda: paginator.page(cursor), repeat)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{key} ({", ".join(ordering)})'))
+        self.stdout.write(queryset[:page_size + 1].explain())
+        self.stdout.write(
+            f'first page: {first_page:.2f}ms, '
+            f'middle page: {deep_page:.2f}ms\n')
+
+    @staticmethod
+    def time(fetch, repeat):
+        """Return the median time taken to fetch a page in milliseconds"""
+        timings = []
+        for attempt in range(repeat):
+            started = time.perf_counter()
+            fetch()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,96 @@
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import override_settings
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from petstore.storage_backends import CachedURLMixin
+from products.models import Category, Product
+
+
+class UncachedStorage(S3Boto3Storage):
+    pass
+
+
+class CachedStorage(CachedURLMixin, S3Boto3Storage):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Compare product listing render times with and without the ' \
+        'storage URL cache, against a local S3 compatible endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=200,
+            help='Number of listing pages to render')
+        parser.add_argument(
+            '--per-page', type=int, default=8,
+            help='Number of products per page')
+        parser.add_argument(
+            '--endpoint-url', default='http://127.0.0.1:9000',
+            help='S3 compatible endpoint, e.g. a local MinIO server. URLs '
+                 'are built locally so nothing needs to be listening')
+        parser.add_argument(
+            '--custom-domain', default=None,
+            help='Serve unsigned URLs from this domain instead of signed '
+                 'endpoint URLs')
+
+    def handle(self, *args, **options):
+        storage_options = {
+            'access_key': 'benchmark',
+            'secret_key': 'benchmark',
+            'bucket_name': 'benchmark',
+            'endpoint_url': options['endpoint_url'],
+            'custom_domain': options['custom_domain'],
+            'location': 'media',
+            'default_acl': None,
+        }
+
+        field = Product._meta.get_field('image')
+        original_storage = field.storage
+
+        # product cards are cached fragments, every page would be served
+        # from the cache without building any image URLs
+        dummy_cache = {'default': {
+            'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        try:
+            for label, storage in (
+                    ('uncached', UncachedStorage(**storage_options)),
+                    ('cached', CachedStorage(**storage_options))):
+                # product files pick up the storage of the field
+                field.storage = storage
+                with override_settings(CACHES=dummy_cache):
+                    timings = self.render_pages(
+                        options['pages'], options['per_page'])
+
+                self.stdout.write(
+                    f'{label}: {statistics.median(timings):.3f}ms median, '
+                    f'{statistics.mean(timings):.3f}ms mean per page')
+        finally:
+            field.storage = original_storage
+
+    def render_pages(self, pages, per_page):
+        """Render listing pages of the same products, as successive
+        requests for a catalog page would"""
+        category = Category(pk=1, name='Dog', slug='dog', path='/1/')
+        products = [
+            Product(id=uuid.uuid4(), title=f'Benchmark product {number}',
+                    brand='Pawfect', category=category, price=9.99,
+                    image=f'products/benchmark_{number}.jpg',
+                    image_derivatives='avif,webp,jpg', rating_avg=4)
+            for number in range(per_page)
+        ]
+
+        timings = []
+        for page in range(pages):
+            started = time.perf_counter()
+            for product in products:
+                render_to_string('partials/_product_listing.html',
+                                 {'product': product})
+            timings.append((time.perf_counter() - started) * 1000)
+        return timings
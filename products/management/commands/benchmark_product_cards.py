@@ -0,0 +1,99 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.template.loader import get_template
+from django.test import RequestFactory
+
+from products.models import Category, Product
+from products.signals import catalog_signals_disconnected
+
+
+class Command(BaseCommand):
+    help = 'Compare rendering pages of product cards with and without the ' \
+        'card fragment cache, nothing is left in the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=20,
+            help='Number of pages rendered')
+        parser.add_argument(
+            '--per-page', type=int, default=8,
+            help='Number of products per page')
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Number of times each measurement is taken')
+
+    def handle(self, *args, **options):
+        total = options['pages'] * options['per_page']
+
+        # the synthetic products must not invalidate the real catalog's caches
+        with transaction.atomic(), catalog_signals_disconnected():
+            category = Category.objects.create(name='Benchmark',
+                                               slug='benchmark')
+            Product.objects.bulk_create([
+                Product(title=f'Benchmark product {number}',
+                        brand='Benchmark', category=category,
+                        price=Decimal(number % 5000) / 100 + 1,
+                        description='Synthetic product used for '
+                        'benchmarking', image=f'benchmark/{number}.jpg',
+                        rating_avg=number % 6)
+                for number in range(total)
+            ])
+            products = list(Product.objects.filter(category=category))
+
+            request = RequestFactory().get('/products/')
+            request.user = AnonymousUser()
+            request.basket = None
+            pages = [products[start:start + options['per_page']]
+                     for start in range(0, total, options['per_page'])]
+
+            uncached = self.time(
+                lambda: self.render(request, pages, clear=True),
+                options['repeat'])
+            cached = self.time(
+                lambda: self.render(request, pages), options['repeat'])
+
+            for product in products:
+                cache.delete(self.card_key(product))
+
+            # discard the synthetic catalog
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f'Rendered {len(pages)} pages of {options["per_page"]} cards\n'
+            f'uncached: {uncached / len(pages):.2f}ms per page\n'
+            f'cached: {cached / len(pages):.2f}ms per page')
+        self.stdout.write(self.style.SUCCESS(
+            f'Card cache speedup: {uncached / cached:.1f}x'))
+
+    @staticmethod
+    def card_key(product):
+        return make_template_fragment_key(
+            'product_card', [product.id, product.updated_at.isoformat()])
+
+    def render(self, request, pages, clear=False):
+        template = get_template('partials/_product_listing.html')
+
+        for page in pages:
+            if clear:
+                cache.delete_many([self.card_key(product)
+                                   for product in page])
+            for product in page:
+                template.render({'product': product}, request)
+
+    @staticmethod
+    def time(render, repeat):
+        """Return the median time taken to render every page in
+        milliseconds"""
+        timings = []
+        for attempt in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,78 @@
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from products.categories import category_nodes
+from products.management.commands.import_products import FIELDS
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Write every product to a CSV or JSON lines file that can be ' \
+        'read by import_products'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='File to write, standard output by default')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'),
+            help='File format, worked out from the file name by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Number of products fetched from the database at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or \
+            ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        if path == '-':
+            exported = self.export(sys.stdout, data_format,
+                                   options['chunk_size'])
+        else:
+            try:
+                f = open(path, 'w', newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with f:
+                exported = self.export(f, data_format, options['chunk_size'])
+
+        # keep standard output clean for the exported data
+        self.stderr.write(self.style.SUCCESS(
+            f'Exported {exported} products.'))
+
+    def export(self, f, data_format, chunk_size):
+        categories = category_nodes()
+        products = Product.objects.order_by('pk').only(
+            *(name for name in FIELDS if name != 'category'),
+            'category').iterator(chunk_size=chunk_size)
+
+        if data_format == 'csv':
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            write = writer.writerow
+        else:
+            def write(row):
+                f.write(json.dumps(row, cls=DjangoJSONEncoder) + '\n')
+
+        exported = 0
+        for product in products:
+            category = categories.get(product.category_id)
+            write({
+                'sku': product.sku,
+                'title': product.title,
+                'brand': product.brand,
+                'category': category['full_name'] if category else '',
+                'price': str(product.price),
+                'stock': product.stock,
+                'description': product.description,
+                'image': product.image.name or '',
+                'is_live': product.is_live,
+            })
+            exported += 1
+
+        return exported
@@ -0,0 +1,57 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from products.cache import bump_catalog_version
+from products.images import process_image, save_derivatives
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Generate the resized variants of product images that do not ' \
+        'have them yet, spread over several worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help='Number of worker processes, 1 processes images in this '
+                 'process')
+        parser.add_argument(
+            '--all', action='store_true', dest='regenerate',
+            help='Regenerate variants for every product image')
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(image='').exclude(image=None)
+        if not options['regenerate']:
+            products = products.filter(image_derivatives='')
+        items = list(products.values_list('pk', 'image'))
+
+        started = time.perf_counter()
+        generated = failed = 0
+
+        if options['workers'] > 1:
+            # worker processes must not share this process's connection
+            connections.close_all()
+            with ProcessPoolExecutor(options['workers']) as pool:
+                results = list(pool.map(process_image, items, chunksize=4))
+        else:
+            results = map(process_image, items)
+
+        for product_id, name, extensions, error in results:
+            if error:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+                continue
+
+            save_derivatives(product_id, name, extensions)
+            generated += 1
+
+        if generated:
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {generated} images ({failed} failed) '
+            f'in {time.perf_counter() - started:.1f}s.'))
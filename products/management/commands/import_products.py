@@ -0,0 +1,272 @@
+import csv
+import io
+import json
+import sys
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import MaxLengthValidator
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+
+from products.cache import bump_catalog_version, bump_search_version
+from products.categories import invalidate_category_tree
+from products.models import Category, Product
+
+
+# columns that can be imported, sku is the natural key
+FIELDS = ('sku', 'title', 'brand', 'category', 'price', 'stock',
+          'description', 'image', 'is_live')
+REQUIRED_FIELDS = ('title', 'brand', 'category', 'price', 'description')
+# columns holding text the search indexes are built from
+SEARCH_FIELDS = {'title', 'brand', 'category', 'description', 'is_live'}
+
+
+def read_rows(f, data_format):
+    """Yield (line number, row dict) pairs, one row at a time"""
+    if data_format == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            yield line_number, row
+
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    value = str(value).strip().lower()
+    if value in ('1', 'true', 't', 'yes', 'y'):
+        return True
+    if value in ('0', 'false', 'f', 'no', 'n', ''):
+        return False
+    raise ValidationError(f"'{value}' is not true or false.")
+
+
+class Command(BaseCommand):
+    help = 'Create or update products from a CSV or JSON lines file, ' \
+        'matching existing products on SKU. Variants of imported images ' \
+        'are made by running generate_product_images afterwards.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='File to import, - reads from standard input')
+        parser.add_argument(
+            '--format', choices=('csv', 'jsonl'),
+            help='File format, worked out from the file name by default')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        data_format = options['format'] or \
+            ('jsonl' if path.endswith(('.jsonl', '.json')) else 'csv')
+
+        self.verbosity = options['verbosity']
+        self.categories = {}
+        self.created = self.updated = self.failed = 0
+        # whether searchable text was imported
+        self.reindex = False
+        # products given an image that has no variants yet
+        self.new_images = 0
+        started = time.perf_counter()
+
+        if path == '-':
+            f = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8')
+            self.import_rows(f, data_format, options['batch_size'])
+        else:
+            try:
+                f = open(path, newline='', encoding='utf-8')
+            except OSError as e:
+                raise CommandError(f'Cannot open {path}: {e}')
+            with f:
+                self.import_rows(f, data_format, options['batch_size'])
+
+        if self.created or self.updated:
+            # bulk writes do not send model signals
+            invalidate_category_tree()
+            bump_catalog_version()
+        if self.reindex:
+            # search indexes in every process are rebuilt
+            bump_search_version()
+
+        elapsed = time.perf_counter() - started
+        total = self.created + self.updated + self.failed
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {total} rows ({self.created} created, {self.updated} '
+            f'updated, {self.failed} failed) in {elapsed:.1f}s '
+            f'({total / elapsed if elapsed else 0:.0f} rows/s).'))
+
+        if self.new_images:
+            # encoding images is too slow to do while importing
+            self.stdout.write(
+                f'{self.new_images} products have new images, run '
+                f'generate_product_images to create their variants.')
+
+    def import_rows(self, f, data_format, batch_size):
+        batch = {}
+
+        for line_number, row in read_rows(f, data_format):
+            try:
+                if not isinstance(row, dict):
+                    raise ValidationError(f'Invalid row: {row}')
+                values = self.clean_row(row)
+            except ValidationError as e:
+                self.report_error(line_number, e)
+                continue
+
+            # a repeated SKU replaces the earlier row
+            batch[values['sku']] = (line_number, values)
+            if len(batch) >= batch_size:
+                self.save_batch(batch)
+                batch = {}
+
+        if batch:
+            self.save_batch(batch)
+
+    def clean_row(self, row):
+        """Convert the provided columns of a row to model values"""
+        values = {}
+        errors = {}
+
+        sku = str(row.get('sku') or '').strip()
+        if not sku:
+            raise ValidationError({'sku': 'This field is required.'})
+
+        for name in FIELDS:
+            if name not in row or row[name] is None:
+                continue
+
+            value = row[name]
+            try:
+                if name == 'category':
+                    value = self.get_category(value)
+                elif name == 'is_live':
+                    value = parse_bool(value)
+                elif name == 'image':
+                    value = str(value).strip()
+                    MaxLengthValidator(
+                        Product._meta.get_field('image').max_length)(value)
+                else:
+                    # form fields also check limits such as stock >= 0
+                    # which the model fields leave to the database
+                    field = Product._meta.get_field(name)
+                    value = field.formfield().clean(value)
+            except ValidationError as e:
+                errors[name] = e.messages
+                continue
+
+            values[name] = value
+
+        if errors:
+            raise ValidationError(errors)
+
+        values['sku'] = sku
+        return values
+
+    def get_category(self, name):
+        """Find or create the category for a name such as 'Dog > Food'"""
+        name_field = Category._meta.get_field('name')
+        parts = tuple(name_field.clean(part.strip(), None)
+                      for part in str(name).split('>') if part.strip())
+        if not parts:
+            raise ValidationError('This field is required.')
+
+        if parts not in self.categories:
+            parent = None
+            for depth in range(1, len(parts) + 1):
+                if parts[:depth] not in self.categories:
+                    category, created = Category.objects.get_or_create(
+                        parent=parent, slug=slugify(parts[depth - 1]),
+                        defaults={'name': parts[depth - 1]})
+                    self.categories[parts[:depth]] = category
+                parent = self.categories[parts[:depth]]
+
+        return self.categories[parts]
+
+    def save_batch(self, batch):
+        existing = Product.objects.in_bulk(list(batch), field_name='sku')
+        new_products = []
+        changed_products = []
+        changed_fields = set()
+        line_numbers = []
+        new_images = 0
+
+        for sku, (line_number, values) in batch.items():
+            product = existing.get(sku)
+
+            if product is None:
+                missing = [name for name in REQUIRED_FIELDS
+                           if name not in values]
+                if missing:
+                    self.report_error(line_number, ValidationError(
+                        {name: 'This field is required.'
+                         for name in missing}))
+                    continue
+                new_products.append(Product(**values))
+                line_numbers.append(line_number)
+                new_images += bool(values.get('image'))
+                continue
+
+            if 'image' in values and values['image'] != product.image.name:
+                # variants of the old image no longer apply
+                values['image_derivatives'] = ''
+                new_images += bool(values['image'])
+            line_numbers.append(line_number)
+            for name, value in values.items():
+                setattr(product, name, value)
+            changed_products.append(product)
+            changed_fields.update(values)
+
+        changed_fields.discard('sku')
+        # bulk updates skip auto_now
+        now = timezone.now()
+        for product in changed_products:
+            product.updated_at = now
+        changed_fields.add('updated_at')
+        try:
+            with transaction.atomic():
+                Product.objects.bulk_create(new_products)
+                if changed_products and changed_fields:
+                    Product.objects.bulk_update(changed_products,
+                                                sorted(changed_fields))
+        except DatabaseError as e:
+            # the whole batch is rolled back, later batches still import
+            self.failed += len(line_numbers)
+            lines = ', '.join(map(str, sorted(line_numbers)))
+            self.stderr.write(
+                f'Line{"s" if len(line_numbers) > 1 else ""} {lines}: '
+                f'could not be saved: {e}')
+            return
+
+        self.created += len(new_products)
+        self.updated += len(changed_products)
+        if new_products or changed_fields & SEARCH_FIELDS:
+            self.reindex = True
+        self.new_images += new_images
+
+        if self.verbosity > 1:
+            self.stdout.write(
+                f'Saved {len(new_products)} new and {len(changed_products)} '
+                f'existing products.')
+
+    def report_error(self, line_number, error):
+        self.failed += 1
+        if hasattr(error, 'message_dict'):
+            message = '; '.join(
+                f'{name}: {" ".join(messages)}'
+                for name, messages in error.message_dict.items())
+        else:
+            message = ' '.join(error.messages)
+        self.stderr.write(f'Line {line_number}: {message}')
@@ -0,0 +1,83 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum, Count, Q
+from django.utils import timezone
+
+from products.cache import bump_catalog_version
+from products.models import Product, Review
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored rating aggregates and histogram for ' \
+        'every product'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of products to update per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ratings = range(1, 6)
+        fields = ['rating_sum', 'rating_count', 'rating_avg'] + \
+            [f'rating_{rating}' for rating in ratings]
+        updated = repaired = 0
+        last_pk = None
+
+        while True:
+            # walk the products table in primary key order
+            products = Product.objects.order_by('pk').only('pk', *fields)
+            if last_pk is not None:
+                products = products.filter(pk__gt=last_pk)
+            batch = list(products[:batch_size])
+
+            if not batch:
+                break
+
+            totals = {
+                row['product_id']: row for row in Review.objects.filter(
+                    product__in=batch).values('product_id').annotate(
+                    total=Sum('rating'), count=Count('id'),
+                    **{f'rating_{rating}': Count('id', filter=Q(rating=rating))
+                       for rating in ratings})
+            }
+
+            changed = []
+            for product in batch:
+                row = totals.get(product.pk)
+                values = {
+                    'rating_sum': row['total'] if row else 0,
+                    'rating_count': row['count'] if row else 0,
+                }
+                values['rating_avg'] = (
+                    values['rating_sum'] / values['rating_count']
+                    if values['rating_count'] else 0)
+                for rating in ratings:
+                    name = f'rating_{rating}'
+                    values[name] = row[name] if row else 0
+
+                if any(getattr(product, name) != value
+                       for name, value in values.items()):
+                    for name, value in values.items():
+                        setattr(product, name, value)
+                    # bulk updates skip auto_now, set it so cached pages
+                    # showing the product are revalidated
+                    product.updated_at = timezone.now()
+                    changed.append(product)
+
+            if changed:
+                with transaction.atomic():
+                    Product.objects.bulk_update(
+                        changed, fields + ['updated_at'])
+
+            updated += len(batch)
+            repaired += len(changed)
+            last_pk = batch[-1].pk
+
+        if repaired:
+            # bulk writes do not send model signals
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt ratings for {updated} products ({repaired} '
+            f'repaired).'))
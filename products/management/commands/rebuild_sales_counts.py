@@ -0,0 +1,66 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from checkout.models import OrderItem
+from products.cache import bump_catalog_version
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Recalculate the stored sales count for every product from the ' \
+        'order items'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of products to update per transaction')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        updated = repaired = 0
+        last_pk = None
+
+        while True:
+            # walk the products table in primary key order
+            products = Product.objects.order_by('pk').only(
+                'pk', 'sales_count')
+            if last_pk is not None:
+                products = products.filter(pk__gt=last_pk)
+            batch = list(products[:batch_size])
+
+            if not batch:
+                break
+
+            # every order item represents a single unit sold
+            totals = dict(OrderItem.objects.filter(
+                product__in=batch).order_by().values_list(
+                'product_id').annotate(count=Count('id')))
+
+            changed = []
+            for product in batch:
+                sales_count = totals.get(product.pk, 0)
+                if product.sales_count != sales_count:
+                    product.sales_count = sales_count
+                    # bulk updates skip auto_now, set it so cached pages
+                    # showing the product are revalidated
+                    product.updated_at = timezone.now()
+                    changed.append(product)
+
+            if changed:
+                with transaction.atomic():
+                    Product.objects.bulk_update(
+                        changed, ['sales_count', 'updated_at'])
+
+            updated += len(batch)
+            repaired += len(changed)
+            last_pk = batch[-1].pk
+
+        if repaired:
+            # bulk writes do not send model signals
+            bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt sales counts for {updated} products '
+            f'({repaired} repaired).'))
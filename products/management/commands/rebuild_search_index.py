@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from products import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product search index and save it to disk'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default=settings.PRODUCT_SEARCH_INDEX_PATH,
+            help='File to save the index to, defaults to '
+                 'PRODUCT_SEARCH_INDEX_PATH')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not path:
+            raise CommandError('No path given and PRODUCT_SEARCH_INDEX_PATH '
+                               'is not set.')
+
+        index = search.build_index()
+        index.save(path)
+
+        # make this process use the fresh index as well
+        search.reset_index()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {len(index)} products ({len(index.postings)} terms) '
+            f'to {path}.'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from products.cache import search_cache_stats, reset_search_cache_stats
+
+
+class Command(BaseCommand):
+    help = 'Show product search cache hit and miss counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Reset the counters after displaying them')
+
+    def handle(self, *args, **options):
+        stats = search_cache_stats()
+
+        self.stdout.write(f"Hits: {stats['hits']}")
+        self.stdout.write(f"Misses: {stats['misses']}")
+        self.stdout.write(f"Hit ratio: {stats['hit_ratio']:.1%}")
+
+        if options['reset']:
+            reset_search_cache_stats()
+            self.stdout.write(self.style.SUCCESS('Counters reset.'))
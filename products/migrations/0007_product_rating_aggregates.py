@@ -0,0 +1,45 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:26
+
+from django.db import migrations, models
+from django.db.models import Sum, Count
+
+
+def populate_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+
+    totals = Review.objects.values('product_id').annotate(
+        total=Sum('rating'), count=Count('id'))
+
+    for row in totals:
+        Product.objects.filter(pk=row['product_id']).update(
+            rating_sum=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['total'] / row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_review_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_rating_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(is_live=True), fields=['id'], name='product_live_idx'),
+        ),
+    ]
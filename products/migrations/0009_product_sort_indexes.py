@@ -0,0 +1,58 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:41
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.utils.timezone
+
+
+def populate_sales_counts(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    OrderItem = apps.get_model('checkout', 'OrderItem')
+
+    # every order item represents a single unit sold
+    totals = OrderItem.objects.values('product_id').annotate(
+        count=Count('id'))
+
+    for row in totals:
+        Product.objects.filter(pk=row['product_id']).update(
+            sales_count=row['count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('checkout', '0004_auto_20200428_1912'),
+        ('products', '0008_product_live_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='sales_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(is_live=True), fields=['price', 'id'], name='product_live_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(is_live=True), fields=['-rating_avg', '-id'], name='product_live_rating_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(is_live=True), fields=['-created_at', '-id'], name='product_live_newest_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(is_live=True), fields=['-sales_count', '-id'], name='product_live_sales_idx'),
+        ),
+        migrations.RunPython(
+            populate_sales_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.text import slugify
+
+
+def populate_categories(apps, schema_editor):
+    """Create the category tree from the free text categories, nesting is
+    written as e.g. 'Dog > Food'"""
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    names = Product.objects.values_list('category', flat=True).distinct()
+
+    for name in names:
+        parts = [part.strip() for part in name.split('>') if part.strip()]
+        parent = None
+
+        for part in parts or ['Uncategorised']:
+            category = Category.objects.filter(
+                parent=parent, slug=slugify(part)).first()
+
+            if category is None:
+                category = Category.objects.create(
+                    name=part, slug=slugify(part), parent=parent,
+                    depth=parent.depth + 1 if parent else 0)
+                parent_path = parent.path if parent else '/'
+                category.path = f'{parent_path}{category.pk}/'
+                category.save()
+
+            parent = category
+
+        Product.objects.filter(category=name).update(category_ref=parent)
+
+
+def populate_category_names(apps, schema_editor):
+    Category = apps.get_model('products', 'Category')
+    Product = apps.get_model('products', 'Product')
+
+    names = dict(Category.objects.values_list('pk', 'name'))
+
+    for category in Category.objects.all():
+        ids = [int(pk) for pk in category.path.strip('/').split('/')]
+        Product.objects.filter(category_ref=category).update(
+            category=' > '.join(names[pk] for pk in ids))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_product_sort_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Category',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100)),
+                ('path', models.CharField(db_index=True, editable=False, max_length=255)),
+                ('depth', models.PositiveSmallIntegerField(default=0, editable=False)),
+                ('parent', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='children', to='products.Category')),
+            ],
+            options={
+                'verbose_name_plural': 'categories',
+                'ordering': ['path'],
+                'unique_together': {('parent', 'slug')},
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='category_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='products.Category'),
+        ),
+        migrations.RunPython(populate_categories, populate_category_names),
+        # a default lets the column be added back when unapplying
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RemoveField(
+            model_name='product',
+            name='category',
+        ),
+        migrations.RenameField(
+            model_name='product',
+            old_name='category_ref',
+            new_name='category',
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='category',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='products', to='products.Category'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_category'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='image_derivatives',
+            field=models.CharField(blank=True, editable=False, max_length=50),
+        ),
+    ]
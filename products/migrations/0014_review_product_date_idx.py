@@ -0,0 +1,17 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0013_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(fields=['product', '-date', '-id'], name='review_product_date_idx'),
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:13
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_rating_histogram(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+    Review = apps.get_model('products', 'Review')
+
+    counts = Review.objects.values('product_id', 'rating').annotate(
+        count=Count('id'))
+
+    for row in counts:
+        Product.objects.filter(pk=row['product_id']).update(
+            **{f'rating_{row["rating"]}': row['count']})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0014_review_product_date_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(
+            populate_rating_histogram, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:02
+
+from django.db import migrations, models
+from django.db.models import Q, Value
+from django.db.models.functions import Cast, Replace
+
+
+def backfill_sku(apps, schema_editor):
+    Product = apps.get_model('products', 'Product')
+
+    # products added before SKUs existed are given their id without dashes,
+    # the same form as products.models.new_sku
+    Product.objects.filter(Q(sku__isnull=True) | Q(sku='')).update(
+        sku=Replace(Cast('id', models.CharField(max_length=64)),
+                    Value('-'), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0015_rating_histogram'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_sku, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:03
+
+from django.db import migrations, models
+import products.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0016_backfill_product_sku'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='sku',
+            field=models.CharField(blank=True, default=products.models.new_sku, max_length=64, unique=True, verbose_name='SKU'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.db.models import QuerySet
+from django.http import Http404
+
+from .facets import catalog_facets, facet_groups, parse_filters
+from .pagination import CursorPaginator, SequenceCursorPaginator, \
+    InvalidCursor
+from .sorting import SORT_OPTIONS, SORT_ORDERINGS, parse_sort, sort_options
+
+
+class CatalogPaginationMixin:
+    """Paginate catalog listings with keyset cursors, page numbers are used
+    instead when PRODUCT_PAGINATION is set to 'page'"""
+    cursor_kwarg = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        if settings.PRODUCT_PAGINATION == 'page':
+            return super().paginate_queryset(queryset, page_size)
+
+        if isinstance(queryset, QuerySet):
+            paginator = CursorPaginator(queryset, page_size)
+        else:
+            # already ordered results, such as ranked search matches
+            paginator = SequenceCursorPaginator(queryset, page_size)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor as e:
+            raise Http404(str(e))
+
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+
+class CatalogFilterMixin:
+    """Filter catalog listings by the price, category and rating facets in
+    the query string and pass the facet counts through to the template,
+    listings narrower than the catalog override get_facet_counts"""
+
+    def get_filters(self):
+        if not hasattr(self, '_filters'):
+            self._filters = parse_filters(self.request.GET)
+        return self._filters
+
+    def get_facet_counts(self):
+        return catalog_facets()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        filters = self.get_filters()
+        context['filters'] = filters
+        context['facets'] = facet_groups(self.get_facet_counts(), filters)
+        return context
+
+
+class CatalogSortMixin:
+    """Order catalog listings by the sort mode in the query string, the
+    view's own ordering is used when no valid sort is given"""
+    default_sort = None
+    sort_choices = SORT_OPTIONS
+
+    def get_sort(self):
+        return parse_sort(self.request.GET, self.default_sort)
+
+    def get_ordering(self):
+        return SORT_ORDERINGS.get(self.get_sort(), self.ordering)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['sort_options'] = sort_options(
+            self.get_sort(), self.sort_choices)
+        return context
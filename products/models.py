@@ -1,30 +1,173 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 
 
+class LiveProductManager(models.Manager):
+    """Only return products that are available to customers"""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_live=True)
+
+
+class Category(models.Model):
+    """Product category, categories can be nested and store the ids of
+    their ancestors as a path so a whole subtree is one prefix query"""
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True,
+                               blank=True, related_name='children')
+    # e.g. '/1/5/' for category 5 nested under category 1
+    path = models.CharField(max_length=255, editable=False, db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+
+    class Meta:
+        verbose_name_plural = 'categories'
+        ordering = ['path']
+        unique_together = [['parent', 'slug']]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        if self.pk and self.parent and \
+                self.parent.path.startswith(self.path):
+            raise ValueError('A category cannot be nested under itself')
+
+        previous_path = self.path
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+            # the path includes the category's own id so is only known
+            # once it has been saved
+            parent_path = self.parent.path if self.parent else '/'
+            path = f'{parent_path}{self.pk}/'
+            if path == previous_path:
+                return
+
+            depth = path.count('/') - 2
+            Category.objects.filter(pk=self.pk).update(path=path, depth=depth)
+
+            if previous_path:
+                # move the subtree along with the category
+                Category.objects.filter(
+                    path__startswith=previous_path).exclude(
+                    pk=self.pk).update(
+                    path=Concat(Value(path),
+                                Substr('path', len(previous_path) + 1),
+                                output_field=models.CharField()),
+                    depth=F('depth') + depth - self.depth)
+
+            self.path, self.depth = path, depth
+
+    def get_descendants(self, include_self=False):
+        """Return every category below this one"""
+        categories = Category.objects.filter(path__startswith=self.path)
+        if not include_self:
+            categories = categories.exclude(pk=self.pk)
+        return categories
+
+    def get_ancestors(self):
+        """Return the categories above this one, root first"""
+        ids = [int(pk) for pk in self.path.strip('/').split('/')[:-1]]
+        return Category.objects.filter(pk__in=ids).order_by('depth')
+
+    def get_products(self):
+        """Return live products in this category or any below it"""
+        return Product.live.filter(category__path__startswith=self.path)
+
+
+def new_sku():
+    """Return a SKU for a product added without one, such as through the
+    product form"""
+    return uuid.uuid4().hex
+
+
 class Product(models.Model):
     """Store product model"""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # stock keeping unit, the natural key used by catalog imports
+    sku = models.CharField(max_length=64, unique=True, blank=True,
+                           default=new_sku, verbose_name='SKU')
     title = models.CharField(max_length=200)
     brand = models.CharField(max_length=200)
-    category = models.CharField(max_length=100)
+    category = models.ForeignKey(Category, on_delete=models.PROTECT,
+                                 related_name='products')
     price = models.DecimalField(max_digits=6, decimal_places=2)
     stock = models.PositiveIntegerField(default=10)
     description = models.TextField()
     image = models.ImageField(null=True)
+    # extensions of the resized variants generated from the image, see
+    # products.images
+    image_derivatives = models.CharField(max_length=50, blank=True,
+                                         editable=False)
     is_live = models.BooleanField(default=True)
+    # review aggregates are stored on the product so catalog pages do not
+    # need to join reviews, kept up to date by products.signals
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0, editable=False)
+    # number of reviews with each rating
+    rating_1 = models.PositiveIntegerField(default=0, editable=False)
+    rating_2 = models.PositiveIntegerField(default=0, editable=False)
+    rating_3 = models.PositiveIntegerField(default=0, editable=False)
+    rating_4 = models.PositiveIntegerField(default=0, editable=False)
+    rating_5 = models.PositiveIntegerField(default=0, editable=False)
+    # number of units sold, kept up to date when orders are created
+    sales_count = models.PositiveIntegerField(default=0, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # changed whenever anything shown on the product page changes, including
+    # queryset updates of the stored aggregates, used by conditional GETs
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = models.Manager()
+    live = LiveProductManager()
+
+    class Meta:
+        # partial indexes so catalog listings only scan live products, one
+        # for each listing order (descending price reads the price index
+        # backwards)
+        indexes = [
+            models.Index(fields=['id'], name='product_live_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['price', 'id'],
+                         name='product_live_price_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['-rating_avg', '-id'],
+                         name='product_live_rating_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['-created_at', '-id'],
+                         name='product_live_newest_idx',
+                         condition=models.Q(is_live=True)),
+            models.Index(fields=['-sales_count', '-id'],
+                         name='product_live_sales_idx',
+                         condition=models.Q(is_live=True)),
+        ]
+
+    def save(self, *args, **kwargs):
+        # a SKU left blank on the product form is generated
+        if not self.sku:
+            self.sku = new_sku()
+        super().save(*args, **kwargs)
 
     def review_count(self):
         """Return total reviews for product"""
-        count = self.reviews.aggregate(
-            count=models.Count('rating'))['count']
-
-        if count is None:
-            count = 0
+        return self.rating_count
 
-        return count
+    @property
+    def rating_histogram(self):
+        """Return the number and percentage of reviews with each rating,
+        highest rating first, read from the stored counters"""
+        return [{
+            'rating': rating,
+            'count': getattr(self, f'rating_{rating}'),
+            'percent': round(100 * getattr(self, f'rating_{rating}') /
+                             self.rating_count) if self.rating_count else 0,
+        } for rating in range(5, 0, -1)]
 
     def __str__(self):
         """return product title by default"""
@@ -50,6 +193,14 @@ class Review(models.Model):
     review = models.TextField()
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     date = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # product pages list reviews newest first a page at a time
+        indexes = [
+            models.Index(fields=['product', '-date', '-id'],
+                         name='review_product_date_idx'),
+        ]
 
     def __str__(self):
         return self.review
@@ -0,0 +1,213 @@
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+
+class InvalidCursor(InvalidPage):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+class CursorEncoder(DjangoJSONEncoder):
+    """Keep the microseconds of datetimes, DjangoJSONEncoder cuts them to
+    milliseconds so rows tied within a millisecond would be skipped"""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+class CursorPage:
+    """A single page of results returned by CursorPaginator"""
+
+    def __init__(self, object_list, paginator, next_cursor=None,
+                 previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Keyset paginator, each page is fetched by filtering on the ordering
+    values of the last row seen so there is no OFFSET scan or COUNT query.
+    Cursors are opaque tokens holding the direction and those values."""
+    uses_cursors = True
+
+    NEXT = 'n'
+    PREVIOUS = 'p'
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering or queryset.query.order_by)
+
+        # a unique final key is required for a stable ordering
+        pk_name = queryset.model._meta.pk.name
+        if not self.ordering or \
+                self.ordering[-1].lstrip('-') not in ('pk', pk_name):
+            descending = bool(self.ordering) and \
+                self.ordering[-1].startswith('-')
+            self.ordering.append('-pk' if descending else 'pk')
+
+    def page(self, cursor=None):
+        """Return the page of results following (or preceding) the cursor"""
+        direction, values = self.NEXT, None
+        if cursor:
+            direction, values = self.decode_cursor(cursor)
+
+        ordering = self.ordering
+        if direction == self.PREVIOUS:
+            # walk backwards from the cursor then restore the display order
+            ordering = [self._reverse(name) for name in ordering]
+
+        queryset = self.queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._keyset_filter(ordering, values))
+
+        # fetch one extra row to find out if there is another page
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if direction == self.PREVIOUS:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, values is not None
+
+        next_cursor = previous_cursor = None
+        if rows and has_next:
+            next_cursor = self.encode_cursor(self.NEXT, rows[-1])
+        if rows and has_previous:
+            previous_cursor = self.encode_cursor(self.PREVIOUS, rows[0])
+
+        return CursorPage(rows, self, next_cursor, previous_cursor)
+
+    def encode_cursor(self, direction, obj):
+        """Create an opaque cursor from the ordering values of an object"""
+        values = [self._value(obj, name) for name in self.ordering]
+        data = json.dumps([direction, values], cls=CursorEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Return the direction and typed ordering values held in a cursor"""
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            direction, values = json.loads(
+                base64.urlsafe_b64decode(cursor + padding).decode())
+
+            if direction not in (self.NEXT, self.PREVIOUS) or \
+                    len(values) != len(self.ordering):
+                raise ValueError('Cursor does not match ordering')
+
+            return direction, [
+                self._to_python(name, value)
+                for name, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, binascii.Error, ValidationError):
+            raise InvalidCursor('Invalid cursor')
+
+    def _keyset_filter(self, ordering, values):
+        """Build (a > x) OR (a = x AND b > y) ... for the given ordering"""
+        condition = Q()
+
+        for index, name in enumerate(ordering):
+            lookup = 'lt' if name.startswith('-') else 'gt'
+            clause = Q(**{f'{name.lstrip("-")}__{lookup}': values[index]})
+
+            for previous_name, value in zip(ordering[:index], values):
+                clause &= Q(**{previous_name.lstrip('-'): value})
+
+            condition |= clause
+
+        return condition
+
+    def _field(self, name):
+        name = name.lstrip('-')
+        opts = self.queryset.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+
+    def _value(self, obj, name):
+        name = name.lstrip('-')
+        field = self._field(name)
+        return getattr(obj, field.attname if field else name)
+
+    def _to_python(self, name, value):
+        field = self._field(name)
+        return field.to_python(value) if field else value
+
+    @staticmethod
+    def _reverse(name):
+        return name[1:] if name.startswith('-') else '-' + name
+
+
+class SequenceCursorPaginator:
+    """Cursor paginator for an ordered list that is already in memory, such
+    as ranked search results. Cursors hold a position in the list."""
+    uses_cursors = True
+
+    def __init__(self, object_list, per_page):
+        self.object_list = object_list
+        self.per_page = int(per_page)
+
+    def page(self, cursor=None):
+        start = self.decode_cursor(cursor) if cursor else 0
+        end = start + self.per_page
+
+        next_cursor = previous_cursor = None
+        if end < len(self.object_list):
+            next_cursor = self.encode_cursor(end)
+        if start > 0:
+            previous_cursor = self.encode_cursor(max(start - self.per_page, 0))
+
+        return CursorPage(list(self.object_list[start:end]), self,
+                          next_cursor, previous_cursor)
+
+    def encode_cursor(self, position):
+        data = json.dumps(['o', position])
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            kind, position = json.loads(
+                base64.urlsafe_b64decode(cursor + padding).decode())
+
+            if kind != 'o' or not isinstance(position, int) or position < 0:
+                raise ValueError('Invalid cursor position')
+
+            return position
+        except (TypeError, ValueError, binascii.Error):
+            raise InvalidCursor('Invalid cursor')
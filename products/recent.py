@@ -0,0 +1,54 @@
+import base64
+import binascii
+import uuid
+
+from django.conf import settings
+
+from .models import Product
+
+
+SESSION_KEY = 'recently_viewed'
+ID_SIZE = 16
+
+
+def viewed_product_ids(session):
+    """Return the ids of the products a visitor viewed, newest first. The
+    session holds the raw 16 byte ids run together (base64 encoded), so
+    it never grows beyond PRODUCT_RECENTLY_VIEWED ids."""
+    try:
+        data = base64.b64decode(session.get(SESSION_KEY, ''))
+    except (TypeError, binascii.Error):
+        return []
+
+    return [uuid.UUID(bytes=data[start:start + ID_SIZE])
+            for start in range(0, len(data) - ID_SIZE + 1, ID_SIZE)]
+
+
+def add_viewed_product(session, product_id):
+    """Move a product to the front of the recently viewed ids, dropping the
+    oldest id when the list is full"""
+    product_id = uuid.UUID(str(product_id))
+    product_ids = viewed_product_ids(session)
+
+    if product_ids[:1] == [product_id]:
+        # unchanged, avoid saving the session
+        return
+
+    product_ids = [product_id] + [
+        viewed for viewed in product_ids if viewed != product_id]
+    data = b''.join(viewed.bytes for viewed in
+                    product_ids[:settings.PRODUCT_RECENTLY_VIEWED])
+    session[SESSION_KEY] = base64.b64encode(data).decode()
+
+
+def recently_viewed_products(session, exclude=None, limit=None):
+    """Return the live products a visitor viewed, newest first, fetched
+    with a single query"""
+    product_ids = [product_id for product_id in viewed_product_ids(session)
+                   if str(product_id) != str(exclude)]
+    if not product_ids:
+        return []
+
+    products = Product.live.in_bulk(product_ids)
+    return [products[product_id] for product_id in product_ids
+            if product_id in products][:limit]
@@ -0,0 +1,303 @@
+import json
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .categories import category_nodes
+from .models import Product
+
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+STOP_WORDS = frozenset((
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in',
+    'is', 'it', 'of', 'on', 'or', 'the', 'this', 'to', 'with',
+))
+
+# product fields the index is built from, a product saved without changing
+# any of them leaves the index alone
+INDEXED_FIELDS = ('title', 'brand', 'category_id', 'description', 'is_live')
+
+# relative importance of a term appearing in each product field
+FIELD_WEIGHTS = {
+    'title': 3.0,
+    'brand': 2.0,
+    'category': 2.0,
+    'description': 1.0,
+}
+
+
+def stem(word):
+    """Light suffix stripping so that e.g. 'treats' and 'treat' match"""
+    if len(word) <= 3 or word.isdigit():
+        return word
+
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith(('ches', 'shes', 'xes', 'zes')):
+        return word[:-2]
+    if word.endswith('s') and not word.endswith(('ss', 'us', 'is')):
+        return word[:-1]
+    if word.endswith('ing') and len(word) > 5:
+        word = word[:-3]
+    elif word.endswith('ed') and len(word) > 4:
+        word = word[:-2]
+    elif word.endswith('ly') and len(word) > 4:
+        return word[:-2]
+    else:
+        return word
+
+    # 'running' -> 'runn' -> 'run'
+    if len(word) > 3 and word[-1] == word[-2] and word[-1] not in 'lsz':
+        word = word[:-1]
+    return word
+
+
+def tokenize(text):
+    """Split text into lower case, stemmed search terms"""
+    return [stem(token) for token in TOKEN_RE.findall(text.lower())
+            if token not in STOP_WORDS]
+
+
+def product_fields(product, categories=None):
+    """Return the searchable text of a product keyed by field name, the
+    category includes the names of its parents so a product in 'Dog > Food'
+    matches 'dog'"""
+    if categories is None:
+        categories = category_nodes()
+    category = categories.get(product.category_id)
+
+    return {
+        'title': product.title,
+        'brand': product.brand,
+        'category': category['full_name'] if category else '',
+        'description': product.description,
+    }
+
+
+class SearchIndex:
+    """In-memory inverted index of products ranked with BM25"""
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        # search version the documents were read at
+        self.search_version = None
+        self.clear()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def clear(self):
+        with self._lock:
+            # term -> {document id: weighted term frequency}
+            self.postings = defaultdict(dict)
+            # document id -> {term: weighted term frequency}
+            self.documents = {}
+            # document id -> weighted number of terms
+            self.lengths = {}
+            self.total_length = 0.0
+
+    def add(self, doc_id, fields):
+        """Index (or re-index) a document from its text fields"""
+        terms = Counter()
+        for name, text in fields.items():
+            weight = FIELD_WEIGHTS.get(name, 1.0)
+            for term in tokenize(text or ''):
+                terms[term] += weight
+
+        with self._lock:
+            self.remove(doc_id)
+            self._add_terms(doc_id, dict(terms))
+
+    def remove(self, doc_id):
+        """Remove a document from the index if it is present"""
+        with self._lock:
+            terms = self.documents.pop(doc_id, None)
+            if terms is None:
+                return
+
+            self.total_length -= self.lengths.pop(doc_id)
+            for term in terms:
+                postings = self.postings[term]
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+
+    def search(self, query, limit=None):
+        """Return document ids matching any query term, best match first"""
+        query_terms = set(tokenize(query))
+        scores = defaultdict(float)
+
+        with self._lock:
+            total_documents = len(self.documents)
+            if not total_documents or not query_terms:
+                return []
+            average_length = self.total_length / total_documents
+
+            for term in query_terms:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+
+                frequency = len(postings)
+                idf = math.log(1 + (total_documents - frequency + 0.5) /
+                               (frequency + 0.5))
+
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b *
+                                      self.lengths[doc_id] / average_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], doc_id))
+        return ranked[:limit] if limit else ranked
+
+    def save(self, path):
+        """Write the index to disk, replacing any existing file atomically"""
+        with self._lock:
+            data = json.dumps({'version': 1, 'documents': self.documents,
+                               'search_version': self.search_version})
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+    def load(self, path):
+        """Replace the index contents with an index saved to disk"""
+        with open(path) as f:
+            data = json.load(f)
+
+        if data.get('version') != 1:
+            raise ValueError('Unsupported search index version')
+
+        with self._lock:
+            self.clear()
+            self.search_version = data.get('search_version')
+            for doc_id, terms in data['documents'].items():
+                self._add_terms(doc_id, terms)
+
+    def _add_terms(self, doc_id, terms):
+        self.documents[doc_id] = terms
+        self.lengths[doc_id] = sum(terms.values())
+        self.total_length += self.lengths[doc_id]
+        for term, tf in terms.items():
+            self.postings[term][doc_id] = tf
+
+
+_index = None
+_checked = 0
+_index_lock = threading.Lock()
+
+
+def current_search_version():
+    # imported here as the cache module uses the tokenizer
+    from .cache import search_version
+    return search_version()
+
+
+def build_index():
+    """Create a new index containing every live product"""
+    index = SearchIndex()
+    # read before the products so a change made while building is not lost
+    index.search_version = current_search_version()
+    products = Product.live.only(
+        'id', 'title', 'brand', 'category', 'description')
+    categories = category_nodes()
+
+    for product in products.iterator():
+        index.add(str(product.pk), product_fields(product, categories))
+
+    return index
+
+
+def get_index():
+    """Return the process wide search index, loading it from disk (or
+    building it from the database) the first time it is needed. Products
+    may be changed by other processes so the index is rebuilt when the
+    search version has changed (checked at most every
+    PRODUCT_SUGGEST_REFRESH_INTERVAL seconds)."""
+    global _index, _checked
+
+    now = time.monotonic()
+    if _index is not None and \
+            now - _checked < settings.PRODUCT_SUGGEST_REFRESH_INTERVAL:
+        return _index
+
+    with _index_lock:
+        version = current_search_version()
+        if _index is None or _index.search_version != version:
+            _index = _load_or_build_index(version)
+        _checked = now
+
+    return _index
+
+
+def reset_index():
+    """Discard the process wide index, it is rebuilt when next used"""
+    global _index
+    _index = None
+
+
+def _load_or_build_index(version):
+    path = settings.PRODUCT_SEARCH_INDEX_PATH
+
+    if path and os.path.exists(path):
+        index = SearchIndex()
+        try:
+            index.load(path)
+            # snapshots of older text are rebuilt
+            if index.search_version == version:
+                return index
+        except (OSError, ValueError, KeyError):
+            # unreadable snapshot, fall back to the database
+            pass
+
+    index = build_index()
+    if path:
+        index.save(path)
+    return index
+
+
+def update_product(product):
+    """Bring the index in line with a saved product"""
+    if _index is None:
+        return
+
+    if product.is_live:
+        _index.add(str(product.pk), product_fields(product))
+    else:
+        _index.remove(str(product.pk))
+
+
+def remove_product(product_id):
+    """Remove a deleted product from the index"""
+    if _index is not None:
+        _index.remove(str(product_id))
+
+
+def search_products(keywords):
+    """Return the ids of live products matching the keywords, best match
+    first"""
+    ranked = get_index().search(
+        keywords, limit=settings.PRODUCT_SEARCH_MAX_RESULTS)
+
+    # the index may briefly hold products changed outside this process
+    live = set(Product.live.filter(pk__in=ranked).values_list(
+        'pk', flat=True))
+
+    return [product_id for product_id in map(uuid.UUID, ranked)
+            if product_id in live]
@@ -0,0 +1,197 @@
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F, Case, When, Value, FloatField
+from django.db.models.functions import Cast, Now
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import images, search, spelling, suggest
+from .cache import bump_catalog_version, bump_search_version
+from .categories import invalidate_category_tree
+from .models import Category, Product, Review
+
+
+def update_product_rating(product_id, added=None, removed=None):
+    """Apply a review rating being added and/or removed to the stored
+    product rating aggregates and histogram"""
+    if added == removed:
+        return
+
+    changes = {
+        'rating_sum': F('rating_sum') + (added or 0) - (removed or 0),
+        'rating_count': F('rating_count') + int(added is not None) -
+        int(removed is not None),
+        'updated_at': Now(),
+    }
+    if added is not None:
+        changes[f'rating_{added}'] = F(f'rating_{added}') + 1
+    if removed is not None:
+        changes[f'rating_{removed}'] = F(f'rating_{removed}') - 1
+
+    products = Product.objects.filter(pk=product_id)
+
+    with transaction.atomic():
+        products.update(**changes)
+        # average is derived from the updated totals in a second statement
+        # so that every database reads the new values
+        products.update(rating_avg=Case(
+            When(rating_count=0, then=Value(0.0)),
+            default=Cast('rating_sum', FloatField()) / F('rating_count'),
+            output_field=FloatField()))
+
+
+@receiver(pre_save, sender=Review)
+def store_previous_rating(sender, instance, **kwargs):
+    """Remember the stored rating of an existing review before it changes"""
+    instance._previous_rating = None
+
+    if instance.pk:
+        instance._previous_rating = Review.objects.filter(
+            pk=instance.pk).values_list('product_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def add_review_rating(sender, instance, created, **kwargs):
+    """Keep product rating aggregates in step with new and edited reviews"""
+    previous = getattr(instance, '_previous_rating', None)
+
+    if created or previous is None:
+        update_product_rating(instance.product_id, added=instance.rating)
+        return
+
+    previous_product_id, previous_rating = previous
+
+    if previous_product_id == instance.product_id:
+        update_product_rating(instance.product_id, added=instance.rating,
+                              removed=previous_rating)
+    else:
+        # review moved between products
+        update_product_rating(previous_product_id, removed=previous_rating)
+        update_product_rating(instance.product_id, added=instance.rating)
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    """Remove a deleted review from the product rating aggregates"""
+    update_product_rating(instance.product_id, removed=instance.rating)
+
+
+@receiver(pre_save, sender=Product)
+def store_previous_product(sender, instance, **kwargs):
+    """Remember the stored image and search text of an existing product
+    before it changes, read with a single query"""
+    instance._previous_values = None
+
+    if not instance._state.adding:
+        instance._previous_values = Product.objects.filter(
+            pk=instance.pk).values('image', *search.INDEXED_FIELDS).first()
+
+
+@receiver(pre_save, sender=Product)
+def reset_image_derivatives(sender, instance, **kwargs):
+    """Variants of a replaced image are no longer valid"""
+    previous = getattr(instance, '_previous_values', None)
+    previous_image = previous['image'] if previous else None
+
+    # uncommitted files are new uploads, possibly with the same name
+    if not instance.image._committed or instance.image.name != previous_image:
+        instance.image_derivatives = ''
+
+
+@receiver(post_save, sender=Product)
+def generate_image_derivatives(sender, instance, **kwargs):
+    """Create resized variants of a new image in the background once the
+    product is saved, pages use the original image until they exist"""
+    if instance.image and not instance.image_derivatives:
+        transaction.on_commit(partial(
+            images.image_queue.add, instance.pk, instance.image.name))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Update the search indexes when the searchable text of a product
+    changes, other changes such as stock or ratings leave them alone"""
+    previous = getattr(instance, '_previous_values', None)
+    if previous is not None and all(
+            previous[name] == getattr(instance, name)
+            for name in search.INDEXED_FIELDS):
+        return
+
+    bump_search_version()
+    search.update_product(instance)
+    suggest.invalidate()
+    spelling.invalidate()
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Remove deleted products from the search index"""
+    bump_search_version()
+    search.remove_product(instance.pk)
+    suggest.invalidate()
+    spelling.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def reindex_categories(sender, instance, **kwargs):
+    """Product search text includes category names so the indexes are
+    rebuilt when a category changes"""
+    bump_search_version()
+    search.reset_index()
+    suggest.invalidate()
+    spelling.invalidate()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_categories(sender, **kwargs):
+    """The category tree holds product counts so is rebuilt when products
+    change"""
+    invalidate_category_tree()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Any product change (reviews change product ratings) invalidates
+    cached catalog data"""
+    bump_catalog_version()
+
+
+# every receiver above, in the order they are connected
+RECEIVERS = (
+    store_previous_rating, add_review_rating, remove_review_rating,
+    store_previous_product, reset_image_derivatives,
+    generate_image_derivatives, index_product, unindex_product,
+    reindex_categories, invalidate_categories, invalidate_catalog_cache,
+)
+
+
+@contextmanager
+def catalog_signals_disconnected():
+    """Disconnect the receivers above while writing data that is rolled
+    back, such as a benchmark catalog. Cache versions and search indexes
+    live outside the database so a rollback would not undo their
+    invalidation."""
+    disconnected = [
+        (signal, handler, model)
+        for signal in (pre_save, post_save, post_delete)
+        for model in (Category, Product, Review)
+        for handler in RECEIVERS
+        if signal.disconnect(handler, sender=model)
+    ]
+
+    try:
+        yield
+    finally:
+        for signal, handler, model in disconnected:
+            signal.connect(handler, sender=model)
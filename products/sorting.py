@@ -0,0 +1,26 @@
+# key, label, ordering - each ordering is served by a partial index on live
+# products and ends in the primary key so cursor pagination is stable
+SORT_OPTIONS = (
+    ('newest', 'Newest', ('-created_at', '-id')),
+    ('price_asc', 'Price: low to high', ('price', 'id')),
+    ('price_desc', 'Price: high to low', ('-price', '-id')),
+    ('rating', 'Top rated', ('-rating_avg', '-id')),
+    ('best_selling', 'Best selling', ('-sales_count', '-id')),
+)
+
+# search results are ranked by the search index unless sorted
+RELEVANCE = ('relevance', 'Relevance', None)
+
+SORT_ORDERINGS = {key: ordering for key, label, ordering in SORT_OPTIONS}
+
+
+def parse_sort(params, default=None):
+    """Return the sort mode in a query dict if it is valid"""
+    sort = params.get('sort')
+    return sort if sort in SORT_ORDERINGS else default
+
+
+def sort_options(current, options=SORT_OPTIONS):
+    """Return the sort modes for the template, flagging the one in use"""
+    return [{'value': key, 'label': label, 'active': key == current}
+            for key, label, ordering in options]
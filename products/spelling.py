@@ -0,0 +1,168 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+
+from .cache import search_version
+from .categories import category_tree, walk
+from .models import Product
+from .search import STOP_WORDS, TOKEN_RE
+
+
+def deletes(word, max_distance):
+    """Return every string made by removing up to max_distance characters
+    from word, including the word itself"""
+    results = {word}
+    current = {word}
+
+    for _ in range(max_distance):
+        current = {variant[:position] + variant[position + 1:]
+                   for variant in current if len(variant) > 1
+                   for position in range(len(variant))}
+        results |= current
+
+    return results
+
+
+def edit_distance(source, target, max_distance):
+    """Damerau-Levenshtein (optimal string alignment) distance between two
+    words, or max_distance + 1 once it is known to be larger"""
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    before_previous_row = previous_row = None
+    row = list(range(len(target) + 1))
+
+    for i in range(1, len(source) + 1):
+        previous_row, row = row, [i] + [0] * len(target)
+        for j in range(1, len(target) + 1):
+            cost = source[i - 1] != target[j - 1]
+            row[j] = min(previous_row[j] + 1, row[j - 1] + 1,
+                         previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and source[i - 1] == target[j - 2] and \
+                    source[i - 2] == target[j - 1]:
+                row[j] = min(row[j], before_previous_row[j - 2] + 1)
+        before_previous_row = previous_row
+
+        if min(row) > max_distance:
+            return max_distance + 1
+
+    return row[-1]
+
+
+class SpellingIndex:
+    """Symmetric delete spelling corrector, every vocabulary word is stored
+    under the strings left by deleting up to max_distance of its characters
+    so a misspelling is looked up through its own deletes instead of by
+    comparing it with the whole vocabulary"""
+    max_distance = 2
+
+    def __init__(self, words):
+        # word -> number of times it appears in the catalog
+        self.words = Counter(words)
+        # delete -> words it was made from
+        self.deletes = defaultdict(list)
+
+        for word in self.words:
+            for variant in deletes(word, self.max_distance):
+                self.deletes[variant].append(word)
+
+    def __len__(self):
+        return len(self.words)
+
+    def correct_word(self, word):
+        """Return the closest, most common vocabulary word to a misspelled
+        word, or None if there is nothing close enough"""
+        if word in self.words:
+            return word
+
+        # short words are only allowed a single typo
+        max_distance = 1 if len(word) <= 4 else self.max_distance
+        best, best_key = None, None
+
+        for variant in deletes(word, max_distance):
+            for candidate in self.deletes.get(variant, ()):
+                distance = edit_distance(word, candidate, max_distance)
+                if distance > max_distance:
+                    continue
+                key = (distance, -self.words[candidate], candidate)
+                if best_key is None or key < best_key:
+                    best, best_key = candidate, key
+
+        return best
+
+    def correct(self, query):
+        """Return the query with misspelled words replaced, or None if no
+        words could be corrected"""
+        words = TOKEN_RE.findall(query.lower())
+        corrected, changed = [], False
+
+        for word in words:
+            replacement = None
+            if word not in STOP_WORDS and not word.isdigit() and len(word) > 2:
+                replacement = self.correct_word(word)
+
+            if replacement and replacement != word:
+                changed = True
+            corrected.append(replacement or word)
+
+        return ' '.join(corrected) if changed else None
+
+
+def catalog_words():
+    """Yield the words of live product titles and brands (once per product)
+    and of category names (once per product in the category)"""
+    for title, brand in Product.live.values_list(
+            'title', 'brand').iterator():
+        yield from TOKEN_RE.findall(f'{title} {brand}'.lower())
+
+    for node in walk(category_tree()):
+        for word in TOKEN_RE.findall(node['name'].lower()):
+            yield from [word] * node['product_count']
+
+
+def build_spelling_index():
+    """Create a spelling index from the catalog vocabulary"""
+    return SpellingIndex(
+        word for word in catalog_words()
+        if word not in STOP_WORDS and not word.isdigit())
+
+
+_index = None
+_version = None
+_checked = 0
+_lock = threading.Lock()
+
+
+def get_spelling_index():
+    """Return the process wide spelling index, rebuilding it when the
+    search version has changed (checked at most every
+    PRODUCT_SUGGEST_REFRESH_INTERVAL seconds)"""
+    global _index, _version, _checked
+
+    now = time.monotonic()
+    if _index is not None and \
+            now - _checked < settings.PRODUCT_SUGGEST_REFRESH_INTERVAL:
+        return _index
+
+    with _lock:
+        version = search_version()
+        if _index is None or version != _version:
+            _index = build_spelling_index()
+            _version = version
+        _checked = now
+
+    return _index
+
+
+def invalidate():
+    """Rebuild the index on next use, called when products change in this
+    process"""
+    global _index
+    _index = None
+
+
+def suggest_keywords(keywords):
+    """Return a corrected search for keywords that match nothing"""
+    return get_spelling_index().correct(keywords)
@@ -0,0 +1,146 @@
+import bisect
+import heapq
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db.models import Count
+
+from .cache import search_version
+from .categories import category_tree, walk
+from .models import Product
+
+
+def normalize(text):
+    return ' '.join(text.lower().split())
+
+
+class SuggestionIndex:
+    """Prefix index over product titles, brands and categories held as a
+    sorted array of keys, lookups are a binary search. Short prefixes match
+    much of the index so their best suggestions are found when the index
+    is built."""
+    # longest prefix, and most suggestions, worked out in advance
+    precomputed_length = 3
+    precomputed_limit = 10
+
+    def __init__(self, entries):
+        # products sharing a title (or brand) make a single suggestion
+        weights = Counter()
+        for text, kind, weight in entries:
+            weights[text, kind] += weight
+
+        # key -> suggestion, suggestion is (weight, text, kind)
+        items = []
+        for (text, kind), weight in weights.items():
+            key = normalize(text)
+            words = key.split(' ')
+            suggestion = (weight, text, kind)
+            # match the start of every word, e.g. 'bone' in 'squeaky bone'
+            for position in range(len(words)):
+                items.append((' '.join(words[position:]), suggestion))
+
+        items.sort(key=lambda item: item[0])
+        self.keys = [key for key, suggestion in items]
+        self.suggestions = [suggestion for key, suggestion in items]
+
+        matches = defaultdict(set)
+        for key, suggestion in items:
+            for length in range(1, min(len(key), self.precomputed_length) + 1):
+                matches[key[:length]].add(suggestion)
+        self.top = {
+            prefix: [{'text': text, 'type': kind}
+                     for weight, text, kind in heapq.nlargest(
+                         self.precomputed_limit, suggestions)]
+            for prefix, suggestions in matches.items()
+        }
+
+    def __len__(self):
+        return len(self.keys)
+
+    def suggest(self, prefix, limit=8):
+        """Return the highest weighted suggestions starting with prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        if len(prefix) <= self.precomputed_length and \
+                limit <= self.precomputed_limit:
+            return self.top.get(prefix, [])[:limit]
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + '\uffff', lo=start)
+
+        # a suggestion matching at several words appears more than once,
+        # take the best until there are enough distinct ones
+        results, seen = [], set()
+        for weight, text, kind in sorted(
+                self.suggestions[start:end], reverse=True):
+            if (text, kind) in seen:
+                continue
+            seen.add((text, kind))
+            results.append({'text': text, 'type': kind})
+            if len(results) == limit:
+                break
+
+        return results
+
+
+def build_suggestion_index():
+    """Create a suggestion index from live products, titles are weighted by
+    number of reviews, brands and categories by number of products"""
+    products = Product.live.all()
+
+    entries = [
+        (title, 'title', rating_count + 1)
+        for title, rating_count in products.values_list(
+            'title', 'rating_count').iterator()
+    ]
+    entries += [
+        (row['brand'], 'brand', row['total'])
+        for row in products.values('brand').annotate(
+            total=Count('id')).order_by()
+    ]
+    # category counts include the products in categories below them
+    entries += [
+        (node['name'], 'category', node['product_count'])
+        for node in walk(category_tree()) if node['product_count']
+    ]
+
+    return SuggestionIndex(entries)
+
+
+_index = None
+_version = None
+_checked = 0
+_lock = threading.Lock()
+
+
+def get_suggestion_index():
+    """Return the process wide suggestion index, rebuilding it when the
+    search version has changed (checked at most every
+    PRODUCT_SUGGEST_REFRESH_INTERVAL seconds). Review counts used as
+    weights are brought up to date by the next rebuild."""
+    global _index, _version, _checked
+
+    now = time.monotonic()
+    if _index is not None and \
+            now - _checked < settings.PRODUCT_SUGGEST_REFRESH_INTERVAL:
+        return _index
+
+    with _lock:
+        version = search_version()
+        if _index is None or version != _version:
+            _index = build_suggestion_index()
+            _version = version
+        _checked = now
+
+    return _index
+
+
+def invalidate():
+    """Rebuild the index on next use, called when products change in this
+    process"""
+    global _index
+    _index = None
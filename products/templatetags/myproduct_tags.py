@@ -1,5 +1,8 @@
 from django import template
 
+from ..categories import category_tree
+from ..images import MIME_TYPES, variant_name
+
 register = template.Library()
 
 
@@ -31,3 +34,71 @@ def star_generator(individual_rating, star_rating=5):
             break
 
     return output_html
+
+
+@register.simple_tag(takes_context=True)
+def query_string(context, **kwargs):
+    """Return the current query string with the given parameters replaced,
+    parameters set to None are removed"""
+    params = context['request'].GET.copy()
+
+    for key, value in kwargs.items():
+        if value is None:
+            params.pop(key, None)
+        else:
+            params[key] = value
+
+    return '?' + params.urlencode()
+
+
+@register.simple_tag(takes_context=True)
+def facet_query_string(context, name, value):
+    """Return the query string that toggles a facet filter, the position in
+    the results is reset as the results change"""
+    params = context['request'].GET.copy()
+
+    for key in ('cursor', 'page'):
+        params.pop(key, None)
+
+    if params.get(name) == str(value):
+        params.pop(name)
+    else:
+        params[name] = value
+
+    return '?' + params.urlencode()
+
+
+@register.inclusion_tag('partials/_category_menu.html')
+def category_menu():
+    """Render the navigation menu of categories that have live products,
+    the tree is cached so this does not usually query the database"""
+    return {
+        'categories': [node for node in category_tree()
+                       if node['product_count']],
+    }
+
+
+@register.inclusion_tag('partials/_product_image.html')
+def product_image(product, variant, alt='Product image'):
+    """Render a product image at the size of the given variant, offering
+    the browser each format generated for it"""
+    image = product.image
+    if not image:
+        return {'src': '', 'alt': alt}
+
+    extensions = [extension for extension in
+                  product.image_derivatives.split(',') if extension]
+    if not extensions:
+        # variants not generated yet
+        return {'src': image.url, 'alt': alt}
+
+    urls = {extension: image.storage.url(
+        variant_name(image.name, variant, extension))
+        for extension in extensions}
+
+    return {
+        'sources': [{'url': url, 'type': MIME_TYPES[extension]}
+                    for extension, url in urls.items() if extension != 'jpg'],
+        'src': urls.get('jpg', image.url),
+        'alt': alt,
+    }
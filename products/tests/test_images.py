@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from PIL import Image
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, \
+    override_settings
+
+from petstore.storage_backends import CachedURLMixin, PublicMediaStorage
+from .. import images
+from ..models import Category, Product
+
+
+class ProductImageTest(TestCase):
+    """Resized variants of product images"""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+        self.product = Product.objects.create(
+            title='Doggie Treats',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99,
+            stock=11,
+            description='Doggie Treats',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root)
+
+    def render(self, variant):
+        return Template(
+            '{% load myproduct_tags %}{% product_image product variant %}'
+        ).render(Context({'product': self.product, 'variant': variant}))
+
+    def test_generate_derivatives(self):
+        name = self.product.image.name
+        extensions = images.generate_derivatives(default_storage, name)
+        self.assertIn('jpg', extensions)
+        self.assertIn('webp', extensions)
+
+        for variant, size in images.VARIANTS:
+            for extension in extensions:
+                path = default_storage.path(
+                    images.variant_name(name, variant, extension))
+                with Image.open(path) as image:
+                    self.assertLessEqual(image.width, size[0])
+                    self.assertLessEqual(image.height, size[1])
+
+    def test_update_product_images(self):
+        images.update_product_images(self.product.pk,
+                                     self.product.image.name)
+        self.product.refresh_from_db()
+        self.assertIn('webp', self.product.image_derivatives.split(','))
+
+    def test_broken_image_is_logged(self):
+        with self.assertLogs('products.images', 'ERROR'):
+            images.update_product_images(self.product.pk, 'missing.jpg')
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_derivatives, '')
+
+    def test_replacing_image_resets_derivatives(self):
+        Product.objects.filter(pk=self.product.pk).update(
+            image_derivatives='webp,jpg')
+        self.product.refresh_from_db()
+
+        # saving without changing the image keeps the variants
+        self.product.title = 'Doggie Chews'
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_derivatives, 'webp,jpg')
+
+        self.product.image = SimpleUploadedFile(
+            name='image.jpg',
+            content=open(settings.BASE_DIR + '/test/image.jpg', 'rb').read(),
+            content_type='image/jpeg')
+        self.product.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_derivatives, '')
+
+    def test_template_uses_original_without_derivatives(self):
+        output = self.render('card')
+        self.assertNotIn('<picture>', output)
+        self.assertIn(f'src="{self.product.image.url}"', output)
+
+    def test_template_offers_each_format(self):
+        self.product.image_derivatives = 'webp,jpg'
+        output = self.render('card')
+
+        name = self.product.image.name
+        self.assertIn('<picture>', output)
+        self.assertIn('type="image/webp"', output)
+        self.assertIn(default_storage.url(
+            images.variant_name(name, 'card', 'webp')), output)
+        self.assertIn('src="' + default_storage.url(
+            images.variant_name(name, 'card', 'jpg')) + '"', output)
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('generate_product_images', workers=1, stdout=out)
+
+        self.product.refresh_from_db()
+        self.assertIn('jpg', self.product.image_derivatives.split(','))
+        self.assertTrue(os.path.exists(default_storage.path(
+            images.variant_name(self.product.image.name, 'thumbnail',
+                                'jpg'))))
+        self.assertIn('Generated variants for 1 images (0 failed)',
+                      out.getvalue())
+
+        # products with variants are skipped unless regenerating
+        call_command('generate_product_images', workers=1, stdout=out)
+        self.assertIn('Generated variants for 0 images', out.getvalue())
+
+
+class ImageQueueTest(TransactionTestCase):
+    """Variants of saved images are generated in a background thread"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_variants_are_generated_after_commit(self):
+        product = Product.objects.create(
+            title='Doggie Treats', brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99, stock=11, description='Doggie Treats',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'),
+            is_live=True)
+
+        images.image_queue.join()
+        product.refresh_from_db()
+        self.assertIn('webp', product.image_derivatives.split(','))
+
+
+class CountingStorage(FileSystemStorage):
+    url_calls = 0
+
+    def url(self, name):
+        self.url_calls += 1
+        return super().url(name)
+
+
+class CachedStorage(CachedURLMixin, CountingStorage):
+    pass
+
+
+class CachedURLStorageTest(SimpleTestCase):
+    """Storage URLs should be built once per file"""
+
+    def setUp(self):
+        self.location = tempfile.mkdtemp()
+        self.storage = CachedStorage(location=self.location,
+                                     base_url='/media/')
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+
+    def test_url_is_cached(self):
+        self.assertEqual(self.storage.url('products/bone.jpg'),
+                         '/media/products/bone.jpg')
+        self.assertEqual(self.storage.url('products/bone.jpg'),
+                         '/media/products/bone.jpg')
+        self.assertEqual(self.storage.url_calls, 1)
+
+    def test_save_and_delete_forget_url(self):
+        self.storage.url('bone.jpg')
+        name = self.storage.save('bone.jpg', ContentFile(b'bone'))
+        self.storage.url(name)
+        self.storage.delete(name)
+        self.storage.url(name)
+        self.assertEqual(self.storage.url_calls, 3)
+
+    def test_cache_size_is_limited(self):
+        self.storage.url_cache_size = 2
+        for name in ('a.jpg', 'b.jpg', 'c.jpg', 'a.jpg'):
+            self.storage.url(name)
+        self.assertEqual(self.storage.url_calls, 4)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_image_urls', pages=2, stdout=out)
+        self.assertIn('uncached:', out.getvalue())
+        self.assertIn('cached:', out.getvalue())
+
+
+class DirectUploadStorageTest(SimpleTestCase):
+    """Presigned posts are built locally from the storage settings"""
+
+    def test_presigned_post(self):
+        storage = PublicMediaStorage(
+            access_key='test', secret_key='test', bucket_name='petstore',
+            default_acl='public-read')
+
+        post = storage.presigned_post('uploads/abc/bone.jpg', 'image/jpeg',
+                                      1024, 600)
+        self.assertIn('petstore', post['url'])
+        self.assertEqual(post['fields']['key'], 'media/uploads/abc/bone.jpg')
+        self.assertEqual(post['fields']['acl'], 'public-read')
+        self.assertEqual(post['fields']['Content-Type'], 'image/jpeg')
+        self.assertIn('policy', post['fields'])
@@ -0,0 +1,395 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+
+from checkout.models import Order, OrderItem
+
+from ..cache import catalog_version
+from ..categories import category_tree
+from ..models import Category, Product, Review
+
+
+class ProductRatingTest(TestCase):
+    """Stored rating aggregates should match the product reviews"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(
+            title='Doggie Treats',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99,
+            stock=11,
+            description='Doggie Treats',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+
+        # create dummy users to leave reviews
+        cls.users = [
+            get_user_model().objects.create_user(
+                username=f'test_user{user_number}@email.com',
+                email=f'test_user{user_number}@email.com',
+                password='pass123')
+            for user_number in range(3)
+        ]
+
+    def add_review(self, user, rating):
+        return Review.objects.create(product=self.product, rating=rating,
+                                     review='Product rating', user=user)
+
+    def test_new_product_has_no_rating(self):
+        """Products without reviews should have empty aggregates"""
+        self.assertEqual(self.product.rating_sum, 0)
+        self.assertEqual(self.product.rating_count, 0)
+        self.assertEqual(self.product.rating_avg, 0)
+        self.assertEqual(self.product.review_count(), 0)
+        self.assertEqual(
+            [row['count'] for row in self.product.rating_histogram],
+            [0, 0, 0, 0, 0])
+
+    def test_review_create_updates_rating(self):
+        """Adding reviews should update the count and average"""
+        self.add_review(self.users[0], 5)
+        self.add_review(self.users[1], 2)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 7)
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, 3.5)
+        self.assertEqual(
+            [(row['rating'], row['count'], row['percent'])
+             for row in self.product.rating_histogram],
+            [(5, 1, 50), (4, 0, 0), (3, 0, 0), (2, 1, 50), (1, 0, 0)])
+
+    def test_review_update_updates_rating(self):
+        """Changing a review rating should replace the old rating"""
+        review = self.add_review(self.users[0], 5)
+        self.add_review(self.users[1], 3)
+
+        review.rating = 1
+        review.save()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 4)
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, 2)
+        self.assertEqual(self.product.rating_5, 0)
+        self.assertEqual(self.product.rating_3, 1)
+        self.assertEqual(self.product.rating_1, 1)
+
+    def test_review_moved_between_products(self):
+        """Moving a review should move its rating to the new product"""
+        other = Product.objects.create(
+            title='Kitty Treats', brand='Pawfect',
+            category=self.product.category, price=4.99, stock=3,
+            description='Kitty Treats', is_live=True)
+        review = self.add_review(self.users[0], 4)
+
+        review.product = other
+        review.save()
+
+        self.product.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 0)
+        self.assertEqual(self.product.rating_4, 0)
+        self.assertEqual(other.rating_count, 1)
+        self.assertEqual(other.rating_4, 1)
+
+    def test_review_delete_updates_rating(self):
+        """Deleting reviews should remove them from the aggregates"""
+        review = self.add_review(self.users[0], 5)
+        self.add_review(self.users[1], 3)
+        self.add_review(self.users[2], 4)
+
+        review.delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, 3.5)
+
+        # queryset deletes should also be reflected
+        Review.objects.all().delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 0)
+        self.assertEqual(self.product.rating_count, 0)
+        self.assertEqual(self.product.rating_avg, 0)
+        self.assertEqual(self.product.rating_5, 0)
+        self.assertEqual(self.product.rating_3, 0)
+
+    def test_rebuild_command_repairs_drift(self):
+        """Management command should recalculate aggregates from reviews"""
+        self.add_review(self.users[0], 4)
+        self.add_review(self.users[1], 1)
+
+        # simulate aggregates drifting from the review data
+        Product.objects.update(rating_sum=0, rating_count=9, rating_avg=5,
+                               rating_4=0, rating_2=3)
+        self.product.refresh_from_db()
+        updated_at = self.product.updated_at
+        version = catalog_version()
+
+        out = StringIO()
+        call_command('rebuild_product_ratings', batch_size=1, stdout=out)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 5)
+        self.assertEqual(self.product.rating_count, 2)
+        self.assertEqual(self.product.rating_avg, 2.5)
+        self.assertEqual(
+            [row['count'] for row in self.product.rating_histogram],
+            [0, 1, 0, 0, 1])
+        self.assertIn('Rebuilt ratings for 1 products (1 repaired)',
+                      out.getvalue())
+        # cached pages showing the product are invalidated
+        self.assertGreater(self.product.updated_at, updated_at)
+        self.assertNotEqual(catalog_version(), version)
+
+    def test_rebuild_sales_counts_repairs_drift(self):
+        """Management command should recount sales from order items"""
+        order = Order.objects.create(user=self.users[0])
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=self.product, price=9.99)
+            for item in range(3))
+        Product.objects.update(sales_count=7)
+        self.product.refresh_from_db()
+        updated_at = self.product.updated_at
+        version = catalog_version()
+
+        out = StringIO()
+        call_command('rebuild_sales_counts', batch_size=1, stdout=out)
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.sales_count, 3)
+        self.assertIn('1 repaired', out.getvalue())
+        self.assertGreater(self.product.updated_at, updated_at)
+        self.assertNotEqual(catalog_version(), version)
+
+
+class CategoryTest(TestCase):
+    """Categories should store the path of ids from the root category"""
+
+    def setUp(self):
+        cache.clear()
+        self.dog = Category.objects.create(name='Dog', slug='dog')
+        self.food = Category.objects.create(name='Food', slug='food',
+                                            parent=self.dog)
+        self.treats = Category.objects.create(name='Treats', slug='treats',
+                                              parent=self.food)
+        self.cat = Category.objects.create(name='Cat', slug='cat')
+
+    def add_product(self, category, is_live=True):
+        return Product.objects.create(
+            title='Doggie Treats', brand='Pawfect', category=category,
+            price=9.99, stock=11, description='Doggie Treats',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=is_live
+        )
+
+    def test_path_and_depth(self):
+        self.assertEqual(self.dog.path, f'/{self.dog.pk}/')
+        self.assertEqual(self.treats.path,
+                         f'/{self.dog.pk}/{self.food.pk}/{self.treats.pk}/')
+        self.assertEqual(self.treats.depth, 2)
+        self.assertEqual(list(self.treats.get_ancestors()),
+                         [self.dog, self.food])
+
+    def test_subtree_queries(self):
+        self.assertEqual(list(self.dog.get_descendants()),
+                         [self.food, self.treats])
+
+        treats = self.add_product(self.treats)
+        food = self.add_product(self.food)
+        self.add_product(self.cat)
+        self.add_product(self.dog, is_live=False)
+
+        self.assertEqual(set(self.dog.get_products()), {treats, food})
+        self.assertEqual(list(self.treats.get_products()), [treats])
+
+    def test_moving_category_moves_subtree(self):
+        self.food.parent = self.cat
+        self.food.save()
+
+        self.treats.refresh_from_db()
+        self.assertEqual(self.treats.path,
+                         f'/{self.cat.pk}/{self.food.pk}/{self.treats.pk}/')
+        self.assertEqual(self.treats.depth, 2)
+
+        # promote to a root category
+        self.food.parent = None
+        self.food.save()
+        self.treats.refresh_from_db()
+        self.assertEqual(self.treats.path,
+                         f'/{self.food.pk}/{self.treats.pk}/')
+        self.assertEqual(self.treats.depth, 1)
+
+    def test_category_cannot_be_nested_under_itself(self):
+        self.dog.parent = self.treats
+        with self.assertRaises(ValueError):
+            self.dog.save()
+
+    def test_category_tree_is_cached(self):
+        self.add_product(self.treats)
+        self.add_product(self.cat)
+
+        tree = category_tree()
+        self.assertEqual([node['name'] for node in tree], ['Cat', 'Dog'])
+        dog = tree[1]
+        self.assertEqual(dog['product_count'], 1)
+        self.assertEqual(dog['children'][0]['children'][0]['full_name'],
+                         'Dog > Food > Treats')
+
+        with self.assertNumQueries(0):
+            category_tree()
+
+        # product changes rebuild the tree
+        self.add_product(self.food)
+        self.assertEqual(category_tree()[1]['product_count'], 2)
+
+
+class ProductImportTest(TestCase):
+    """Catalog files should round trip through the import and export
+    commands, matching products on SKU"""
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w', newline='') as f:
+            f.write(content)
+        return path
+
+    def import_file(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command('import_products', path, stdout=out, stderr=err,
+                     **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_creates_and_updates(self):
+        path = self.write_file('catalog.csv', (
+            'sku,title,brand,category,price,stock,description,is_live\n'
+            'DT-1,Doggie Treats,Pawfect,Dog > Treats,9.99,11,Tasty,yes\n'
+            'CB-1,Cat Bed,Snooze,Cat,25.00,3,Comfy,no\n'
+        ))
+        out, err = self.import_file(path, batch_size=1)
+
+        self.assertIn('2 created, 0 updated, 0 failed', out)
+        treats = Product.objects.get(sku='DT-1')
+        self.assertEqual(treats.category.name, 'Treats')
+        self.assertEqual(treats.category.parent.name, 'Dog')
+        self.assertTrue(treats.is_live)
+        self.assertFalse(Product.objects.get(sku='CB-1').is_live)
+
+        # updates only change the columns in the file
+        path = self.write_file('update.jsonl', (
+            '{"sku": "DT-1", "price": "7.50", "stock": 4}\n'
+            '{"sku": "NEW-1", "price": "1.00"}\n'
+            '{"sku": "CB-1", "stock": -1}\n'
+            'not json\n'
+        ))
+        out, err = self.import_file(path)
+
+        self.assertIn('0 created, 1 updated, 3 failed', out)
+        self.assertIn('Line 2: title', err)
+        self.assertIn('Line 3: stock', err)
+        self.assertIn('Line 4:', err)
+        treats.refresh_from_db()
+        self.assertEqual(str(treats.price), '7.50')
+        self.assertEqual(treats.stock, 4)
+        self.assertEqual(treats.title, 'Doggie Treats')
+        self.assertEqual(Category.objects.count(), 3)
+
+    def test_import_checks_field_lengths(self):
+        path = self.write_file('catalog.jsonl', (
+            '{"sku": "%s", "title": "Bone", "brand": "Pawfect", '
+            '"category": "Dog", "price": "1.00", "description": "Bone"}\n'
+            '{"sku": "B-2", "title": "Bone", "brand": "Pawfect", '
+            '"category": "Dog > %s", "price": "1.00", "description": "Bone"}\n'
+            '{"sku": "B-3", "title": "Bone", "brand": "Pawfect", '
+            '"category": "Dog", "price": "1.00", "description": "Bone", '
+            '"image": "%s.jpg"}\n'
+        ) % ('S' * 65, 'C' * 101, 'i' * 100))
+        out, err = self.import_file(path)
+
+        self.assertIn('0 created, 0 updated, 3 failed', out)
+        self.assertIn('Line 1: sku', err)
+        self.assertIn('Line 2: category', err)
+        self.assertIn('Line 3: image', err)
+
+    def test_import_reports_failed_batches(self):
+        path = self.write_file('catalog.csv', (
+            'sku,title,brand,category,price,description,image\n'
+            'B-1,Bone,Pawfect,Dog,1.00,Bone,products/bone.jpg\n'
+            'B-2,Bone,Pawfect,Dog,1.00,Bone,\n'
+            'B-3,Bone,Pawfect,Dog,1.00,Bone,\n'
+        ))
+        bulk_create = Product.objects.bulk_create
+
+        def fail_second_batch(products, **kwargs):
+            if any(product.sku == 'B-2' for product in products):
+                raise DatabaseError('value too long')
+            return bulk_create(products, **kwargs)
+
+        with mock.patch.object(Product.objects, 'bulk_create',
+                               fail_second_batch):
+            out, err = self.import_file(path, batch_size=1)
+
+        self.assertIn('2 created, 0 updated, 1 failed', out)
+        self.assertIn('Line 3: could not be saved: value too long', err)
+        self.assertIn('1 products have new images, run '
+                      'generate_product_images', out)
+
+    def test_products_added_without_sku_round_trip(self):
+        product = Product.objects.create(
+            title='Doggie Treats', brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99, description='Tasty')
+        self.assertTrue(product.sku)
+
+        export_path = os.path.join(self.directory.name, 'export.csv')
+        call_command('export_products', export_path, stderr=StringIO())
+        out, err = self.import_file(export_path)
+
+        self.assertIn('0 created, 1 updated, 0 failed', out)
+        self.assertEqual(Product.objects.get().pk, product.pk)
+
+    def test_export_round_trip(self):
+        path = self.write_file('catalog.jsonl', (
+            '{"sku": "DT-1", "title": "Doggie Treats", "brand": "Pawfect", '
+            '"category": "Dog > Treats", "price": "9.99", '
+            '"description": "Tasty", "is_live": true}\n'
+        ))
+        self.import_file(path)
+
+        for name in ('export.csv', 'export.jsonl'):
+            export_path = os.path.join(self.directory.name, name)
+            call_command('export_products', export_path, stderr=StringIO())
+
+            Product.objects.update(title='Changed')
+            out, err = self.import_file(export_path)
+
+            self.assertIn('0 created, 1 updated, 0 failed', out)
+            product = Product.objects.get(sku='DT-1')
+            self.assertEqual(product.title, 'Doggie Treats')
+            self.assertEqual(product.category.get_ancestors()[0].name, 'Dog')
@@ -0,0 +1,436 @@
+import os
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, SimpleTestCase, override_settings
+from django.urls import reverse
+
+from .. import search
+from .. import spelling
+from .. import suggest
+from ..cache import bump_search_version, normalize_query, cached_search, \
+    search_cache_stats, search_version
+from ..models import Category, Product
+
+
+class TokenizeTest(SimpleTestCase):
+    """Search terms should be normalised consistently"""
+
+    def test_tokenize_lowercases_and_drops_stop_words(self):
+        self.assertEqual(search.tokenize('The Dog and THE Cat'),
+                         ['dog', 'cat'])
+
+    def test_stem_plurals(self):
+        self.assertEqual(search.stem('treats'), 'treat')
+        self.assertEqual(search.stem('puppies'), 'puppy')
+        self.assertEqual(search.stem('brushes'), 'brush')
+        self.assertEqual(search.stem('grass'), 'grass')
+
+    def test_stem_verb_endings(self):
+        self.assertEqual(search.stem('chewing'), 'chew')
+        self.assertEqual(search.stem('running'), 'run')
+        self.assertEqual(search.stem('dried'), 'dri')
+
+
+class SearchIndexTest(SimpleTestCase):
+    """In-memory index behaviour independent of the database"""
+
+    def setUp(self):
+        self.index = search.SearchIndex()
+        self.index.add('1', {'title': 'Chew toy', 'brand': 'Pawfect',
+                             'category': 'Dog', 'description': 'Rubber'})
+        self.index.add('2', {'title': 'Scratching post', 'brand': 'Kitty',
+                             'category': 'Cat', 'description': 'For cats '
+                             'that like to chew'})
+        self.index.add('3', {'title': 'Treats', 'brand': 'Pawfect',
+                             'category': 'Dog', 'description': 'Tasty'})
+
+    def test_title_matches_rank_above_description_matches(self):
+        self.assertEqual(self.index.search('chew'), ['1', '2'])
+
+    def test_any_term_matches(self):
+        self.assertEqual(set(self.index.search('rubber tasty')), {'1', '3'})
+
+    def test_no_matches(self):
+        self.assertEqual(self.index.search('fish'), [])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_reindex_replaces_terms(self):
+        self.index.add('1', {'title': 'Fish food'})
+        self.assertEqual(self.index.search('chew'), ['2'])
+        self.assertEqual(self.index.search('fish'), ['1'])
+
+    def test_remove(self):
+        self.index.remove('3')
+        self.index.remove('missing')
+        self.assertEqual(self.index.search('treat'), [])
+        self.assertEqual(len(self.index), 2)
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.json')
+            self.index.save(path)
+
+            loaded = search.SearchIndex()
+            loaded.load(path)
+
+        self.assertEqual(len(loaded), 3)
+        self.assertEqual(loaded.search('chew pawfect'),
+                         self.index.search('chew pawfect'))
+
+
+class ProductSearchIndexTest(TestCase):
+    """Index should follow product changes and be rebuildable"""
+
+    def setUp(self):
+        search.reset_index()
+        self.product = Product.objects.create(
+            title='Squeaky Bone',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=4.99,
+            stock=11,
+            description='A squeaky toy',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+
+    def tearDown(self):
+        search.reset_index()
+
+    def test_search_products(self):
+        self.assertEqual(search.search_products('squeaky'),
+                         [self.product.id])
+
+    def test_product_save_updates_index(self):
+        # load the index before changing the product
+        search.search_products('bone')
+
+        self.product.title = 'Rope Toy'
+        self.product.save()
+        self.assertEqual(search.search_products('bone'), [])
+        self.assertEqual(search.search_products('rope'), [self.product.id])
+
+        self.product.is_live = False
+        self.product.save()
+        self.assertEqual(search.search_products('rope'), [])
+
+    @override_settings(PRODUCT_SUGGEST_REFRESH_INTERVAL=0)
+    def test_search_version_change_rebuilds_index(self):
+        search.search_products('bone')
+
+        # bulk updates, as made by other processes, send no signals
+        Product.objects.filter(pk=self.product.pk).update(title='Rope Toy')
+        self.assertEqual(search.search_products('rope'), [])
+
+        bump_search_version()
+        self.assertEqual(search.search_products('rope'), [self.product.id])
+
+    def test_only_text_changes_change_search_version(self):
+        version = search_version()
+
+        self.product.stock = 3
+        self.product.save()
+        self.assertEqual(search_version(), version)
+
+        self.product.brand = 'Snooze'
+        self.product.save()
+        self.assertNotEqual(search_version(), version)
+
+    def test_product_delete_updates_index(self):
+        search.search_products('bone')
+        product_id = str(self.product.id)
+        self.product.delete()
+        self.assertNotIn(product_id, search.get_index().documents)
+
+    def test_category_changes_update_index(self):
+        search.search_products('bone')
+
+        # products match the names of parent categories
+        category = self.product.category
+        category.parent = Category.objects.create(name='Canine',
+                                                  slug='canine')
+        category.save()
+        self.assertEqual(search.search_products('canine'), [self.product.id])
+
+        category.name = 'Playthings'
+        category.save()
+        self.assertEqual(search.search_products('playthings'),
+                         [self.product.id])
+
+    def test_rebuild_command_saves_index(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'index.json')
+            out = StringIO()
+            call_command('rebuild_search_index', path=path, stdout=out)
+            self.assertTrue(os.path.exists(path))
+            self.assertIn('Indexed 1 products', out.getvalue())
+
+            # new workers load the saved index rather than the database
+            with override_settings(PRODUCT_SEARCH_INDEX_PATH=path):
+                search.reset_index()
+                with self.assertNumQueries(0):
+                    index = search.get_index()
+                self.assertEqual(len(index), 1)
+
+                # a snapshot of older text is rebuilt and saved again
+                self.product.title = 'Rope Toy'
+                self.product.save()
+                search.reset_index()
+                self.assertEqual(search.search_products('rope'),
+                                 [self.product.id])
+                search.reset_index()
+                with self.assertNumQueries(0):
+                    search.get_index()
+
+
+class SearchCacheTest(TestCase):
+    """Search results should be cached by normalised query"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            title='Squeaky Bone',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=4.99,
+            stock=11,
+            description='A squeaky toy',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+        self.calls = []
+
+    def search(self, keywords):
+        self.calls.append(keywords)
+        return search.search_products(keywords)
+
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query('  Squeaky   BONES '),
+                         normalize_query('bone squeaky'))
+        self.assertNotEqual(normalize_query('bone'), normalize_query('toy'))
+
+    def test_equivalent_queries_share_results(self):
+        first = cached_search('Squeaky Bone', self.search)
+        second = cached_search('bone  squeaky', self.search)
+
+        self.assertEqual(first, [self.product.id])
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(search_cache_stats(),
+                         {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_product_change_invalidates_results(self):
+        cached_search('bone', self.search)
+
+        self.product.title = 'Rope Toy'
+        self.product.save()
+
+        self.assertEqual(cached_search('bone', self.search), [])
+        self.assertEqual(len(self.calls), 2)
+
+    def test_search_view_uses_cache(self):
+        url = reverse('product_search') + '?keywords=squeaky'
+        self.client.get(url)
+
+        # a cached search only needs to load the products on the page
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, self.product.title)
+
+    def test_stats_command(self):
+        cached_search('bone', self.search)
+        out = StringIO()
+        call_command('search_cache_stats', reset=True, stdout=out)
+
+        self.assertIn('Misses: 1', out.getvalue())
+        self.assertEqual(search_cache_stats()['misses'], 0)
+
+
+class SuggestionIndexTest(SimpleTestCase):
+    """Prefix lookups should return the most popular matches"""
+
+    def setUp(self):
+        self.index = suggest.SuggestionIndex([
+            ('Squeaky Bone', 'title', 5),
+            ('Bone Broth', 'title', 2),
+            ('Pawfect', 'brand', 10),
+            ('Dog', 'category', 20),
+            ('Dog Bed', 'title', 1),
+        ])
+
+    def test_prefix_matches_ordered_by_weight(self):
+        self.assertEqual(self.index.suggest('do'), [
+            {'text': 'Dog', 'type': 'category'},
+            {'text': 'Dog Bed', 'type': 'title'},
+        ])
+
+    def test_matches_start_of_any_word(self):
+        self.assertEqual(
+            [suggestion['text'] for suggestion in self.index.suggest('BON')],
+            ['Squeaky Bone', 'Bone Broth'])
+
+    def test_limit_and_no_matches(self):
+        self.assertEqual(len(self.index.suggest('b', limit=1)), 1)
+        self.assertEqual(self.index.suggest('cat'), [])
+        self.assertEqual(self.index.suggest('  '), [])
+
+    def test_duplicates_do_not_hide_suggestions(self):
+        index = suggest.SuggestionIndex(
+            [('Dog Bowl', 'title', 1)] * 20 +
+            [(' '.join(['Bone'] * 20), 'title', 9),
+             ('Bone Broth', 'title', 2),
+             ('Bone Toy', 'title', 1)])
+
+        self.assertEqual(
+            [suggestion['text'] for suggestion in index.suggest('bone', 3)],
+            [' '.join(['Bone'] * 20), 'Bone Broth', 'Bone Toy'])
+        self.assertEqual(len(index.suggest('b', 3)), 3)
+        self.assertEqual(len(index.suggest('dog', 3)), 1)
+
+
+class ProductSuggestViewTest(TestCase):
+    """Suggestion endpoint should answer from memory"""
+
+    def setUp(self):
+        cache.clear()
+        suggest.invalidate()
+        self.product = Product.objects.create(
+            title='Squeaky Bone',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=4.99,
+            stock=11,
+            description='A squeaky toy',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+        self.url = reverse('product_suggest')
+
+    def test_view_returns_suggestions(self):
+        response = self.client.get(self.url, {'q': 'paw'})
+        self.assertEqual(response.json(), {'suggestions': [
+            {'text': 'Pawfect', 'type': 'brand'}]})
+
+    def test_view_does_not_query_database(self):
+        self.client.get(self.url, {'q': 's'})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, {'q': 'sq'})
+        self.assertEqual(response.json()['suggestions'][0]['text'],
+                         'Squeaky Bone')
+
+    def test_view_refreshes_when_catalog_changes(self):
+        self.client.get(self.url, {'q': 'sq'})
+
+        self.product.title = 'Rope Toy'
+        self.product.save()
+
+        response = self.client.get(self.url, {'q': 'rope'})
+        self.assertEqual(response.json()['suggestions'][0]['text'],
+                         'Rope Toy')
+
+
+class SpellingIndexTest(SimpleTestCase):
+    """Misspelled words should be corrected from the catalog vocabulary"""
+
+    def setUp(self):
+        self.index = spelling.SpellingIndex(
+            ['squeaky', 'bone', 'bone', 'bowl', 'pawfect', 'treats',
+             'treats', 'trees'])
+
+    def test_edit_distance(self):
+        self.assertEqual(spelling.edit_distance('bone', 'bone', 2), 0)
+        self.assertEqual(spelling.edit_distance('bnoe', 'bone', 2), 1)
+        self.assertEqual(spelling.edit_distance('pafwect', 'pawfect', 2), 1)
+        self.assertEqual(spelling.edit_distance('dog', 'pawfect', 2), 3)
+
+    def test_correct_words(self):
+        self.assertEqual(self.index.correct('sqeaky bnoe'), 'squeaky bone')
+        self.assertEqual(self.index.correct('Pawfcet'), 'pawfect')
+
+    def test_prefers_closest_then_most_common_word(self):
+        # 'treas' is one edit from both, treats appears more often
+        self.assertEqual(self.index.correct_word('treas'), 'treats')
+        self.assertEqual(self.index.correct_word('tres'), 'trees')
+
+    def test_nothing_to_correct(self):
+        self.assertIsNone(self.index.correct('bone'))
+        self.assertIsNone(self.index.correct('the xylophone'))
+        self.assertIsNone(self.index.correct(''))
+
+
+class SpellingSuggestionViewTest(TestCase):
+    """Searches without results should offer a corrected search"""
+
+    def setUp(self):
+        cache.clear()
+        spelling.invalidate()
+        search.reset_index()
+        Product.objects.create(
+            title='Squeaky Bone',
+            brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=4.99,
+            stock=11,
+            description='A squeaky toy',
+            image=SimpleUploadedFile(
+                name='image.jpg',
+                content=open(settings.BASE_DIR +
+                             '/test/image.jpg', 'rb').read(),
+                content_type='image/jpeg'
+            ),
+            is_live=True
+        )
+        self.url = reverse('product_search')
+
+    def tearDown(self):
+        search.reset_index()
+
+    def test_misspelled_search_suggests_correction(self):
+        response = self.client.get(self.url, {'keywords': 'sqeaky bnoe'})
+        self.assertEqual(response.context['suggested_keywords'],
+                         'squeaky bone')
+        self.assertContains(response, '?keywords=squeaky%20bone')
+
+    def test_no_suggestion_when_search_has_results(self):
+        response = self.client.get(self.url, {'keywords': 'squeaky'})
+        self.assertNotIn('suggested_keywords', response.context)
+
+    def test_vocabulary_follows_catalog_changes(self):
+        self.client.get(self.url, {'keywords': 'bnoe'})
+
+        product = Product.objects.get()
+        product.title = 'Rope Toy'
+        product.save()
+
+        response = self.client.get(self.url, {'keywords': 'rpoe'})
+        self.assertEqual(response.context['suggested_keywords'], 'rope')
+
+    @override_settings(PRODUCT_SUGGEST_REFRESH_INTERVAL=0)
+    def test_other_changes_keep_the_index(self):
+        index = spelling.get_spelling_index()
+
+        product = Product.objects.get()
+        product.stock = 3
+        product.save()
+        self.assertIs(spelling.get_spelling_index(), index)
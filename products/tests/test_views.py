@@ -1,13 +1,29 @@
 import random
+import shutil
+import tempfile
+from datetime import timedelta
+from io import StringIO
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Permission
+from django.core.management import call_command
+from django.utils import timezone
 
-from ..models import Product, Review
+from basket.models import Basket, BasketItem
+
+from ..cache import catalog_version, search_version
+from ..models import Category, Product, Review
+from ..recent import SESSION_KEY, recently_viewed_products, \
+    viewed_product_ids
 
 
 class ProductListViewTest(TestCase):
@@ -22,7 +38,8 @@ class ProductListViewTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -73,11 +90,25 @@ class ProductListViewTest(TestCase):
 
         response = self.client.get(self.reverse_url)
         self.assertTrue(response.status_code, 200)
-        self.assertTrue(response.context['is_paginated'])
+        # non-live products are filtered before pagination
+        self.assertFalse(response.context['is_paginated'])
+        self.assertContains(
+            response, 'There are currently no products to display')
         self.assertContains(response, 'Products')
         self.assertNotContains(response, '€')
         self.assertNotContains(response, 'Add to basket')
 
+    def test_view_pages_are_full_when_products_not_live(self):
+        """Pages should not come up short when some products are not live"""
+        withdrawn = Product.objects.order_by('id').values_list(
+            'id', flat=True)[:5]
+        Product.objects.filter(id__in=list(withdrawn)).update(is_live=False)
+
+        response = self.client.get(self.reverse_url)
+        self.assertEqual(len(response.context['product_list']), 8)
+        for product in response.context['product_list']:
+            self.assertTrue(product.is_live)
+
     def test_view_with_no_products(self):
         """List view should show text when no products exist in db"""
         # delete all products
@@ -102,6 +133,88 @@ class ProductListViewTest(TestCase):
         self.assertTrue('is_paginated' in response.context)
         self.assertEqual(len(response.context['product_list']), 8)
 
+    def test_view_cursor_pagination_returns_all_products(self):
+        """Following next cursors should visit every product exactly once"""
+        seen = []
+        url = self.reverse_url
+
+        while True:
+            response = self.client.get(url)
+            page = response.context['page_obj']
+            seen += [product.id
+                     for product in response.context['product_list']]
+
+            if not page.has_next():
+                break
+            url = self.reverse_url + '?cursor=' + page.next_cursor
+
+        self.assertEqual(len(seen), Product.objects.count())
+        self.assertEqual(len(set(seen)), len(seen))
+        self.assertEqual(seen, sorted(seen))
+
+    def test_view_cursor_pagination_sub_millisecond_ties(self):
+        """Products created within the same millisecond should not be
+        skipped when sorted by date"""
+        created_at = timezone.now().replace(microsecond=500000)
+        for offset, pk in enumerate(
+                Product.objects.values_list('pk', flat=True)):
+            Product.objects.filter(pk=pk).update(
+                created_at=created_at + timedelta(microseconds=offset % 3))
+
+        seen = []
+        params = {'sort': 'newest'}
+        while True:
+            response = self.client.get(self.reverse_url, params)
+            page = response.context['page_obj']
+            seen += [product.id
+                     for product in response.context['product_list']]
+
+            if not page.has_next():
+                break
+            params['cursor'] = page.next_cursor
+
+        self.assertEqual(seen, list(Product.objects.order_by(
+            '-created_at', '-id').values_list('id', flat=True)))
+
+    def test_view_cursor_pagination_previous_page(self):
+        """Previous cursor should return the preceding page"""
+        first = self.client.get(self.reverse_url)
+        self.assertFalse(first.context['page_obj'].has_previous())
+
+        second = self.client.get(
+            self.reverse_url + '?cursor=' +
+            first.context['page_obj'].next_cursor)
+        self.assertTrue(second.context['page_obj'].has_previous())
+
+        previous = self.client.get(
+            self.reverse_url + '?cursor=' +
+            second.context['page_obj'].previous_cursor)
+        self.assertEqual(list(previous.context['product_list']),
+                         list(first.context['product_list']))
+        self.assertTrue(previous.context['page_obj'].has_next())
+
+    def test_view_cursor_pagination_does_not_count(self):
+        """Cursor pagination should not run a COUNT query"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.reverse_url)
+
+        self.assertEqual(response.status_code, 200)
+        for query in queries:
+            self.assertNotIn('COUNT(', query['sql'].upper())
+
+    def test_view_invalid_cursor(self):
+        """An invalid cursor should return page not found"""
+        response = self.client.get(self.reverse_url + '?cursor=invalid')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(PRODUCT_PAGINATION='page')
+    def test_view_page_number_pagination(self):
+        """Page number mode should remain available through settings"""
+        response = self.client.get(self.reverse_url + '?page=2')
+        self.assertEqual(response.context['page_obj'].number, 2)
+        self.assertEqual(len(response.context['product_list']), 8)
+        self.assertContains(response, '?page=3')
+
     def test_view_does_not_contain_admin_not_logged_in(self):
         """When not logged in, user should not see admin options"""
         response = self.client.get(self.reverse_url)
@@ -142,7 +255,8 @@ class ProductDetailView(TestCase):
     def setUp(self):
         title = f'Doggie Treats 1'
         brand = 'Pawfect'
-        category = 'Dog'
+        category, created = Category.objects.get_or_create(
+            name='Dog', slug='dog')
         price = round(random.uniform(0, 50), 2)
         description = 'Doggie Treats'
         stock = round(random.uniform(0, 100), 2)
@@ -286,7 +400,8 @@ class ProductReviewTest(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -349,6 +464,68 @@ class ProductReviewTest(TestCase):
         self.assertContains(response, review.user)
         self.assertContains(response, review.review)
 
+    def test_view_query_count_anonymous(self):
+        """Detail view should load the session, last modified date, product,
+        reviews and recommendations in five queries"""
+        # the navigation category tree is cached by the first request
+        self.client.get(self.reverse_url)
+
+        with self.assertNumQueries(5):
+            response = self.client.get(self.reverse_url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_query_count_does_not_grow_with_reviews(self):
+        """Number of queries should not depend on the number of reviews"""
+        user = get_user_model().objects.create_user(
+            username='test_user@email.com',
+            email='test_user@email.com',
+            password='pass123')
+        self.client.force_login(user=user)
+
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(self.reverse_url)
+
+        for user_number in range(10):
+            reviewer = get_user_model().objects.create_user(
+                username=f'reviewer{user_number}@email.com',
+                email=f'reviewer{user_number}@email.com',
+                password='pass123')
+            Review.objects.create(product=self.product, rating=4,
+                                  review='Product rating', user=reviewer)
+
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(self.reverse_url)
+
+        self.assertEqual(len(before), len(after))
+        # only the first page of reviews is rendered
+        self.assertEqual(len(response.context['reviews']),
+                         settings.PRODUCT_REVIEWS_PER_PAGE)
+        self.assertTrue(response.context['reviews'].has_next())
+
+    @override_settings(PRODUCT_REVIEWS_PER_PAGE=2)
+    def test_reviews_are_loaded_a_page_at_a_time(self):
+        """Further reviews are fetched from the reviews endpoint"""
+        reviews = list(Review.objects.filter(
+            product=self.product).order_by('-date', '-id'))
+
+        response = self.client.get(self.reverse_url)
+        self.assertEqual(list(response.context['reviews']), reviews[:2])
+        self.assertContains(response, 'Show more reviews')
+
+        response = self.client.get(
+            reverse('product_reviews', kwargs={'pk': self.product.id}),
+            {'cursor': response.context['reviews'].next_cursor})
+        self.assertEqual(list(response.context['reviews']), reviews[2:])
+        self.assertNotContains(response, 'Show more reviews')
+        self.assertContains(response, reviews[2].review)
+
+    def test_reviews_invalid_cursor(self):
+        """An invalid cursor should return page not found"""
+        response = self.client.get(
+            reverse('product_reviews', kwargs={'pk': self.product.id}),
+            {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
     def test_review_form_does_not_display_not_logged_in(self):
         """When user is not logged in, do not display review form"""
         response = self.client.get(self.reverse_url)
@@ -398,7 +575,8 @@ class ProductReviewTest(TestCase):
     def test_view_when_no_reviews_for_product(self):
         """Product with no reviews displays correct text"""
         product = Product.objects.create(
-            title='New product', brand='product', category='animal',
+            title='New product', brand='product',
+            category=Category.objects.create(name='Animal', slug='animal'),
             price=12.99, stock=11, description='Something',
             image=SimpleUploadedFile(
                 name='image.jpg',
@@ -494,7 +672,7 @@ class ProductUpdateView(TestCase):
         self.product_details = {
             'title': 'Doggie Treats',
             'brand': 'Pawful Intentions',
-            'category': 'Dog',
+            'category': Category.objects.create(name='Dog', slug='dog'),
             'price': 9.99,
             'stock': 11,
             'description': 'Doggie Treats',
@@ -577,7 +755,7 @@ class ProductDeleteView(TestCase):
         self.product_details = {
             'title': 'Doggie Treats',
             'brand': 'Pawful Intentions',
-            'category': 'Dog',
+            'category': Category.objects.create(name='Dog', slug='dog'),
             'price': 9.99,
             'stock': 11,
             'description': 'Doggie Treats',
@@ -659,7 +837,7 @@ class ProductSearchResultsView(TestCase):
         self.product_details = {
             'title': 'Doggie Treats',
             'brand': 'Pawful Intentions',
-            'category': 'Dog',
+            'category': Category.objects.create(name='Dog', slug='dog'),
             'price': 9.99,
             'stock': 11,
             'description': 'Doggie Treats',
@@ -716,7 +894,7 @@ class ProductSearchResultsView(TestCase):
     def test_view_search_term_does_not_match_any_products(self):
         """When search keywords do not match any products, search view should
         return message only"""
-        search_terms = '?keywords=dogs'
+        search_terms = '?keywords=cats'
         response = self.client.get(self.reverse_url + search_terms)
         self.assertContains(
             response, 'Your search did not return any results - please try '
@@ -739,7 +917,7 @@ class ProductSearchResultsView(TestCase):
         product2_details = {
             'title': 'Non-Live Product',
             'brand': 'Pawful Intentions',
-            'category': 'Dog',
+            'category': Category.objects.create(name='Dog', slug='dog'),
             'price': 9.99,
             'stock': 11,
             'description': 'Doggie Treats (not live)',
@@ -759,8 +937,8 @@ class ProductSearchResultsView(TestCase):
         search_terms = '?keywords=pawful+intentions'
         response = self.client.get(self.reverse_url + search_terms)
 
-        # expect two products, only one on search results page
-        number_of_products = Product.objects.all().count()
+        # expect two products, only the live one in the search results
+        number_of_products = Product.live.count()
         self.assertEqual(
             len(response.context['search_results']), number_of_products)
         # make sure new product does not appear on list
@@ -777,7 +955,8 @@ class ProductSearchResultsView(TestCase):
         for product_number in range(number_of_products):
             title = f'Doggie Treats {product_number}'
             brand = 'Pawfect'
-            category = 'Dog'
+            category, created = Category.objects.get_or_create(
+                name='Dog', slug='dog')
             price = round(random.uniform(0, 50), 2)
             description = 'Doggie Treats'
             stock = round(random.uniform(0, 100), 2)
@@ -808,3 +987,585 @@ class ProductSearchResultsView(TestCase):
         self.assertTrue('is_paginated' in response.context)
         self.assertTrue(response.context['is_paginated'])
         self.assertEqual(len(response.context['search_results']), 8)
+        # pagination links should keep the search terms
+        self.assertContains(response, '?keywords=Pawfect&amp;cursor=')
+
+
+class ProductFacetTest(TestCase):
+    """Facet filters and counts on the list and search views"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = get_user_model().objects.create_user(
+            username='test_user@email.com',
+            email='test_user@email.com',
+            password='pass123')
+
+        self.dog = Category.objects.create(name='Dog', slug='dog')
+        self.dog_beds = Category.objects.create(name='Beds', slug='beds',
+                                                parent=self.dog)
+        self.cat = Category.objects.create(name='Cat', slug='cat')
+
+        # (title, category, price)
+        products = [
+            ('Doggie Treats', self.dog, 5),
+            ('Dog Bed', self.dog_beds, 60),
+            ('Kitty Treats', self.cat, 8),
+            ('Cat Tree', self.cat, 300),
+        ]
+
+        self.products = {}
+        for title, category, price in products:
+            self.products[title] = Product.objects.create(
+                title=title, brand='Pawfect', category=category,
+                price=price, stock=11, description='Pet supplies',
+                image=SimpleUploadedFile(
+                    name='image.jpg',
+                    content=open(settings.BASE_DIR +
+                                 '/test/image.jpg', 'rb').read(),
+                    content_type='image/jpeg'
+                ),
+                is_live=True
+            )
+
+        Review.objects.create(product=self.products['Dog Bed'], rating=5,
+                              review='Comfy', user=self.user)
+
+        self.list_url = reverse('product_list')
+        self.search_url = reverse('product_search')
+
+    def facet(self, response, name):
+        for facet in response.context['facets']:
+            if facet['name'] == name:
+                return {option['value']: option['count']
+                        for option in facet['options']}
+
+    def titles(self, response, context_name='product_list'):
+        return sorted(product.title for product in
+                      response.context[context_name])
+
+    def test_list_filter_by_price(self):
+        response = self.client.get(self.list_url, {'price': '0-10'})
+        self.assertEqual(self.titles(response),
+                         ['Doggie Treats', 'Kitty Treats'])
+
+    def test_list_filter_by_category_and_rating(self):
+        response = self.client.get(self.list_url, {'category': self.dog.pk})
+        self.assertEqual(self.titles(response), ['Dog Bed', 'Doggie Treats'])
+
+        response = self.client.get(
+            self.list_url, {'category': self.dog.pk, 'rating': '4'})
+        self.assertEqual(self.titles(response), ['Dog Bed'])
+
+    def test_list_filter_by_review_stars(self):
+        Review.objects.create(product=self.products['Cat Tree'], rating=2,
+                              review='Wobbly', user=self.user)
+
+        response = self.client.get(self.list_url, {'stars': '2'})
+        self.assertEqual(self.titles(response), ['Cat Tree'])
+        self.assertEqual(self.facet(response, 'stars'),
+                         {5: 1, 4: 0, 3: 0, 2: 1, 1: 0})
+        self.assertContains(response, '2* reviews')
+
+    def test_list_filter_by_subcategory(self):
+        response = self.client.get(
+            self.list_url, {'category': self.dog_beds.pk})
+        self.assertEqual(self.titles(response), ['Dog Bed'])
+
+    def test_list_invalid_filters_are_ignored(self):
+        response = self.client.get(
+            self.list_url, {'price': 'cheap', 'rating': 'x', 'category': 999})
+        self.assertEqual(len(response.context['product_list']), 4)
+
+    def test_list_facet_counts(self):
+        response = self.client.get(self.list_url)
+        self.assertEqual(self.facet(response, 'price'), {
+            '0-10': 2, '10-20': 0, '20-50': 0, '50-250': 1, '250+': 1})
+        # parent categories include the products of their subcategories
+        self.assertEqual(self.facet(response, 'category'), {
+            self.cat.pk: 2, self.dog.pk: 2, self.dog_beds.pk: 1})
+        self.assertEqual(self.facet(response, 'rating')[5], 1)
+        self.assertEqual(self.facet(response, 'rating')[1], 1)
+        self.assertContains(response, '?price=0-10')
+
+    def test_list_facet_counts_are_cached(self):
+        self.client.get(self.list_url)
+
+        # only the product page (and the last modified date for the ETag)
+        # is queried when counts are cached
+        with self.assertNumQueries(2):
+            self.client.get(self.list_url)
+
+    def test_facet_counts_follow_catalog_changes(self):
+        self.client.get(self.list_url)
+
+        Review.objects.create(product=self.products['Cat Tree'], rating=4,
+                              review='Sturdy', user=self.user)
+        self.products['Doggie Treats'].category = self.cat
+        self.products['Doggie Treats'].save()
+
+        response = self.client.get(self.list_url)
+        self.assertEqual(self.facet(response, 'rating')[4], 2)
+        self.assertEqual(self.facet(response, 'category'), {
+            self.cat.pk: 3, self.dog.pk: 1, self.dog_beds.pk: 1})
+
+    def test_search_filters_and_counts(self):
+        response = self.client.get(
+            self.search_url, {'keywords': 'treats', 'category': self.cat.pk})
+        self.assertEqual(self.titles(response, 'search_results'),
+                         ['Kitty Treats'])
+        # counts describe the search results, not the whole catalog
+        self.assertEqual(self.facet(response, 'category'),
+                         {self.cat.pk: 1, self.dog.pk: 1})
+
+
+class ProductSortTest(TestCase):
+    """Sort modes on the list and search views"""
+
+    def setUp(self):
+        cache.clear()
+
+        self.user = get_user_model().objects.create_user(
+            username='test_user@email.com',
+            email='test_user@email.com',
+            password='pass123')
+
+        # (title, price, units sold), created oldest first
+        products = [
+            ('Doggie Treats', 5, 3),
+            ('Dog Bed', 60, 0),
+            ('Kitty Treats', 8, 7),
+            ('Cat Tree', 300, 1),
+        ]
+
+        self.products = {}
+        created_at = timezone.now()
+        category = Category.objects.create(name='Dog', slug='dog')
+        for days, (title, price, sales_count) in enumerate(products):
+            self.products[title] = Product.objects.create(
+                title=title, brand='Pawfect', category=category,
+                price=price, stock=11, description='Pet supplies',
+                image=SimpleUploadedFile(
+                    name='image.jpg',
+                    content=open(settings.BASE_DIR +
+                                 '/test/image.jpg', 'rb').read(),
+                    content_type='image/jpeg'
+                ),
+                is_live=True
+            )
+            Product.objects.filter(pk=self.products[title].pk).update(
+                sales_count=sales_count,
+                created_at=created_at + timedelta(days=days))
+
+        Review.objects.create(product=self.products['Cat Tree'], rating=4,
+                              review='Sturdy', user=self.user)
+
+        self.list_url = reverse('product_list')
+        self.search_url = reverse('product_search')
+
+    def titles(self, response, context_name='product_list'):
+        return [product.title for product in response.context[context_name]]
+
+    def test_list_sort_modes(self):
+        expected = {
+            'newest': ['Cat Tree', 'Kitty Treats', 'Dog Bed',
+                       'Doggie Treats'],
+            'price_asc': ['Doggie Treats', 'Kitty Treats', 'Dog Bed',
+                          'Cat Tree'],
+            'price_desc': ['Cat Tree', 'Dog Bed', 'Kitty Treats',
+                           'Doggie Treats'],
+            'best_selling': ['Kitty Treats', 'Doggie Treats', 'Cat Tree',
+                             'Dog Bed'],
+        }
+        for sort, titles in expected.items():
+            response = self.client.get(self.list_url, {'sort': sort})
+            self.assertEqual(self.titles(response), titles, sort)
+
+        response = self.client.get(self.list_url, {'sort': 'rating'})
+        self.assertEqual(self.titles(response)[0], 'Cat Tree')
+
+    def test_invalid_sort_is_ignored(self):
+        response = self.client.get(self.list_url, {'sort': 'title'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any(option['active']
+                             for option in response.context['sort_options']))
+
+    def test_sort_links_are_rendered(self):
+        response = self.client.get(self.list_url, {'sort': 'price_desc'})
+        self.assertContains(response, '?sort=price_asc')
+        self.assertContains(response, 'Price: high to low')
+
+    def test_search_defaults_to_relevance(self):
+        response = self.client.get(self.search_url, {'keywords': 'treats'})
+        self.assertEqual(response.context['sort_options'][0],
+                         {'value': 'relevance', 'label': 'Relevance',
+                          'active': True})
+
+    def test_search_sort_by_price(self):
+        response = self.client.get(
+            self.search_url, {'keywords': 'treats', 'sort': 'price_desc'})
+        self.assertEqual(self.titles(response, 'search_results'),
+                         ['Kitty Treats', 'Doggie Treats'])
+
+    def test_order_updates_sales_count(self):
+        """Products sold through the basket should move up best-selling"""
+        basket = Basket.objects.create(user=self.user)
+        BasketItem.objects.create(basket=basket,
+                                  product=self.products['Dog Bed'],
+                                  quantity=3)
+        basket.create_order({}, stripe_id='ch_test')
+
+        self.products['Dog Bed'].refresh_from_db()
+        self.assertEqual(self.products['Dog Bed'].sales_count, 3)
+
+    def test_benchmark_command(self):
+        versions = catalog_version(), search_version()
+        out = StringIO()
+        call_command('benchmark_catalog_sorts', products=50, repeat=1,
+                     stdout=out)
+
+        for key in ('newest', 'price_asc', 'price_desc', 'rating',
+                    'best_selling'):
+            self.assertIn(key, out.getvalue())
+        # synthetic products are rolled back and leave the caches alone
+        self.assertEqual(Product.objects.count(), 4)
+        self.assertEqual((catalog_version(), search_version()), versions)
+
+
+class PresigningStorage(FileSystemStorage):
+    """Local stand-in for storage that supports browser uploads"""
+
+    def presigned_post(self, name, content_type, max_size, expires):
+        return {'url': 'https://uploads.example.com/',
+                'fields': {'key': name, 'Content-Type': content_type}}
+
+
+class ProductImageUploadTest(TestCase):
+    """Images can be uploaded straight to storage that supports it"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='test_user@email.com',
+            email='test_user@email.com',
+            password='pass123')
+        permission = Permission.objects.get(name='Can add product')
+        self.user.user_permissions.add(permission)
+
+        self.category = Category.objects.create(name='Dog', slug='dog')
+        self.upload_url = reverse('product_image_upload')
+        self.create_url = reverse('product_create')
+
+        self.media_root = tempfile.mkdtemp()
+        self.field = Product._meta.get_field('image')
+        self.original_storage = self.field.storage
+
+    def tearDown(self):
+        self.field.storage = self.original_storage
+        shutil.rmtree(self.media_root)
+
+    def enable_direct_uploads(self):
+        self.field.storage = PresigningStorage(location=self.media_root)
+
+    def product_data(self, **kwargs):
+        data = {
+            'title': 'Doggie Treats',
+            'brand': 'Pawfect',
+            'category': self.category.pk,
+            'price': '9.99',
+            'stock': 11,
+            'description': 'Doggie Treats',
+            'is_live': True,
+        }
+        data.update(kwargs)
+        return data
+
+    def test_local_storage_uploads_through_form(self):
+        self.client.force_login(user=self.user)
+
+        response = self.client.get(self.create_url)
+        self.assertNotContains(response, 'data-upload-url')
+        self.assertNotContains(response, 'product_upload.js')
+
+        response = self.client.post(self.upload_url, {
+            'filename': 'bone.jpg', 'content_type': 'image/jpeg'})
+        self.assertEqual(response.status_code, 404)
+
+        # keys are only accepted when the browser uploads to storage
+        response = self.client.post(self.create_url, self.product_data(
+            image_key='uploads/abc/bone.jpg'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Product.objects.exists())
+
+    def test_upload_requires_permission(self):
+        self.enable_direct_uploads()
+        response = self.client.post(self.upload_url)
+        self.assertEqual(response.status_code, 302)
+
+    def test_presign_upload(self):
+        self.enable_direct_uploads()
+        self.client.force_login(user=self.user)
+
+        response = self.client.get(self.create_url)
+        self.assertContains(response, f'data-upload-url="{self.upload_url}"')
+
+        response = self.client.post(self.upload_url, {
+            'filename': '../my bone.jpg', 'content_type': 'image/jpeg'})
+        upload = response.json()
+        self.assertTrue(upload['key'].startswith('uploads/'))
+        self.assertTrue(upload['key'].endswith('/my_bone.jpg'))
+        self.assertEqual(upload['fields']['key'], upload['key'])
+
+        response = self.client.post(self.upload_url, {
+            'filename': 'bone.exe', 'content_type': 'application/x-exe'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_create_product_with_uploaded_key(self):
+        self.enable_direct_uploads()
+        self.client.force_login(user=self.user)
+
+        # simulate the browser upload
+        key = self.field.storage.save('uploads/abc/bone.jpg', ContentFile(
+            open(settings.BASE_DIR + '/test/image.jpg', 'rb').read()))
+
+        response = self.client.post(self.create_url,
+                                    self.product_data(image_key=key))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Product.objects.get().image.name, key)
+
+    def test_create_product_requires_image_or_key(self):
+        self.enable_direct_uploads()
+        self.client.force_login(user=self.user)
+
+        response = self.client.post(self.create_url, self.product_data())
+        self.assertFormError(response, 'form', 'image',
+                             'This field is required.')
+
+        response = self.client.post(self.create_url, self.product_data(
+            image_key='uploads/missing/bone.jpg'))
+        self.assertFormError(
+            response, 'form', 'image_key',
+            'The uploaded image could not be found, please try again.')
+
+
+class ConditionalGetTest(TestCase):
+    """Catalog pages should answer revalidation requests with 304"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            title='Doggie Treats', brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99, stock=11, description='Doggie Treats',
+            image='image.jpg', is_live=True)
+        self.detail_url = reverse('product_detail',
+                                  kwargs={'pk': self.product.pk})
+        self.user = get_user_model().objects.create_user(
+            username='test_user@email.com', email='test_user@email.com',
+            password='pass123', first_name='Doogan')
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_are_not_modified(self):
+        for url in (self.detail_url, reverse('product_list'),
+                    reverse('home')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.has_header('Last-Modified'))
+
+            # validators are read without rendering the page, the session
+            # holds the recently viewed products
+            with self.assertNumQueries(2):
+                response = self.revalidate(url, response)
+            self.assertEqual(response.status_code, 304)
+
+            response = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+
+    def test_changes_update_etag(self):
+        response = self.client.get(self.detail_url)
+
+        Review.objects.create(product=self.product, rating=4,
+                              review='Tasty', user=self.user)
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200)
+
+        response = self.client.get(self.detail_url)
+        self.product.price = 7.99
+        self.product.save()
+        self.assertEqual(
+            self.revalidate(self.detail_url, response).status_code, 200)
+
+    def test_etag_varies_by_user_and_basket(self):
+        response = self.client.get(self.detail_url)
+        self.client.force_login(self.user)
+
+        # personalised pages are only validated by ETag
+        user_response = self.client.get(self.detail_url)
+        self.assertNotEqual(user_response['ETag'], response['ETag'])
+        self.assertFalse(user_response.has_header('Last-Modified'))
+        self.assertEqual(self.revalidate(
+            self.detail_url, user_response).status_code, 304)
+
+        basket = Basket.objects.create(user=self.user)
+        BasketItem.objects.create(basket=basket, product=self.product)
+        self.assertEqual(self.revalidate(
+            self.detail_url, user_response).status_code, 200)
+
+    def test_missing_product_is_not_found(self):
+        self.product.is_live = False
+        self.product.save()
+
+        response = self.client.get(self.detail_url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class ProductCardCacheTest(TestCase):
+    """Rendered product cards are cached until the product changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            title='Doggie Treats', brand='Pawfect',
+            category=Category.objects.create(name='Dog', slug='dog'),
+            price=9.99, stock=11, description='Doggie Treats',
+            image='image.jpg', is_live=True)
+        self.url = reverse('product_list')
+
+    def test_card_follows_product_version(self):
+        self.assertContains(self.client.get(self.url), 'Doggie Treats')
+
+        # updates that do not change the version keep the cached card
+        Product.objects.filter(pk=self.product.pk).update(
+            title='Kitty Treats')
+        self.assertContains(self.client.get(self.url), 'Doggie Treats')
+
+        self.product.title = 'Kitty Treats'
+        self.product.save()
+        self.assertContains(self.client.get(self.url), 'Kitty Treats')
+
+        # reviews change the stored rating and so the version
+        Review.objects.create(
+            product=self.product, rating=5, review='Tasty',
+            user=get_user_model().objects.create_user(
+                username='test_user@email.com',
+                email='test_user@email.com', password='pass123'))
+        self.assertContains(self.client.get(self.url),
+                            'fas fa-star checked', count=5)
+
+    def test_image_urls_are_not_cached(self):
+        self.client.get(self.url)
+
+        # signed storage urls change while the card is cached
+        with override_settings(MEDIA_URL='/signed/'):
+            self.assertContains(self.client.get(self.url),
+                                '/signed/image.jpg')
+
+    def test_admin_options_are_not_cached(self):
+        self.client.get(self.url)
+
+        user = get_user_model().objects.create_user(
+            username='staff@email.com', email='staff@email.com',
+            password='pass123')
+        user.user_permissions.add(
+            Permission.objects.get(codename='change_product'))
+        self.client.force_login(user)
+
+        self.assertContains(
+            self.client.get(self.url),
+            reverse('product_update', kwargs={'pk': self.product.pk}))
+
+    def test_benchmark_command(self):
+        versions = catalog_version(), search_version()
+        out = StringIO()
+        call_command('benchmark_product_cards', pages=1, per_page=2,
+                     repeat=1, stdout=out)
+
+        # synthetic products are rolled back and leave the caches alone
+        self.assertEqual(Product.objects.count(), 1)
+        self.assertEqual((catalog_version(), search_version()), versions)
+
+
+class RecentlyViewedTest(TestCase):
+    """Product and basket pages show the products a visitor last viewed"""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Dog', slug='dog')
+        self.products = [
+            Product.objects.create(
+                title=title, brand='Pawfect', category=category,
+                price=9.99, stock=11, description=title,
+                image='image.jpg', is_live=True)
+            for title in ('Doggie Treats', 'Dog Bed', 'Squeaky Bone')]
+
+    def view(self, product, **headers):
+        return self.client.get(
+            reverse('product_detail', kwargs={'pk': product.pk}), **headers)
+
+    def titles(self, response):
+        content = response.content.decode()
+        section = content[content.index('Recently Viewed'):]
+        return sorted((product.title for product in self.products
+                       if product.title in section),
+                      key=section.index)
+
+    def test_strip_shows_previously_viewed_products(self):
+        treats, bed, bone = self.products
+        self.assertNotContains(self.view(treats), 'Recently Viewed')
+
+        self.view(bed)
+        self.assertEqual(self.titles(self.view(treats)), ['Dog Bed'])
+
+        response = self.view(bone)
+        self.assertEqual(self.titles(response), ['Doggie Treats', 'Dog Bed'])
+        self.assertEqual(viewed_product_ids(self.client.session),
+                         [bone.pk, treats.pk, bed.pk])
+
+        response = self.client.get(reverse('basket'))
+        self.assertEqual(self.titles(response),
+                         ['Squeaky Bone', 'Doggie Treats', 'Dog Bed'])
+
+    @override_settings(PRODUCT_RECENTLY_VIEWED=2)
+    def test_session_holds_a_fixed_number_of_ids(self):
+        for product in self.products:
+            self.view(product)
+
+        session = self.client.session
+        self.assertEqual(len(session[SESSION_KEY]), 44)
+        self.assertEqual(viewed_product_ids(session),
+                         [self.products[2].pk, self.products[1].pk])
+
+    def test_products_are_fetched_with_one_query(self):
+        for product in self.products:
+            self.view(product)
+        self.products[0].is_live = False
+        self.products[0].save()
+
+        session = dict(self.client.session.items())
+        with self.assertNumQueries(1):
+            products = recently_viewed_products(session)
+        self.assertEqual(products, [self.products[2], self.products[1]])
+
+        self.assertEqual(recently_viewed_products({SESSION_KEY: '!'}), [])
+
+    def test_missing_products_are_not_remembered(self):
+        self.products[0].is_live = False
+        self.products[0].save()
+
+        self.assertEqual(self.view(self.products[0]).status_code, 404)
+        self.assertEqual(viewed_product_ids(self.client.session), [])
+
+    def test_etag_follows_recently_viewed_products(self):
+        treats, bed, bone = self.products
+        response = self.view(treats)
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertEqual(self.view(
+            treats, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.view(bed)
+        response = self.view(treats, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('Last-Modified'))
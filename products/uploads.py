@@ -0,0 +1,49 @@
+import os
+import uuid
+
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+from .models import Product
+
+
+# browser uploads are stored under this prefix, only keys below it are
+# accepted by the product form
+UPLOAD_PREFIX = 'uploads/'
+
+IMAGE_TYPES = ('image/jpeg', 'image/png', 'image/gif', 'image/webp')
+
+
+def image_storage():
+    return Product._meta.get_field('image').storage
+
+
+def direct_uploads_enabled():
+    """Browsers can only upload straight to storage that can presign
+    uploads, other storage (such as MEDIA_ROOT) takes the file through
+    the form as before"""
+    return hasattr(image_storage(), 'presigned_post')
+
+
+def create_upload(filename, content_type):
+    """Return the key a browser should upload an image to along with the
+    url and form fields to post it with"""
+    if content_type not in IMAGE_TYPES:
+        raise ValueError('Unsupported image type')
+
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise ValueError('Missing file name')
+
+    key = f'{UPLOAD_PREFIX}{uuid.uuid4().hex}/{filename}'
+    post = image_storage().presigned_post(
+        key, content_type, settings.PRODUCT_IMAGE_UPLOAD_MAX_SIZE,
+        settings.PRODUCT_IMAGE_UPLOAD_EXPIRES)
+
+    return {'key': key, 'url': post['url'], 'fields': post['fields']}
+
+
+def is_upload_key(key):
+    """Check a key submitted with the product form is a browser upload"""
+    return key.startswith(UPLOAD_PREFIX) and '..' not in key and \
+        image_storage().exists(key)
@@ -1,16 +1,22 @@
 from django.urls import path
 
 from .views import ProductListView, ProductCreateView, ProductDetail, \
-    ProductUpdateView, ProductDeleteView, ProductSearchResultsView
+    ProductUpdateView, ProductDeleteView, ProductSearchResultsView, \
+    ProductSuggestView, ProductImageUploadView, ProductReviewsView
 
 urlpatterns = [
     path('', ProductListView.as_view(), name='product_list'),
     path('create/', ProductCreateView.as_view(), name='product_create'),
+    path('images/upload/', ProductImageUploadView.as_view(),
+         name='product_image_upload'),
     path('<uuid:pk>/', ProductDetail.as_view(), name='product_detail'),
+    path('<uuid:pk>/reviews/', ProductReviewsView.as_view(),
+         name='product_reviews'),
     path('<uuid:pk>/update/', ProductUpdateView.as_view(),
          name='product_update'),
     path('<uuid:pk>/delete/', ProductDeleteView.as_view(),
          name='product_delete'),
     path('search/', ProductSearchResultsView.as_view(),
          name='product_search'),
+    path('suggest/', ProductSuggestView.as_view(), name='product_suggest'),
 ]
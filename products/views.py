@@ -1,29 +1,71 @@
+from django.conf import settings
+from django.core.paginator import InvalidPage
 from django.urls import reverse_lazy, reverse
-from django.http import HttpResponseForbidden
+from django.http import Http404, HttpResponseForbidden, JsonResponse
 from django.contrib.auth.mixins import PermissionRequiredMixin
-from django.db.models import Q, Avg
+from django.db.models import QuerySet
 from django.views.generic import ListView, DetailView, CreateView, \
     UpdateView, DeleteView, FormView, View
-from django.shortcuts import get_object_or_404
+from django.shortcuts import get_object_or_404, render
 
+from analytics.events import record_search
+from pages.pagecache import page_cached
+from recommendations.models import recommended_products
 from .models import Product, Review
-from .forms import ReviewForm
-
-
-class ProductListView(ListView):
+from .forms import ProductForm, ReviewForm
+from .mixins import CatalogPaginationMixin, CatalogFilterMixin, \
+    CatalogSortMixin
+from .pagination import CursorPaginator
+from .recent import add_viewed_product
+from .search import search_products
+from .cache import cached_search
+from .conditional import catalog_conditional, product_conditional, \
+    cached_validator, product_last_modified
+from .facets import apply_filters, search_facets
+from .spelling import suggest_keywords
+from .suggest import get_suggestion_index
+from .sorting import SORT_OPTIONS, RELEVANCE
+from .uploads import create_upload, direct_uploads_enabled
+
+
+def review_paginator(product):
+    """Reviews of a product newest first, read from the (product, date)
+    index with reviewers fetched alongside"""
+    return CursorPaginator(
+        product.reviews.select_related('user'),
+        settings.PRODUCT_REVIEWS_PER_PAGE, ordering=['-date', '-id'])
+
+
+@catalog_conditional
+@page_cached
+class ProductListView(CatalogFilterMixin, CatalogSortMixin,
+                      CatalogPaginationMixin, ListView):
     """List products from database with pagination"""
     model = Product
     context_object_name = 'product_list'
     # to avoid inconsistent pagination results order by id
-    queryset = Product.objects.get_queryset().annotate(
-        rating=Avg('reviews__rating')).order_by('id')
+    queryset = Product.live.order_by('id')
     template_name = 'products/product_list.html'
     paginate_by = 8
 
+    def get_queryset(self):
+        return apply_filters(super().get_queryset(), self.get_filters())
 
+
+@product_conditional
+@page_cached
 class ProductDetail(View):
     """Specify which view to be used dependent on request type"""
 
+    def dispatch(self, request, *args, **kwargs):
+        # only live products are remembered, their last modified date is
+        # read (once per request) for the ETag anyway
+        if request.method == 'GET' and cached_validator(
+                request, 'product', product_last_modified, kwargs['pk']):
+            add_viewed_product(request.session, kwargs['pk'])
+
+        return super().dispatch(request, *args, **kwargs)
+
     def get(self, request, *args, **kwargs):
         view = ProductDetailView.as_view()
         return view(request, *args, **kwargs)
@@ -34,33 +76,45 @@ class ProductDetail(View):
 
 
 class ProductDetailView(DetailView):
-    """Render output for a single product and enable review capture"""
-    queryset = Product.objects.filter(is_live=True)
+    """Render output for a single product, the review form depends on the
+    visitor so is rendered as a page fragment (see products.fragments)"""
     template_name = 'products/product_detail.html'
 
+    queryset = Product.live.all()
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # make sure the user is logged in first
-        if self.request.user.is_authenticated:
-            # check to see if user has already posted review for product
-            user_has_reviewed = Review.objects.filter(
-                product=self.object).filter(user=self.request.user)
-            # if no object was returned then user has not submitted a review
-            if not user_has_reviewed:
-                context['display_form'] = True
+        # average review rating and count are stored on the product
+        context['product_rating'] = self.object.rating_avg
 
-        # passthrough form for rendering in template
-        context['form'] = ReviewForm()
+        # only the newest reviews are shown, the rest are loaded on demand
+        context['reviews'] = review_paginator(self.object).page()
 
-        # get average review rating and pass through to template
-        product_rating = Review.objects.filter(
-            product=self.object).aggregate(Avg('rating'))
-
-        context['product_rating'] = product_rating['rating__avg']
+        # precomputed by the build_recommendations command, one row of cards
+        context['also_bought'] = recommended_products(self.object, 4)
         return context
 
 
+class ProductReviewsView(View):
+    """Return a page of product reviews as an HTML fragment, following the
+    cursor of the previous page"""
+
+    def get(self, request, *args, **kwargs):
+        product = get_object_or_404(Product.live.only('pk'), pk=kwargs['pk'])
+
+        try:
+            reviews = review_paginator(product).page(
+                request.GET.get('cursor'))
+        except InvalidPage:
+            raise Http404('Invalid cursor')
+
+        return render(request, 'partials/_review_page.html', {
+            'product': product,
+            'reviews': reviews,
+        })
+
+
 class ProductReview(FormView):
     """Displayed on product detail, used to add reviews"""
     template_name = 'products/product_detail.html'
@@ -79,7 +133,7 @@ class ProductReview(FormView):
         if form.is_valid():
             # foreign key objects not yet added, prevent saving and add them
             review = form.save(commit=False)
-            review.product = get_object_or_404(Product, pk=self.pk)
+            review.product = get_object_or_404(Product.live, pk=self.pk)
             review.user = self.request.user
             review.save()
         else:
@@ -95,7 +149,7 @@ class ProductCreateView(PermissionRequiredMixin, CreateView):
     """Authorized users can add new products"""
     permission_required = 'products.add_product'
     model = Product
-    fields = '__all__'
+    form_class = ProductForm
     template_name = 'products/product_create.html'
 
 
@@ -103,11 +157,33 @@ class ProductUpdateView(PermissionRequiredMixin, UpdateView):
     """Authorized users can update all product fields"""
     permission_required = 'products.change_product'
     model = Product
-    fields = '__all__'
+    form_class = ProductForm
     context_object_name = 'product'
     template_name = 'products/product_update.html'
 
 
+class ProductImageUploadView(PermissionRequiredMixin, View):
+    """Presign a browser upload of a product image straight to storage,
+    only available when images are stored on S3"""
+
+    def has_permission(self):
+        user = self.request.user
+        return user.has_perm('products.add_product') or \
+            user.has_perm('products.change_product')
+
+    def post(self, request, *args, **kwargs):
+        if not direct_uploads_enabled():
+            raise Http404('Direct uploads are not available')
+
+        try:
+            upload = create_upload(request.POST.get('filename'),
+                                   request.POST.get('content_type'))
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        return JsonResponse(upload)
+
+
 class ProductDeleteView(PermissionRequiredMixin, DeleteView):
     """Authorized users can delete products"""
     permission_required = 'products.delete_product'
@@ -117,40 +193,98 @@ class ProductDeleteView(PermissionRequiredMixin, DeleteView):
     success_url = reverse_lazy('product_list')
 
 
-class ProductSearchResultsView(ListView):
+class ProductSearchResultsView(CatalogFilterMixin, CatalogSortMixin,
+                               CatalogPaginationMixin, ListView):
     """Return products that match search query"""
     model = Product
     context_object_name = 'search_results'
-    queryset = Product.objects.get_queryset().annotate(
-        rating=Avg('reviews__rating')).order_by('id')
-    # to avoid inconsistent pagination results order by id
     template_name = 'products/product_search_results.html'
     paginate_by = 8
+    default_sort = RELEVANCE[0]
+    sort_choices = (RELEVANCE,) + SORT_OPTIONS
 
     def get(self, request, *args, **kwargs):
         return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
         """Filter for search terms"""
-        queryset = super().get_queryset()
-
         keywords = self.request.GET.get('keywords')
+        self.product_ids = []
+
         if keywords:
-            # filter data for anything that contains the kws
-            # use the django Q object to create equivalent of SQL 'OR' query
-            return queryset.filter(
-                Q(title__icontains=keywords) |
-                Q(brand__icontains=keywords) |
-                Q(category__icontains=keywords) |
-                Q(description__icontains=keywords)
-            ).order_by('id')
+            # ids of matching products ranked by the search index, best
+            # match first, popular searches are served from the cache
+            self.product_ids = cached_search(keywords, search_products)
+
+        filters = self.get_filters()
+        ordering = self.get_ordering()
+        if ordering:
+            # sorted results are paginated by the database like the catalog
+            return apply_filters(
+                Product.live.filter(pk__in=self.product_ids),
+                filters).order_by(*ordering)
+
+        if filters and self.product_ids:
+            # narrow the results while keeping them in ranked order
+            matches = set(apply_filters(
+                Product.live.filter(pk__in=self.product_ids),
+                filters).values_list('pk', flat=True))
+            return [product_id for product_id in self.product_ids
+                    if product_id in matches]
+
+        return self.product_ids
+
+    def get_facet_counts(self):
+        keywords = self.request.GET.get('keywords')
+        if not keywords:
+            return {'price': [], 'category': [], 'rating': [], 'stars': []}
+        return search_facets(keywords, self.product_ids)
 
-        else:
-            return ''
+    def paginate_queryset(self, queryset, page_size):
+        """Swap the ranked product ids on the current page for products"""
+        paginator, page, object_list, is_paginated = \
+            super().paginate_queryset(queryset, page_size)
+
+        if isinstance(queryset, QuerySet):
+            # sorted results are already products
+            return paginator, page, object_list, is_paginated
+
+        products = Product.live.in_bulk(list(object_list))
+        page.object_list = [products[product_id] for product_id in object_list
+                            if product_id in products]
+
+        return paginator, page, page.object_list, is_paginated
 
     def get_context_data(self, *, object_list=None, **kwargs):
         """Pass through the search terms to autopopulate search box"""
         context = super().get_context_data(**kwargs)
         # store search term in results to populate template search box
-        context['search_keywords'] = self.request.GET.get('keywords')
+        keywords = self.request.GET.get('keywords')
+        context['search_keywords'] = keywords
+        if keywords and not self.get_filters() and \
+                self.cursor_kwarg not in self.request.GET and \
+                self.page_kwarg not in self.request.GET:
+            # only searches as entered, not later pages or narrowed results
+            record_search(keywords, len(self.product_ids))
+        if keywords and not self.product_ids:
+            # offer a corrected search built from the catalog vocabulary
+            context['suggested_keywords'] = suggest_keywords(keywords)
         return context
+
+
+class ProductSuggestView(View):
+    """Return typeahead suggestions for the search box as JSON, answered
+    from an in-memory prefix index"""
+    max_suggestions = 10
+
+    def get(self, request, *args, **kwargs):
+        prefix = request.GET.get('q', '')
+
+        try:
+            limit = min(int(request.GET.get('limit', 8)),
+                        self.max_suggestions)
+        except ValueError:
+            limit = 8
+
+        suggestions = get_suggestion_index().suggest(prefix, limit)
+        return JsonResponse({'suggestions': suggestions})
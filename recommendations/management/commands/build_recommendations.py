@@ -0,0 +1,182 @@
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from checkout.models import Order, OrderItem
+from products.cache import bump_catalog_version
+from products.models import Product
+from recommendations.matrix import (
+    count_keys, merge_counts, pair_keys, top_neighbours)
+from recommendations.models import (
+    CoPurchase, CountedOrder, Recommendation, RecommendationRun)
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class Command(BaseCommand):
+    help = 'Count the products bought together in orders and store the ' \
+        'top neighbours of each product, only orders placed since the ' \
+        'last run are counted unless --rebuild is given'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild', action='store_true',
+            help='Discard the stored counts and count every order')
+        parser.add_argument(
+            '--top', type=int, default=settings.PRODUCT_RECOMMENDATIONS,
+            help='Number of recommendations stored per product')
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help='Range of order ids read from the database at a time')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows written per insert')
+        parser.add_argument(
+            '--window', type=int, default=1000,
+            help='Number of order ids below the last run\'s newest order '
+            'that are read again, orders committed after a newer order '
+            'are counted then')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_run = RecommendationRun.objects.order_by('-pk').first()
+        rebuild = options['rebuild'] or last_run is None
+        if rebuild:
+            since = checkpoint = 0
+            counted = set()
+        else:
+            # ids are taken when an order is inserted, so an order can
+            # commit after one with a higher id was counted, the orders
+            # around the last checkpoint are read again skipping those
+            # already counted
+            checkpoint = last_run.last_order_id
+            since = max(checkpoint - options['window'],
+                        last_run.window_start)
+            counted = set(CountedOrder.objects.filter(
+                order_id__gt=since).values_list('order_id', flat=True))
+        # orders placed while this runs are left for the next run
+        until = max(
+            Order.objects.aggregate(last=Max('id'))['last'] or 0, checkpoint)
+        window_start = max(until - options['window'], since)
+
+        self.product_ids = list(
+            Product.objects.order_by('pk').values_list('pk', flat=True))
+        self.index = {pk: i for i, pk in enumerate(self.product_ids)}
+        self.size = len(self.product_ids)
+
+        keys, counts, order_ids = self.count_orders(
+            since, until, counted, options['chunk_size'])
+        orders = len(order_ids)
+        products = np.unique(keys // self.size)
+
+        with transaction.atomic():
+            if rebuild:
+                CoPurchase.objects.all().delete()
+                Recommendation.objects.all().delete()
+                CountedOrder.objects.all().delete()
+            elif len(products):
+                keys, counts = self.fold_stored_counts(products, keys, counts)
+
+            self.save_counts(keys, counts, options['batch_size'])
+            self.save_recommendations(
+                products, top_neighbours(keys, counts, self.size,
+                                         options['top']),
+                options['batch_size'])
+
+            self.save_counted_orders(
+                order_ids, window_start, options['batch_size'])
+            RecommendationRun.objects.create(
+                last_order_id=until, window_start=window_start,
+                orders=orders, products=len(products), rebuilt=rebuild)
+
+        # product pages show the recommendations
+        bump_catalog_version()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Counted {orders} orders and updated recommendations for '
+            f'{len(products)} products in '
+            f'{time.perf_counter() - started:.1f}s.'))
+
+    def count_orders(self, since, until, counted, chunk_size):
+        """Return the pair keys and counts of orders placed after since that
+        are not already counted, and the ids of those orders"""
+        keys = np.empty(0, dtype=np.int64)
+        counts = np.empty(0, dtype=np.int64)
+        order_chunks = [np.empty(0, dtype=np.int64)]
+
+        for start in range(since, until, chunk_size):
+            rows = [row for row in OrderItem.objects.filter(
+                order_id__gt=start,
+                order_id__lte=min(start + chunk_size, until)).values_list(
+                'order_id', 'product_id') if row[0] not in counted]
+            if not rows:
+                continue
+
+            order_ids = np.fromiter(
+                (order_id for order_id, product_id in rows),
+                dtype=np.int64, count=len(rows))
+            products = np.fromiter(
+                (self.index[product_id] for order_id, product_id in rows),
+                dtype=np.int64, count=len(rows))
+
+            order_chunks.append(np.unique(order_ids))
+            keys, counts = merge_counts(
+                keys, counts,
+                *count_keys(pair_keys(order_ids, products, self.size)))
+
+        return keys, counts, np.concatenate(order_chunks)
+
+    def fold_stored_counts(self, products, keys, counts):
+        """Add the stored counts of the given products to the new counts,
+        the stored rows are replaced when the totals are saved"""
+        ids = [self.product_ids[i] for i in products]
+
+        for batch in chunks(ids, 500):
+            rows = CoPurchase.objects.filter(
+                product_id__in=batch).values_list(
+                'product_id', 'other_id', 'count')
+            stored = np.array(
+                [(self.index[product_id] * self.size + self.index[other_id],
+                  count) for product_id, other_id, count in rows],
+                dtype=np.int64).reshape(-1, 2)
+            keys, counts = merge_counts(keys, counts,
+                                        stored[:, 0], stored[:, 1])
+            CoPurchase.objects.filter(product_id__in=batch).delete()
+
+        return keys, counts
+
+    def save_counts(self, keys, counts, batch_size):
+        left, right = np.divmod(keys, self.size)
+        CoPurchase.objects.bulk_create(
+            (CoPurchase(product_id=self.product_ids[product],
+                        other_id=self.product_ids[other], count=count)
+             for product, other, count in zip(
+                 left.tolist(), right.tolist(), counts.tolist())),
+            batch_size=batch_size)
+
+    def save_counted_orders(self, order_ids, window_start, batch_size):
+        """List the counted orders the next run reads again"""
+        CountedOrder.objects.filter(order_id__lte=window_start).delete()
+        CountedOrder.objects.bulk_create(
+            (CountedOrder(order_id=order_id)
+             for order_id in order_ids[order_ids > window_start].tolist()),
+            batch_size=batch_size)
+
+    def save_recommendations(self, products, neighbours, batch_size):
+        for batch in chunks([self.product_ids[i] for i in products], 500):
+            Recommendation.objects.filter(product_id__in=batch).delete()
+
+        Recommendation.objects.bulk_create(
+            (Recommendation(product_id=self.product_ids[product],
+                            recommended_id=self.product_ids[other],
+                            score=score, rank=rank)
+             for product, other, score, rank in zip(
+                 *(column.tolist() for column in neighbours))),
+            batch_size=batch_size)
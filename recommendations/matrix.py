@@ -0,0 +1,61 @@
+import numpy as np
+
+# products are identified by dense integer indexes so that a pair can be
+# packed into a single int64 key, left * size + right, and counted with
+# numpy rather than with a query or dict update per pair
+
+
+def pair_keys(orders, products, size):
+    """Return the packed key of every ordered pair of distinct products
+    bought together, once per order containing both"""
+    orders = np.asarray(orders, dtype=np.int64)
+    products = np.asarray(products, dtype=np.int64)
+    if not len(orders):
+        return np.empty(0, dtype=np.int64)
+
+    # one row per product per order, sorted by order
+    rows = np.unique(np.stack([orders, products], axis=1), axis=0)
+    products = rows[:, 1]
+    group_sizes = np.unique(rows[:, 0], return_counts=True)[1]
+    group_starts = np.cumsum(group_sizes) - group_sizes
+
+    # pair every row with each row of its own order, including itself
+    row_sizes = np.repeat(group_sizes, group_sizes)
+    row_starts = np.repeat(group_starts, group_sizes)
+    left = np.repeat(np.arange(len(rows)), row_sizes)
+    pair_starts = np.cumsum(row_sizes) - row_sizes
+    right = np.repeat(row_starts, row_sizes) + \
+        np.arange(len(left)) - np.repeat(pair_starts, row_sizes)
+
+    distinct = left != right
+    return products[left[distinct]] * size + products[right[distinct]]
+
+
+def count_keys(keys, counts=None):
+    """Sum the counts of repeated keys, returning sorted unique keys"""
+    keys, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse.ravel(), weights=counts,
+                         minlength=len(keys))
+    return keys, totals.astype(np.int64)
+
+
+def merge_counts(keys, counts, other_keys, other_counts):
+    """Add two sets of key counts together"""
+    return count_keys(np.concatenate([keys, other_keys]),
+                      np.concatenate([counts, other_counts]))
+
+
+def top_neighbours(keys, counts, size, k):
+    """Return (product, neighbour, count, rank) arrays holding the k most
+    frequent neighbours of each product, ties broken by neighbour index"""
+    left, right = np.divmod(keys, size)
+    order = np.lexsort((right, -counts, left))
+    left, right, counts = left[order], right[order], counts[order]
+
+    # position of each pair within its product's group
+    starts = np.flatnonzero(np.r_[True, left[1:] != left[:-1]])
+    group_sizes = np.diff(np.r_[starts, len(left)])
+    ranks = np.arange(len(left)) - np.repeat(starts, group_sizes)
+
+    keep = ranks < k
+    return left[keep], right[keep], counts[keep], ranks[keep]
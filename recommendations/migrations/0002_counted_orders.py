@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:13
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def start_windows(apps, schema_editor):
+    RecommendationRun = apps.get_model('recommendations', 'RecommendationRun')
+
+    # orders counted by earlier runs were not listed, so the next run only
+    # reads orders after their last one
+    RecommendationRun.objects.update(window_start=F('last_order_id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CountedOrder',
+            fields=[
+                ('order_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='recommendationrun',
+            name='window_start',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(start_windows, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+from django.db import models
+
+from products.models import Product
+
+
+class CoPurchase(models.Model):
+    """Number of orders containing both products, stored in both directions
+    so the neighbours of a product are a single index range"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE,
+                                related_name='+')
+    other = models.ForeignKey(Product, on_delete=models.CASCADE,
+                              related_name='+')
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('product', 'other')
+
+
+class Recommendation(models.Model):
+    """The products most often bought with a product, best first"""
+    product = models.ForeignKey(Product, on_delete=models.CASCADE,
+                                related_name='recommendations')
+    recommended = models.ForeignKey(Product, on_delete=models.CASCADE,
+                                    related_name='recommended_with')
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        ordering = ['product', 'rank']
+        unique_together = ('product', 'rank')
+
+    def __str__(self):
+        return f'{self.product} -> {self.recommended} ({self.score})'
+
+
+class RecommendationRun(models.Model):
+    """Records the orders folded into the co-purchase counts by each run of
+    build_recommendations, incremental runs carry on from the last one.
+    Orders above window_start may still have been in flight, they are read
+    again by the next run and counted unless listed in CountedOrder"""
+    last_order_id = models.PositiveIntegerField(default=0)
+    window_start = models.PositiveIntegerField(default=0)
+    orders = models.PositiveIntegerField(default=0)
+    products = models.PositiveIntegerField(default=0)
+    rebuilt = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        get_latest_by = 'pk'
+
+
+class CountedOrder(models.Model):
+    """An order above the last run's window_start that is already included
+    in the co-purchase counts"""
+    order_id = models.PositiveIntegerField(primary_key=True)
+
+
+def recommended_products(product, limit=None):
+    """Return the live products customers also bought with a product"""
+    products = Product.live.filter(
+        recommended_with__product=product).order_by('recommended_with__rank')
+    return products[:limit] if limit else products
@@ -0,0 +1,128 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from checkout.models import Order, OrderItem
+from products.models import Category, Product
+from recommendations.models import CoPurchase, CountedOrder, \
+    Recommendation, RecommendationRun, recommended_products
+
+
+class BuildRecommendationsTest(TestCase):
+    """Co-purchase counts and recommendations should be built from orders"""
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Dog', slug='dog')
+        cls.products = [
+            Product.objects.create(
+                title=f'Doggie Treats {number}', brand='Pawfect',
+                category=category, price=9.99, stock=11,
+                description='Doggie Treats', image='image.jpg',
+                is_live=True)
+            for number in range(4)
+        ]
+        cls.user = get_user_model().objects.create_user(
+            username='test@test.com', email='test@test.com',
+            password='pass1234')
+
+    def place_order(self, *products):
+        order = Order.objects.create(user=self.user)
+        OrderItem.objects.bulk_create(
+            OrderItem(order=order, product=product, price=product.price)
+            for product in products)
+        return order
+
+    def build(self, **options):
+        out = StringIO()
+        call_command('build_recommendations', stdout=out, chunk_size=1,
+                     **options)
+        return out.getvalue()
+
+    def recommended(self, product):
+        return list(recommended_products(product))
+
+    def test_build_counts_orders(self):
+        treats, biscuits, bed, lead = self.products
+        # repeated products in an order are only counted once
+        self.place_order(treats, biscuits, biscuits)
+        self.place_order(treats, biscuits, bed)
+        self.place_order(bed, lead)
+        self.place_order(lead)
+
+        out = self.build()
+
+        self.assertIn('Counted 4 orders', out)
+        self.assertEqual(self.recommended(treats), [biscuits, bed])
+        self.assertEqual(set(self.recommended(bed)), {treats, biscuits, lead})
+        self.assertEqual(self.recommended(lead), [bed])
+        self.assertEqual(CoPurchase.objects.get(
+            product=biscuits, other=treats).count, 2)
+
+    def test_incremental_build_folds_in_new_orders(self):
+        treats, biscuits, bed, lead = self.products
+        self.place_order(treats, biscuits)
+        self.place_order(treats, biscuits)
+        self.build()
+
+        self.place_order(treats, bed)
+        self.place_order(treats, bed)
+        self.place_order(treats, bed, lead)
+        out = self.build()
+
+        self.assertIn('Counted 3 orders', out)
+        self.assertEqual(self.recommended(treats), [bed, biscuits, lead])
+        self.assertEqual(self.recommended(biscuits), [treats])
+        self.assertEqual(CoPurchase.objects.get(
+            product=treats, other=biscuits).count, 2)
+        self.assertEqual(RecommendationRun.objects.latest().orders, 3)
+
+        # a rebuild should reach the same result
+        self.build(rebuild=True, top=1)
+        self.assertEqual(self.recommended(treats), [bed])
+        self.assertEqual(CoPurchase.objects.get(
+            product=treats, other=bed).count, 3)
+
+    def test_orders_committed_late_are_counted_once(self):
+        treats, biscuits, bed, lead = self.products
+        # an order with a lower id whose items are not committed yet
+        late = Order.objects.create(user=self.user)
+        self.place_order(treats, biscuits)
+        self.assertIn('Counted 1 orders', self.build())
+
+        OrderItem.objects.bulk_create(
+            OrderItem(order=late, product=product, price=product.price)
+            for product in (treats, bed))
+        self.place_order(treats, biscuits, lead)
+        self.assertIn('Counted 2 orders', self.build())
+        self.assertIn('Counted 0 orders', self.build())
+
+        self.assertEqual(set(self.recommended(treats)),
+                         {biscuits, bed, lead})
+        self.assertEqual(CoPurchase.objects.get(
+            product=treats, other=biscuits).count, 2)
+        self.assertEqual(CoPurchase.objects.get(
+            product=treats, other=bed).count, 1)
+
+        # orders older than the window are no longer read
+        self.build(window=1)
+        self.place_order(bed, lead)
+        self.assertIn('Counted 1 orders', self.build(window=1))
+        self.assertEqual(CountedOrder.objects.count(), 1)
+
+    def test_detail_shows_live_recommendations(self):
+        treats, biscuits, bed, lead = self.products
+        self.place_order(treats, biscuits, bed)
+        self.build()
+
+        Product.objects.filter(pk=bed.pk).update(is_live=False)
+        response = self.client.get(
+            reverse('product_detail', kwargs={'pk': treats.pk}))
+
+        self.assertContains(response, 'Customers Also Bought')
+        self.assertEqual(list(response.context['also_bought']), [biscuits])
+        self.assertEqual(Recommendation.objects.filter(
+            product=treats).count(), 2)
@@ -47,6 +47,8 @@ INSTALLED_APPS = [
     'basket.apps.BasketConfig',
     'checkout.apps.CheckoutConfig',
     'orders.apps.OrdersConfig',
+    'recommendations.apps.RecommendationsConfig',
+    'analytics.apps.AnalyticsConfig',
 ]
 
 MIDDLEWARE = [
@@ -88,6 +90,29 @@ WSGI_APPLICATION = 'petstore.wsgi.application'
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+# the catalog version, category tree, facet counts and search results are
+# invalidated through the cache so it must be shared by every process (web
+# workers and management commands), a per-process cache such as LocMemCache
+# would keep serving stale data. The table is created with
+# `python manage.py createcachetable`. It holds a page per listing url and
+# sort, a card per product and the search results, far more than the
+# default limit of 300 entries, so CACHE_MAX_ENTRIES should be well above
+# the number of products times the pages each appears on.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'django_cache',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 100000)),
+            # remove a tenth of the entries when full rather than a third
+            'CULL_FREQUENCY': 10,
+        },
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -161,6 +186,43 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
+# catalog listings paginate with keyset cursors ('cursor') by default, set to
+# 'page' to use numbered pages instead
+PRODUCT_PAGINATION = os.getenv('PRODUCT_PAGINATION', 'cursor')
+
+# product search index, saved to this path (if set) so that new workers can
+# load it instead of reading every product
+PRODUCT_SEARCH_INDEX_PATH = os.getenv('PRODUCT_SEARCH_INDEX_PATH')
+PRODUCT_SEARCH_MAX_RESULTS = 1000
+# seconds to cache the results of a search
+PRODUCT_SEARCH_CACHE_TIMEOUT = 60 * 15
+# seconds between checks for catalog changes by the search, typeahead and
+# spelling indexes
+PRODUCT_SUGGEST_REFRESH_INTERVAL = 30
+# largest product image (bytes) browsers may upload straight to S3 and the
+# seconds a presigned upload stays valid
+PRODUCT_IMAGE_UPLOAD_MAX_SIZE = 10 * 1024 * 1024
+PRODUCT_IMAGE_UPLOAD_EXPIRES = 60 * 10
+# number of 'customers also bought' products stored for each product by
+# the build_recommendations command
+PRODUCT_RECOMMENDATIONS = 8
+# products remembered in each session for the recently viewed strip
+PRODUCT_RECENTLY_VIEWED = 8
+# reviews shown on a product page, more are loaded on demand
+PRODUCT_REVIEWS_PER_PAGE = 10
+# cache the HTML shared by every visitor to catalog pages for this many
+# seconds, pages are also replaced as soon as the catalog changes
+PAGE_CACHE_ENABLED = True
+PAGE_CACHE_TIMEOUT = 60 * 10
+# searches are saved in batches of this many events, or every this many
+# seconds, by a background thread in each process
+SEARCH_ANALYTICS_BATCH_SIZE = 100
+SEARCH_ANALYTICS_FLUSH_INTERVAL = 10
+# releases of pre-rendered catalog pages written by export_static_site, the
+# 'current' link points at the latest release
+STATIC_EXPORT_ROOT = os.getenv('STATIC_EXPORT_ROOT',
+                               os.path.join(BASE_DIR, 'static_export'))
+
 # Bootstrap class mappings for django messages
 MESSAGE_TAGS = {
     messages.DEBUG: 'alert-info',
@@ -19,3 +19,16 @@ DATABASES = {
         'USER': 'postgres',
     }
 }
+
+# tests run in a single process and count database queries
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# tests inspect the context of rendered pages, page cache tests enable it
+PAGE_CACHE_ENABLED = False
+# tests save search events themselves, a background thread would write
+# outside the test transaction
+SEARCH_ANALYTICS_FLUSH_INTERVAL = None
@@ -88,4 +88,32 @@ $('#product-tabs a').click(function (e) {
     $('#product-tabs .active').removeClass('active');
     // add 'active' class to the target li tag (parent of the <a> tag)
     $(this).parent().addClass('active');
-});
\ No newline at end of file
+});
+
+/* search box typeahead:
+ fetch suggestions for the current search text and list them in the
+ datalist attached to the search inputs
+*/
+var suggestionList = document.getElementById('search-suggestions');
+// minimum number of characters before requesting suggestions
+var suggestMinLength = 2;
+
+$('.nav-search input[name="keywords"]').on('input', function () {
+    var term = this.value.trim();
+
+    if (term.length < suggestMinLength) {
+        return;
+    }
+
+    fetch(this.dataset.suggestUrl + '?q=' + encodeURIComponent(term))
+        .then(response => response.json())
+        .then(data => {
+            // replace previous suggestions
+            suggestionList.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                var option = document.createElement('option');
+                option.value = suggestion.text;
+                suggestionList.appendChild(option);
+            });
+        });
+});
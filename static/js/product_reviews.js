@@ -0,0 +1,30 @@
+/* product reviews:
+ the product page only includes the newest reviews, the "show more" link
+ fetches the next page as an HTML fragment and puts it in place of the link
+*/
+document.addEventListener('click', event => {
+    var link = event.target.closest('[data-load-reviews]');
+    if (!link) {
+        return;
+    }
+
+    event.preventDefault();
+    var item = link.parentElement;
+    link.classList.add('disabled');
+
+    fetch(link.href)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Could not load reviews');
+            }
+            return response.text();
+        })
+        .then(html => {
+            // the fragment ends with a link to the following page, if any
+            item.insertAdjacentHTML('beforebegin', html);
+            item.remove();
+        })
+        .catch(() => {
+            link.classList.remove('disabled');
+        });
+});
@@ -0,0 +1,73 @@
+/* product image uploads:
+ when images are stored on S3 the image input has a data-upload-url, the
+ selected file is posted straight to the bucket with a presigned POST and
+ only the resulting key is submitted with the product form
+*/
+document.querySelectorAll('input[type="file"][data-upload-url]').forEach(input => {
+    var form = input.form;
+    var keyInput = form.querySelector('input[name="image_key"]');
+    var submitButtons = form.querySelectorAll('[type="submit"]');
+
+    function getCsrfToken() {
+        return form.querySelector('input[name="csrfmiddlewaretoken"]').value;
+    }
+
+    function setUploading(uploading) {
+        submitButtons.forEach(button => {
+            button.disabled = uploading;
+        });
+    }
+
+    function showError(message) {
+        input.setCustomValidity(message);
+        input.reportValidity();
+    }
+
+    input.addEventListener('change', () => {
+        var file = input.files[0];
+        keyInput.value = '';
+        input.setCustomValidity('');
+
+        if (!file) {
+            return;
+        }
+
+        var presignData = new FormData();
+        presignData.append('filename', file.name);
+        presignData.append('content_type', file.type);
+
+        setUploading(true);
+
+        fetch(input.dataset.uploadUrl, {
+            method: 'POST',
+            body: presignData,
+            headers: { 'X-CSRFToken': getCsrfToken() },
+            credentials: 'same-origin'
+        })
+            .then(response => response.json())
+            .then(upload => {
+                if (upload.error) {
+                    throw new Error(upload.error);
+                }
+
+                // the policy fields must come before the file
+                var uploadData = new FormData();
+                Object.keys(upload.fields).forEach(name => {
+                    uploadData.append(name, upload.fields[name]);
+                });
+                uploadData.append('file', file);
+
+                return fetch(upload.url, { method: 'POST', body: uploadData })
+                    .then(response => {
+                        if (!response.ok) {
+                            throw new Error('Image upload failed');
+                        }
+                        keyInput.value = upload.key;
+                        // the file has been stored, do not send it again
+                        input.value = '';
+                    });
+            })
+            .catch(error => showError(error.message))
+            .finally(() => setUploading(false));
+    });
+});